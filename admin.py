@@ -1,62 +1,71 @@
+import importlib
 import streamlit as st
-from streamlit_calendar import calendar  # ✅ import component ชื่อ calendar จาก library
-from supabase import create_client, Client  # ✅ เชื่อมต่อ Supabase
-from datetime import datetime, timedelta  # ✅ ใช้จัดการวัน เวลา
-import pytz
+from supabase import Client  # ✅ เชื่อมต่อ Supabase
+import db
+from datetime import datetime  # ✅ ใช้จัดการวัน เวลา
 from streamlit_autorefresh import st_autorefresh  # ✅ สำหรับ refresh หน้าอัตโนมัติ
-import pandas as pd  # ✅ ใช้ DataFrame
-import pygame  # ✅ ใช้สำหรับเสียงเตือน (ต้องติดตั้งก่อน)
-import hashlib  # ✅ สำหรับสร้าง id หรือ key แบบไม่ซ้ำ
-import random
 import bcrypt
+import reservations
+import ref_cache
+from change_feed import BookingFeed
+import archiver
+import reports
+import bookings_repo
+import instrumentation
+import schedule
+# ⚡ pandas loads on first use through pd below; streamlit_calendar / calendar_events are
+# imported inside the views that use them, so the login screen and the non-report
+# menus don't pay for them (see benchmarks/bench_startup.py)
+
+
+class LazyModule:
+    # attribute access imports the module the first time (then it's in sys.modules)
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+
+pd = LazyModule("pandas")
+
 # ------------------ Supabase Config ------------------
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
-supabase: Client = create_client(url, key)
+supabase: Client = db.get_client(url, key)  # ✅ one pooled client per process
+if st.session_state.get("store_id"):
+    # ✅ หลัง login ทุกคำขอใช้ token ของร้านนี้ -> RLS กรอง store_id ที่ฝั่ง DB (sql/011)
+    supabase = db.get_store_client(url, key, st.secrets["SUPABASE_JWT_SECRET"], st.session_state["store_id"])
 
 
 # ------------------ Settings ------------------
 st.set_page_config(page_title="MelBooking Admin", layout="wide")
 
 
+# ✅ store scoping: every query filters on store_id itself, in the same request
+@instrumentation.traced
 def get_hourly_rate(massage_type):
     try:
-        supabase.rpc("set_config", {
-            "key": "request.store_id",
-            "value": st.session_state["store_id"],
-            "is_local": False
-        }).execute()
-
-        result = supabase.table("massage_types").select("Price-hour").eq("Type", massage_type).limit(1).execute()
-        return float(result.data[0]["Price-hour"])
-    except:
-        return 0.0
+        for row in ref_cache.get_massage_types(supabase, st.session_state["store_id"]):
+            if row.get("Type") == massage_type:
+                return float(row["Price-hour"])
+    except Exception as e:
+        instrumentation.record_error(e, f"hourly rate for {massage_type!r} unavailable, using 0")
+    return 0.0
 
 
+@instrumentation.traced
 def fetch_bookings():
     try:
-        supabase.rpc("set_config", {
-            "key": "request.store_id",
-            "value": st.session_state["store_id"],
-            "is_local": False
-        }).execute()
-
-        response = supabase.table("bookings").select("*").execute()
-        return response.data if response.data else []
-    except:
+        return bookings_repo.fetch_bookings_between(supabase, st.session_state["store_id"])
+    except Exception as e:
+        instrumentation.record_error(e, "bookings could not be loaded")
         return []
 
 
 def load_bookings():
     try:
-        supabase.rpc("set_config", {
-            "key": "request.store_id",
-            "value": st.session_state["store_id"],
-            "is_local": False
-        }).execute()
-
-        response = supabase.table("bookings").select("*").execute()
-        return pd.DataFrame(response.data)
+        return pd.DataFrame(bookings_repo.fetch_bookings_between(supabase, st.session_state["store_id"]))
     except Exception as e:
         st.error(f"❌ Failed to load bookings: {e}")
         return pd.DataFrame()
@@ -80,13 +89,6 @@ def login():
                 st.session_state["admin_email"] = email
                 st.session_state["store_id"] = admin.get("store_id")
 
-                # ✅ ตั้งค่า store_id สำหรับ RLS Policy ทันที
-                supabase.rpc("set_config", {
-                    "key": "request.store_id",
-                    "value": st.session_state["store_id"],
-                    "is_local": False
-                }).execute()
-
                 st.sidebar.success("✅ Login successful")
                 st.rerun()
             else:
@@ -108,40 +110,38 @@ def check_login():
     return login_duration < 43200  # 12 hours
 
 def convert_bookings_to_events(data):
-    events = []
-    melbourne_tz = pytz.timezone("Australia/Melbourne")
-
-
-    for row in data:
-        try:
-            # ✅ แปลงวันที่และเวลา
-            date_obj = datetime.strptime(row["Date"], "%d/%m/%Y").date()
-            start_time = datetime.strptime(row["start_time"], "%I:%M %p").time()
-            end_time = datetime.strptime(row["end_time"], "%I:%M %p").time()
-
-
-            # ✅ รวมเป็น datetime พร้อม timezone
-            start_dt = melbourne_tz.localize(datetime.combine(date_obj, start_time))
-            end_dt = melbourne_tz.localize(datetime.combine(date_obj, end_time))
-
+    import calendar_events
+    # ✅ แปลงวันที่/เวลาทั้งชุดทีเดียวด้วย pandas แทนการวนทีละแถว
+    if not data:
+        return []
+    df = pd.DataFrame(data)
+    start_iso, end_iso, malformed = calendar_events.booking_times(df)
+    report_malformed_bookings([row for row, bad in zip(data, malformed) if bad])
 
-            # ✅ สร้าง event สำหรับ calendar
-            events.append({
-                "title": f"{row.get('customer_name', '')} - {row.get('therapist', '')}",
-                "start": start_dt.isoformat(),
-                "end": end_dt.isoformat()
-            })
+    return [
+        {
+            "title": f"{row.get('customer_name', '')} - {row.get('therapist', '')}",
+            "start": start,
+            "end": end
+        }
+        for row, start, end, bad in zip(data, start_iso, end_iso, malformed)
+        if not bad
+    ]
 
 
-        except Exception as e:
-            print("❌ Error parsing booking:", row)
-            print("📛 Reason:", e)
+def report_malformed_bookings(rows):
+    if rows:
+        st.warning(f"⚠️ Skipped {len(rows)} bookings with an unreadable Date/start_time/end_time.")
+        with st.expander("Show skipped bookings"):
+            st.dataframe(pd.DataFrame(rows))
 
 
-    return events
+CALENDAR_DAYS = 1  # resourceTimeGridDay shows one day
 
 
 def calendar_view():
+    import calendar_events
+    from streamlit_calendar import calendar
     st.subheader("📅 Calendar View")
     store_id = st.session_state.get("store_id")
 
@@ -150,8 +150,7 @@ def calendar_view():
         return
 
     # Load Therapists
-    therapist_response = supabase.table("therapists").select("*").eq("store_id", store_id).execute()
-    therapists = therapist_response.data or []
+    therapists = ref_cache.get_therapists(supabase, store_id)
 
     # Therapist → Resource
     color_palette = ["#f44336", "#3f51b5", "#009688", "#ff9800", "#9c27b0", "#03a9f4",
@@ -166,43 +165,18 @@ def calendar_view():
         therapist_colors[name] = {"id": resource_id, "color": color}
         resources.append({"id": resource_id, "title": name})
 
-    # Load Bookings
-    bookings_response = supabase.table("bookings").select("*").eq("store_id", store_id).execute()
-    bookings = bookings_response.data or []
-    events = []
-    id_mapping = {}
-    mel_tz = pytz.timezone("Australia/Melbourne")
-
-    for row in bookings:
-        try:
-            date = datetime.strptime(row["Date"], "%d/%m/%Y").date()
-            start = datetime.strptime(row["start_time"], "%I:%M %p").time()
-            end = datetime.strptime(row["end_time"], "%I:%M %p").time()
-            start_iso = mel_tz.localize(datetime.combine(date, start)).isoformat()
-            end_iso = mel_tz.localize(datetime.combine(date, end)).isoformat()
-            therapist = row.get("Therapist", "")
-            info = therapist_colors.get(therapist)
-            if not info:
-                continue
-
-            event = {
-                "id": row["id"],
-                "title": f"{row.get('customer_name', '')} - {row.get('Type', '')}",
-                "start": start_iso,
-                "end": end_iso,
-                "resourceId": info["id"],
-                "backgroundColor": info["color"],
-                "borderColor": info["color"]
-            }
-            id_mapping[row["id"]] = row
-            events.append(event)
-        except Exception as e:
-            print("❌ Error parsing booking:", e)
+    # Load Bookings: only the range the calendar is showing (LRU per session, patched by the change feed)
+    windows = get_booking_windows(store_id)
+    visible_start = st.session_state.get("calendar_start") or bookings_repo.today()
+    bookings = windows.get(supabase, visible_start, CALENDAR_DAYS)
+    events, malformed = calendar_events.bookings_to_events(bookings, therapist_colors)
+    report_malformed_bookings(malformed)
 
     # FullCalendar options
     calendar_options = {
         "schedulerLicenseKey": "GPL-My-Project-Is-Open-Source",
         "initialView": "resourceTimeGridDay",
+        "initialDate": visible_start.isoformat(),
         "resources": resources,
         "editable": True,
         "selectable": True,
@@ -218,7 +192,19 @@ def calendar_view():
     }
 
     # Calendar rendering
-    result = calendar(events=events, options=calendar_options, key="calendar-fresha")
+    result = calendar(events=events, options=calendar_options,
+                      callbacks=["dateClick", "eventClick", "eventChange", "eventsSet", "select", "datesSet"],
+                      key="calendar-fresha")
+
+    # prev / next / today → remember the new range and rerun with its bookings
+    if result and isinstance(result, dict) and result.get("callback") == "datesSet":
+        shown = datetime.fromisoformat(result["datesSet"]["start"]).date()
+        if shown != visible_start:
+            st.session_state["calendar_start"] = shown
+            st.rerun()
+
+    # fetch the neighbouring days now so the next prev/next click is served from the cache
+    windows.prefetch_neighbours(supabase, visible_start, CALENDAR_DAYS)
 
     # Store pending update if drag occurred
     if result and isinstance(result, dict) and result.get("event") and result.get("updated"):
@@ -263,6 +249,16 @@ def calendar_view():
                 st.error(f"❌ Error during update: {e}")
 
 
+# ---------- REPORT RANGE ----------
+def report_range_inputs(key):
+    default_start, default_end = reports.default_range(7)
+    col1, col2, col3 = st.columns(3)
+    start_date = col1.date_input("From", value=default_start, key=f"{key}_from")
+    end_date = col2.date_input("To", value=default_end, key=f"{key}_to")
+    period = col3.selectbox("Group by", reports.PERIODS, key=f"{key}_period")
+    return start_date, end_date, period
+
+
 # ---------- WEEKLY SUMMARY ----------
 def weekly_summary():
     st.subheader("📊 Weekly Business Income Summary")
@@ -272,137 +268,76 @@ def weekly_summary():
         st.error("❌ Store ID not found.")
         return
 
-    # ✅ โหลด bookings เฉพาะร้าน
-    bookings_response = (
-        supabase.table("bookings").select("*").eq("store_id", store_id).execute()
-    )
-    bookings = bookings_response.data if bookings_response.data else []
-    df = pd.DataFrame(bookings)
-
-    if df.empty:
-        st.info("No bookings to summarize.")
+    start_date, end_date, period = report_range_inputs("income")
+    if start_date > end_date:
+        st.error("❗ 'From' must be on or before 'To'.")
         return
 
-    # 🔁 แปลงวันที่
-    def try_parse_date(date_str):
-        for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-            try:
-                return datetime.strptime(date_str, fmt)
-            except:
-                continue
-        return None
-
-    df["Date"] = df["Date"].apply(try_parse_date)
-    df = df.dropna(subset=["Date"])
-    df = df[df["Date"] >= (datetime.now() - timedelta(days=7))]
-
-    if df.empty:
-        st.warning("No bookings in the past 7 days.")
+    # ✅ รวมยอดฝั่ง database (ได้กลับมาแค่แถวละ period)
+    summary = reports.income_summary(supabase, store_id, start_date, end_date, period)
+    if not summary:
+        st.warning("No bookings in the selected range.")
         return
 
-    # ✅ โหลดราคาต่อชั่วโมงเฉพาะร้าน
-    response = (
-        supabase.table("massage_types").select("*").eq("store_id", store_id).execute()
-    )
-    type_data = response.data if response.data else []
-    price_dict = {row["Type"]: float(row["Price-hour"]) for row in type_data}
-
-    # ✅ คำนวณรายได้
-    df["Start"] = pd.to_datetime(df["start_time"], format="%I:%M %p")
-    df["End"] = pd.to_datetime(df["end_time"], format="%I:%M %p")
-    df["Hours"] = (df["End"] - df["Start"]).dt.total_seconds() / 3600
-    df["Price/hr"] = df["Type"].map(price_dict)
-    df["Base Income"] = df["Hours"] * df["Price/hr"]
-    df["Add-on Price"] = pd.to_numeric(df["Add-on Price"], errors='coerce').fillna(0)
-    df["Total Income"] = df["Base Income"] + df["Add-on Price"]
-
-    # ✅ เตรียมตารางแสดงผล
-    table = df[["Date", "start_time", "Type", "Price/hr", "Hours", "Add-on Price", "Total Income"]].copy()
-    table["Date"] = table["Date"].dt.strftime("%d/%m/%Y")
-    table["Hours"] = table["Hours"].round(2)
-    table["Price/hr"] = table["Price/hr"].round(2)
-    table["Add-on Price"] = table["Add-on Price"].round(2)
-    table["Total Income"] = table["Total Income"].round(2)
-
+    table = pd.DataFrame(summary).rename(columns={
+        "period_start": "Period",
+        "bookings": "Bookings",
+        "hours": "Hours",
+        "base_income": "Base Income",
+        "addon_income": "Add-on Price",
+        "total_income": "Total Income"
+    })
+    table["Period"] = pd.to_datetime(table["Period"]).dt.strftime("%d/%m/%Y")
+
+    st.markdown(f"### 🗓️ Income Summary by {period}")
     st.dataframe(table)
 
-    # ✅ สรุปรวมรายวัน
-    daily_summary = table.groupby("Date").agg({
-        "Total Income": "sum"
-    }).reset_index()
-    daily_summary["Total Income"] = daily_summary["Total Income"].round(2)
-
-    st.markdown("### 🗓️ Daily Income Summary")
-    st.dataframe(daily_summary)
-
-    # ✅ รวมทั้ง 7 วัน
-    total_income = daily_summary["Total Income"].sum()
-    st.markdown(f"### 🧾 Total Income (7 days): **${total_income:.2f}**")
+    total_income = pd.to_numeric(table["Total Income"]).sum()
+    st.markdown(f"### 🧾 Total Income ({start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}): **${total_income:.2f}**")
 
 
 
 # ---------- STAFF PAYMENT SUMMARY ----------
 def staff_payment_summary():
-    st.subheader("💸 Therapist Payment Summary (Last 7 Days)")
+    st.subheader("💸 Therapist Payment Summary")
 
     store_id = st.session_state.get("store_id")
     if not store_id:
         st.error("❌ Store ID not found.")
         return
 
-    # ✅ โหลด bookings เฉพาะร้าน
-    bookings_response = (
-        supabase.table("bookings").select("*").eq("store_id", store_id).execute()
-    )
-    bookings_data = bookings_response.data or []
-    bookings = pd.DataFrame(bookings_data)
-
-    if bookings.empty:
-        st.info("No bookings available.")
+    start_date, end_date, period = report_range_inputs("payroll")
+    if start_date > end_date:
+        st.error("❗ 'From' must be on or before 'To'.")
         return
 
-    # ✅ โหลด therapists เฉพาะร้าน
-    response = (
-        supabase.table("therapists").select("*").eq("store_id", store_id).execute()
-    )
-    therapist_data = response.data if response.data else []
-    rate_dict = {r["Name"]: float(r["Rate/hour"]) for r in therapist_data}
-
-    # ✅ กรองข้อมูล 7 วันล่าสุด
-    bookings["Date"] = pd.to_datetime(bookings["Date"], format="%d/%m/%Y", errors='coerce')
-    bookings = bookings.dropna(subset=["Date"])
-    recent = bookings[bookings["Date"] >= (datetime.now() - timedelta(days=7))]
-
-    if recent.empty:
-        st.warning("No therapist work in the past 7 days.")
+    # ✅ รวมชั่วโมง/ค่าจ้างต่อหมอนวดฝั่ง database
+    summary = reports.therapist_pay_summary(supabase, store_id, start_date, end_date, period)
+    if not summary:
+        st.warning("No therapist work in the selected range.")
         return
 
-    # ✅ คำนวณชั่วโมงทำงาน
-    def calc_hours(row):
-        try:
-            start = datetime.strptime(row["start_time"], "%I:%M %p")
-            end = datetime.strptime(row["end_time"], "%I:%M %p")
-            return round((end - start).total_seconds() / 3600, 2)
-        except:
-            return 0
-
-    recent["Hours"] = recent.apply(calc_hours, axis=1)
-    recent["Rate"] = recent["Therapist"].map(rate_dict)
-    recent["Pay"] = (recent["Hours"] * recent["Rate"]).round(2)
-
-    # ✅ ตารางรายวัน
-    table = recent[["Date", "Therapist", "Rate", "Hours", "Pay"]].copy()
-    table["Date"] = table["Date"].dt.strftime("%d/%m/%Y")
+    table = pd.DataFrame(summary).rename(columns={
+        "period_start": "Period",
+        "therapist": "Therapist",
+        "bookings": "Bookings",
+        "hours": "Hours",
+        "rate": "Rate",
+        "pay": "Pay"
+    })
+    table["Period"] = pd.to_datetime(table["Period"]).dt.strftime("%d/%m/%Y")
+    table["Hours"] = pd.to_numeric(table["Hours"])
+    table["Pay"] = pd.to_numeric(table["Pay"])
     st.dataframe(table)
 
-    # ✅ สรุปต่อวัน
-    daily = table.groupby("Date").agg({"Pay": "sum"}).reset_index()
-    daily["Pay"] = daily["Pay"].round(2)
-    st.markdown("### 🗓️ Daily Payment Summary")
-    st.dataframe(daily)
+    # ✅ สรุปต่อหมอนวด
+    per_therapist = table.groupby("Therapist").agg({"Hours": "sum", "Pay": "sum"}).reset_index()
+    per_therapist["Pay"] = per_therapist["Pay"].round(2)
+    st.markdown("### 👤 Payment per Therapist")
+    st.dataframe(per_therapist)
 
-    total = daily["Pay"].sum()
-    st.markdown(f"### 💰 Total Payroll (7 days): **${total:.2f}**")
+    total = table["Pay"].sum()
+    st.markdown(f"### 💰 Total Payroll ({start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}): **${total:.2f}**")
 
 # ---------- MANAGE THERAPISTS ----------
 def manage_therapists():
@@ -414,10 +349,7 @@ def manage_therapists():
         return
 
     # 🔹 โหลดข้อมูลจาก Supabase ตามร้าน
-    response = (
-        supabase.table("therapists").select("*").eq("store_id", store_id).execute()
-    )
-    therapist_data = response.data if response.data else []
+    therapist_data = ref_cache.get_therapists(supabase, store_id)
 
     # 🔹 สร้างรายชื่อที่มีอยู่แล้ว
     current_names = [r["Name"] for r in therapist_data]
@@ -434,6 +366,7 @@ def manage_therapists():
                     "Rate/hour": new_rate,
                     "store_id": store_id  # ✅ เพิ่มเพื่อรองรับ RLS
                 }).execute()
+                ref_cache.invalidate(store_id, "therapists")
                 st.success(f"✅ Added therapist {new_name} at ${new_rate}/hr")
                 st.rerun()
             except Exception as e:
@@ -449,6 +382,7 @@ def manage_therapists():
                 .eq("Name", delete_name)\
                 .eq("store_id", store_id)\
                 .execute()
+            ref_cache.invalidate(store_id, "therapists")
             st.success(f"🗑 Deleted therapist: {delete_name}")
             st.rerun()
         except Exception as e:
@@ -464,8 +398,7 @@ def manage_massage_types():
 
     # 🔹 โหลดข้อมูลเฉพาะร้านจาก Supabase
     try:
-        response = supabase.table("massage_types").select("*").eq("store_id", store_id).execute()
-        data = response.data if response.data else []
+        data = ref_cache.get_massage_types(supabase, store_id)
     except Exception as e:
         st.error(f"❌ Failed to load massage types: {e}")
         data = []
@@ -509,6 +442,7 @@ def manage_massage_types():
                     "is_addon": is_addon,
                     "store_id": store_id
                 }).execute()
+                ref_cache.invalidate(store_id, "massage_types")
                 st.success("✅ Item added successfully!")
                 st.rerun()
             except Exception as e:
@@ -532,12 +466,36 @@ def manage_massage_types():
                             .eq("id", row["id"])\
                             .eq("store_id", store_id)\
                             .execute()
+                        ref_cache.invalidate(store_id, "massage_types")
                         st.success("✅ Deleted successfully!")
                         st.rerun()
                     except Exception as e:
                         st.error(f"❌ Failed to delete item: {e}")
 
 
+# ✅ วันในสัปดาห์: None = ทุกวัน, 1..7 = จันทร์..อาทิตย์ (sql/010_schedules.sql)
+WEEKDAY_OPTIONS = [None, 1, 2, 3, 4, 5, 6, 7]
+
+
+def weekday_label(weekday):
+    return "Every day" if weekday is None else schedule.WEEKDAYS[weekday - 1]
+
+
+def time_text(value):
+    return value.strftime("%I:%M %p")
+
+
+def parse_time_text(text, fallback):
+    try:
+        return datetime.strptime(text, "%I:%M %p").time()
+    except (TypeError, ValueError):
+        return datetime.strptime(fallback, "%I:%M %p").time()
+
+
+def filter_weekday(query, weekday):
+    return query.is_("weekday", "null") if weekday is None else query.eq("weekday", weekday)
+
+
 # เวลาหมอนวด (แยกร้านด้วย store_id)
 def manage_therapist_times():
     st.subheader("🕒 Therapist Working Hours")
@@ -548,61 +506,97 @@ def manage_therapist_times():
         return
 
     # 🔹 โหลดรายชื่อ Therapist เฉพาะร้านนี้
-    response = (
-        supabase.table("therapists")
-        .select("Name")
-        .eq("store_id", store_id)
-        .execute()
-    )
-    therapist_data = response.data if response.data else []
+    therapist_data = ref_cache.get_therapists(supabase, store_id)
     names = [r["Name"] for r in therapist_data]
 
     if not names:
         st.warning("❗ No therapists found.")
         return
 
-    # 🔹 แบบฟอร์มเลือก Therapist และเวลาทำงาน
+    # 🔹 แบบฟอร์มเลือก Therapist วัน และเวลาทำงาน
     name = st.selectbox("👤 Select Therapist", names)
-    t_start = st.time_input("Start Time", value=datetime.strptime("10:00 AM", "%I:%M %p").time())
-    t_end = st.time_input("End Time", value=datetime.strptime("06:00 PM", "%I:%M %p").time())
-
-    if st.button("✅ Save Time"):
+    weekday = st.selectbox("📆 Day", WEEKDAY_OPTIONS, format_func=weekday_label, key="shift_weekday")
+    shifts = [r for r in ref_cache.get_therapist_times(supabase, store_id) if r.get("Name") == name]
+    existing = [r for r in shifts if r.get("weekday") == weekday]
+    t_start = st.time_input("Start Time", value=parse_time_text(existing[0]["Start"] if existing else None, "10:00 AM"))
+    t_end = st.time_input("End Time", value=parse_time_text(existing[0]["End"] if existing else None, "06:00 PM"))
+
+    col1, col2 = st.columns(2)
+    if col1.button("✅ Save Time"):
         try:
-            # 🔸 แปลงเวลาเป็น string format "10:00 AM"
-            start_str = datetime.strptime(str(t_start), "%H:%M:%S").strftime("%I:%M %p")
-            end_str = datetime.strptime(str(t_end), "%H:%M:%S").strftime("%I:%M %p")
-
-            # 🔸 ตรวจว่ามีข้อมูลอยู่แล้วหรือยัง
-            existing = (
-                supabase.table("therapist_times")
-                .select("*")
-                .eq("Name", name)
-                .eq("store_id", store_id)
-                .execute()
-                .data
-            )
-
+            start_str, end_str = time_text(t_start), time_text(t_end)
             if existing:
                 # อัปเดตเวลา
-                supabase.table("therapist_times").update({
+                filter_weekday(supabase.table("therapist_times").update({
                     "Start": start_str,
                     "End": end_str
-                }).eq("Name", name).eq("store_id", store_id).execute()
+                }).eq("Name", name).eq("store_id", store_id), weekday).execute()
             else:
                 # เพิ่มใหม่
                 supabase.table("therapist_times").insert({
                     "Name": name,
                     "Start": start_str,
                     "End": end_str,
+                    "weekday": weekday,
                     "store_id": store_id
                 }).execute()
+            ref_cache.invalidate(store_id, "therapist_times")
 
-            st.success(f"✅ Time saved: {start_str} - {end_str}")
+            st.success(f"✅ Time saved ({weekday_label(weekday)}): {start_str} - {end_str}")
             st.rerun()
 
         except Exception as e:
             st.error(f"❌ Failed to save working time: {e}")
 
+    if existing and weekday is not None and col2.button("🗑️ Remove this day's hours"):
+        try:
+            filter_weekday(supabase.table("therapist_times").delete()
+                           .eq("Name", name).eq("store_id", store_id), weekday).execute()
+            ref_cache.invalidate(store_id, "therapist_times")
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ Failed to remove working time: {e}")
+
+    if shifts:
+        st.caption("Days with their own hours replace \"Every day\"; without an \"Every day\" row the therapist "
+                   "only works the listed days.")
+        st.table([{"Day": weekday_label(r.get("weekday")), "Start": r["Start"], "End": r["End"]}
+                  for r in sorted(shifts, key=lambda r: r.get("weekday") or 0)])
+
+    # 🔹 เวลาพัก
+    st.markdown("### ☕ Breaks")
+    breaks = [r for r in ref_cache.get_therapist_breaks(supabase, store_id) if r.get("Name") == name]
+    for row in sorted(breaks, key=lambda r: (r.get("weekday") or 0, r["Start"])):
+        c1, c2 = st.columns([4, 1])
+        c1.write(f"{weekday_label(row.get('weekday'))}: {row['Start']} - {row['End']}")
+        if c2.button("🗑️", key=f"break_{row['id']}"):
+            try:
+                supabase.table("therapist_breaks").delete().eq("id", row["id"]).eq("store_id", store_id).execute()
+                ref_cache.invalidate(store_id, "therapist_breaks")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Failed to delete break: {e}")
+
+    b_weekday = st.selectbox("📆 Break day", WEEKDAY_OPTIONS, format_func=weekday_label, key="break_weekday")
+    b_start = st.time_input("Break Start", value=parse_time_text(None, "01:00 PM"))
+    b_end = st.time_input("Break End", value=parse_time_text(None, "01:30 PM"))
+    if st.button("➕ Add Break"):
+        if b_end <= b_start:
+            st.error("❌ Break end must be after break start.")
+        else:
+            try:
+                supabase.table("therapist_breaks").insert({
+                    "store_id": store_id,
+                    "Name": name,
+                    "weekday": b_weekday,
+                    "Start": time_text(b_start),
+                    "End": time_text(b_end)
+                }).execute()
+                ref_cache.invalidate(store_id, "therapist_breaks")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Failed to add break: {e}")
+
 # เวลาเปิดร้าน (แยกร้านด้วย store_id)
 def manage_store_hours():
     st.subheader("🏪 Set Store Opening Hours")
@@ -612,54 +606,132 @@ def manage_store_hours():
         st.error("❌ Store ID not found.")
         return
 
-    # 🔹 โหลด store_hours เฉพาะร้านนี้
-    response = (
-        supabase.table("store_hours")
-        .select("*")
-        .eq("store_id", store_id)
-        .limit(1)
-        .execute()
-    )
-    records = response.data if response.data else []
+    # 🔹 โหลด store_hours เฉพาะร้านนี้ (แถวละวัน, weekday ว่าง = ทุกวัน)
+    records = ref_cache.get_store_hours(supabase, store_id)
+    weekday = st.selectbox("📆 Day", WEEKDAY_OPTIONS, format_func=weekday_label)
+    current = next((r for r in records if r.get("weekday") == weekday), None)
 
     # 🔹 ตั้งค่า default เวลา
-    try:
-        current = records[0]
-        default_open = datetime.strptime(current["Open"], "%I:%M %p").time()
-        default_close = datetime.strptime(current["Close"], "%I:%M %p").time()
-    except:
-        default_open = datetime.strptime("10:00 AM", "%I:%M %p").time()
-        default_close = datetime.strptime("06:00 PM", "%I:%M %p").time()
+    default_open = parse_time_text(current["Open"] if current else None, "10:00 AM")
+    default_close = parse_time_text(current["Close"] if current else None, "06:00 PM")
 
-    # 🔹 Input สำหรับเวลา
-    open_time = st.time_input("🕙 Open Time", value=default_open)
-    close_time = st.time_input("🕕 Close Time", value=default_close)
+    # 🔹 Input สำหรับเวลา (ปิดร้านทั้งวันได้)
+    closed = st.checkbox("🚫 Closed on this day", value=bool(current and current.get("closed")))
+    open_time = st.time_input("🕙 Open Time", value=default_open, disabled=closed)
+    close_time = st.time_input("🕕 Close Time", value=default_close, disabled=closed)
 
-    if st.button("💾 Save Store Hours"):
-        open_str = datetime.strptime(str(open_time), "%H:%M:%S").strftime("%I:%M %p")
-        close_str = datetime.strptime(str(close_time), "%H:%M:%S").strftime("%I:%M %p")
+    col1, col2 = st.columns(2)
+    if col1.button("💾 Save Store Hours"):
+        open_str = time_text(open_time)
+        close_str = time_text(close_time)
 
         try:
-            if records:
+            if current:
                 # ✅ อัปเดตเวลาเดิม
                 supabase.table("store_hours").update({
                     "Open": open_str,
-                    "Close": close_str
+                    "Close": close_str,
+                    "closed": closed
                 }).eq("id", current["id"]).eq("store_id", store_id).execute()
             else:
                 # ✅ เพิ่มเวลาใหม่
                 supabase.table("store_hours").insert({
                     "Open": open_str,
                     "Close": close_str,
+                    "closed": closed,
+                    "weekday": weekday,
                     "store_id": store_id
                 }).execute()
+            ref_cache.invalidate(store_id, "store_hours")
 
-            st.success(f"✅ Saved: {open_str} - {close_str}")
+            st.success(f"✅ Saved ({weekday_label(weekday)}): " + ("closed" if closed else f"{open_str} - {close_str}"))
             st.rerun()
 
         except Exception as e:
             st.error(f"❌ Failed to save store hours: {e}")
 
+    if current and col2.button("🗑️ Remove this day's hours"):
+        try:
+            supabase.table("store_hours").delete().eq("id", current["id"]).eq("store_id", store_id).execute()
+            ref_cache.invalidate(store_id, "store_hours")
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ Failed to remove store hours: {e}")
+
+    if records:
+        st.caption("Days with their own hours replace \"Every day\"; without an \"Every day\" row the store "
+                   "is closed on days that aren't listed.")
+        st.table([{"Day": weekday_label(r.get("weekday")),
+                   "Open": "Closed" if r.get("closed") else r["Open"],
+                   "Close": "" if r.get("closed") else r["Close"]}
+                  for r in sorted(records, key=lambda r: r.get("weekday") or 0)])
+
+
+# วันหยุด / วันที่เวลาพิเศษ (แยกร้านด้วย store_id)
+def manage_schedule_exceptions():
+    st.subheader("🏖️ Holidays & Special Hours")
+
+    store_id = st.session_state.get("store_id")
+    if not store_id:
+        st.error("❌ Store ID not found.")
+        return
+
+    names = [r["Name"] for r in ref_cache.get_therapists(supabase, store_id)]
+    whole_store = "🏪 Whole store"
+
+    day = st.date_input("📅 Date", min_value=bookings_repo.today())
+    who = st.selectbox("👤 Applies to", [whole_store] + names)
+    closed = st.checkbox("Closed / day off", value=True)
+    special_start = st.time_input("Start", value=parse_time_text(None, "10:00 AM"), disabled=closed)
+    special_end = st.time_input("End", value=parse_time_text(None, "04:00 PM"), disabled=closed)
+    note = st.text_input("✏️ Note (optional)", placeholder="e.g. Christmas Day")
+
+    if st.button("💾 Save"):
+        if not closed and special_end <= special_start:
+            st.error("❌ End must be after start.")
+        else:
+            try:
+                name = None if who == whole_store else who
+                # แทนที่รายการเดิมของวัน/คนเดียวกัน
+                previous = supabase.table("schedule_exceptions").delete() \
+                    .eq("store_id", store_id).eq("day", day.isoformat())
+                (previous.is_("Name", "null") if name is None else previous.eq("Name", name)).execute()
+                supabase.table("schedule_exceptions").insert({
+                    "store_id": store_id,
+                    "day": day.isoformat(),
+                    "Name": name,
+                    "closed": closed,
+                    "Start": None if closed else time_text(special_start),
+                    "End": None if closed else time_text(special_end),
+                    "note": note or None
+                }).execute()
+                ref_cache.invalidate(store_id, "schedule_exceptions")
+                st.success("✅ Saved.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Failed to save: {e}")
+
+    st.markdown("### 📋 Upcoming")
+    upcoming = sorted(ref_cache.get_schedule_exceptions(supabase, store_id), key=lambda r: str(r["day"]))
+    if not upcoming:
+        st.info("No holidays or special hours coming up.")
+    for row in upcoming:
+        c1, c2 = st.columns([5, 1])
+        hours = "Closed" if row.get("closed", True) else f"{row['Start']} - {row['End']}"
+        c1.write(f"{row['day']} · {row.get('Name') or whole_store} · {hours}"
+                 + (f" · {row['note']}" if row.get("note") else ""))
+        if c2.button("🗑️", key=f"exception_{row['id']}"):
+            try:
+                supabase.table("schedule_exceptions").delete().eq("id", row["id"]).eq("store_id", store_id).execute()
+                ref_cache.invalidate(store_id, "schedule_exceptions")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Failed to delete: {e}")
+
+
+MANAGE_COLUMNS = 'Date, start_time, end_time, customer_name, phone, Therapist, Type, add_on, "Add-on Price"'
+MANAGE_PAGE_SIZE = 25
+
 
 def manage_bookings():
     st.subheader("🛠 Manage Bookings")
@@ -669,22 +741,55 @@ def manage_bookings():
         st.error("❌ Store ID not found.")
         return
 
-    # 🔹 โหลด bookings เฉพาะร้านนี้
-    bookings_response = supabase.table("bookings").select("*").eq("store_id", store_id).execute()
-    massage_response = supabase.table("massage_types").select("*").eq("store_id", store_id).execute()
-    therapist_response = supabase.table("therapists").select("Name").eq("store_id", store_id).execute()
-
-    bookings_data = bookings_response.data if bookings_response.data else []
-    massage_data = massage_response.data if massage_response.data else []
-    therapist_names = [r["Name"] for r in therapist_response.data] if therapist_response.data else []
+    massage_data = ref_cache.get_massage_types(supabase, store_id)
+    therapist_names = [r["Name"] for r in ref_cache.get_therapists(supabase, store_id)]
+
+    # 🔍 ค้นหา + แบ่งหน้าฝั่ง server (ไม่โหลดทั้งตาราง)
+    col1, col2, col3 = st.columns(3)
+    search_name = col1.text_input("🔍 Customer", key="search_customer").strip()
+    search_phone = col2.text_input("📞 Phone", key="search_phone").strip()
+    search_date = col3.date_input("📅 Date", value=None, key="search_date")
+
+    filters = (store_id, search_name, search_phone, search_date)
+    if st.session_state.get("manage_filters") != filters:
+        st.session_state["manage_filters"] = filters
+        st.session_state["manage_cursors"] = [None]
+    cursors = st.session_state["manage_cursors"]
+
+    start, end = bookings_repo.day_range(search_date) if search_date else (None, None)
+    bookings_data, next_cursor, total = bookings_repo.page_bookings(
+        supabase, MANAGE_COLUMNS, store_id=store_id, start=start, end=end,
+        customer=search_name or None, phone=search_phone or None,
+        after=cursors[-1], limit=MANAGE_PAGE_SIZE
+    )
+    if total is not None:
+        st.session_state["manage_total"] = total
+    total = st.session_state.get("manage_total")
 
-    # ✅ แสดงข้อมูลทั้งหมด
+    selected_row = None
     if bookings_data:
-        df = pd.DataFrame(bookings_data)
-        st.dataframe(df, use_container_width=True)
+        st.caption(f"Page {len(cursors)} · {total} bookings · select a row to delete it")
+        df = pd.DataFrame(bookings_data).drop(columns=["id", "starts_at"])
+        table = st.dataframe(df, use_container_width=True, on_select="rerun",
+                             selection_mode="single-row", key="manage_bookings_table")
+        if table.selection.rows:
+            selected_row = bookings_data[table.selection.rows[0]]
     else:
         st.info("📭 No bookings found.")
 
+    prev_col, next_col = st.columns(2)
+    if prev_col.button("⬅️ Previous", disabled=len(cursors) == 1, key="manage_prev"):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Next ➡️", disabled=next_cursor is None, key="manage_next"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+    # ✅ ลบแถวที่เลือกด้วย id โดยตรง
+    if selected_row and st.button(f"🗑 Delete selected booking ({selected_row['customer_name']} "
+                                  f"{selected_row['Date']} {selected_row['start_time']})", key="delete_selected_booking"):
+        delete_booking(store_id, selected_row["id"], selected_row["customer_name"], selected_row["Date"])
+
     # ---------- ADD BOOKING ----------
     st.markdown("---")
     st.subheader("➕ Add New Booking")
@@ -719,14 +824,17 @@ def manage_bookings():
                 "end_time": end_str,
                 "customer_name": name,
                 "phone": phone,
-                "therapist": therapist,
-                "type": type_selected,
-                "Add-on": f"{addon_minutes} min" if addon_minutes else "",
+                "Therapist": therapist,
+                "Type": type_selected,
+                "add_on": f"{addon_minutes} min" if addon_minutes else "",
                 "Add-on Price": addon_price if addon_minutes else 0,
                 "store_id": store_id
             }
 
-            supabase.table("bookings").insert(booking_data).execute()
+            reservation = reservations.reserve_booking(supabase, booking_data)
+            if reservation.status != reservations.RESERVED:
+                st.error(reservations.failure_message(reservation))
+                return
             st.success("✅ Booking added successfully!")
             st.rerun()
 
@@ -741,67 +849,41 @@ def manage_bookings():
         st.info("No bookings available to delete.")
         return
 
-    name_to_delete = st.selectbox("Select Booking Name to Delete", [""] + df["customer_name"].unique().tolist(), key="delete_customer_name")
+    # 🔹 index (ชื่อลูกค้า, วันที่) → id ของหน้าปัจจุบัน แทนการวนหาทีละแถว
+    booking_index = bookings_repo.index_by_customer_date(bookings_data)
+    customer_names = sorted({name for name, _ in booking_index if name})
+    name_to_delete = st.selectbox("Select Booking Name to Delete", [""] + customer_names, key="delete_customer_name")
     date_to_delete = st.date_input("Booking Date to Delete", key="delete_booking_date")
 
     if st.button("Delete Booking", key="delete_booking_button") and name_to_delete:
-        try:
-            date_str = date_to_delete.strftime("%d/%m/%Y")
-            match = next((b for b in bookings_data if b["customer_name"] == name_to_delete and b["Date"] == date_str), None)
+        date_str = date_to_delete.strftime("%d/%m/%Y")
+        booking_id = booking_index.get((name_to_delete, date_str))
+        if booking_id is not None:
+            delete_booking(store_id, booking_id, name_to_delete, date_str)
+        else:
+            st.warning("⚠️ Booking not found or missing 'id' field.")
 
-            if match and "id" in match:
-                supabase.table("bookings").delete().eq("id", match["id"]).eq("store_id", store_id).execute()
-                st.success(f"✅ Deleted booking for {name_to_delete} on {date_str}")
-                st.rerun()
-            else:
-                st.warning("⚠️ Booking not found or missing 'id' field.")
-        except Exception as e:
-            st.error(f"❌ Error deleting booking: {e}")
+
+def delete_booking(store_id, booking_id, customer_name, date_str):
+    try:
+        supabase.table("bookings").delete().eq("id", booking_id).eq("store_id", store_id).execute()
+        st.success(f"✅ Deleted booking for {customer_name} on {date_str}")
+        st.rerun()
+    except Exception as e:
+        st.error(f"❌ Error deleting booking: {e}")
 
 def auto_archive_old_bookings():
     try:
-        today = datetime.today().date()
         store_id = st.session_state.get("store_id")
         if not store_id:
             st.error("❌ Store ID not found.")
             return
 
-        # ✅ ดึงเฉพาะ bookings ของร้านนี้
-        response = supabase.table("bookings").select("*").eq("store_id", store_id).execute()
-        data = response.data if response.data else []
-
-        to_archive = []
-        for row in data:
-            try:
-                booking_date = datetime.strptime(row["Date"], "%d/%m/%Y").date()
-                if booking_date < today:
-                    to_archive.append(row)
-            except Exception as e:
-                print(f"⚠️ Failed to parse date for row: {row} | {e}")
-
-        archived_count = 0
-        failed_count = 0
-
-        for row in to_archive:
-            try:
-                if "id" in row:
-                    # ✅ ใส่ store_id ลงไปตอน archive ด้วย
-                    archived_data = row.copy()
-                    archived_data["store_id"] = store_id
-
-                    supabase.table("archived_bookings").insert(archived_data).execute()
-                    supabase.table("bookings").delete().eq("id", row["id"]).eq("store_id", store_id).execute()
-                    archived_count += 1
-                else:
-                    failed_count += 1
-            except Exception as e:
-                print(f"❌ Failed to archive row: {row} | {e}")
-                failed_count += 1
+        # ✅ ย้าย bookings ที่หมดอายุทั้งหมดฝั่ง server เป็น batch (INSERT ... SELECT + DELETE)
+        result = archiver.archive_expired(supabase, store_id)
 
-        if archived_count > 0:
-            st.info(f"📦 Archived {archived_count} past bookings.")
-        elif failed_count > 0:
-            st.warning(f"⚠️ Found {failed_count} expired bookings but couldn't archive due to missing 'id'.")
+        if result.moved > 0:
+            st.info(f"📦 Archived {result.moved} past bookings in {result.elapsed:.2f}s.")
         else:
             st.info("📅 No old bookings to archive.")
 
@@ -816,6 +898,10 @@ def view_archived_bookings():
         st.error("❌ Store ID not found.")
         return
 
+    # ✅ ปกติ archive อัตโนมัติทุกคืน (archive_expired_bookings_job) — ปุ่มนี้สำหรับสั่งทันที
+    if st.button("📦 Archive past bookings now"):
+        auto_archive_old_bookings()
+
     try:
         # ✅ โหลดเฉพาะ bookings ที่ตรงกับ store_id
         response = supabase.table("archived_bookings").select("*").eq("store_id", store_id).execute()
@@ -851,75 +937,73 @@ def play_notification():
     </script>
     """, height=0)
 
-# ---------- DETECT NEW BOOKING BY ROW (WITH store_id) ----------
+# ---------- BOOKING CHANGE FEED + CALENDAR WINDOWS (one per session, WITH store_id) ----------
+def get_booking_feed(store_id):
+    feed = st.session_state.get("booking_feed")
+    if feed is None or feed.store_id != store_id:
+        feed = BookingFeed(store_id)
+        st.session_state["booking_feed"] = feed
+    return feed
+
+
+def get_booking_windows(store_id):
+    windows = st.session_state.get("booking_windows")
+    if windows is None or windows.store_id != store_id:
+        windows = bookings_repo.BookingWindows(store_id)
+        st.session_state["booking_windows"] = windows
+    return windows
+
+
+# ---------- DETECT NEW BOOKING FROM THE FEED DELTA ----------
 def play_notification_on_new_booking():
     store_id = st.session_state.get("store_id")
     if not store_id:
         return
 
-    # โหลด bookings เฉพาะร้าน
-    response = supabase.table("bookings").select("id").eq("store_id", store_id).execute()
-    current_ids = set([row["id"] for row in response.data]) if response.data else set()
-    current_count = len(current_ids)
+    # ดึงเฉพาะรายการที่เปลี่ยนตั้งแต่ tick ที่แล้ว
+    delta = get_booking_feed(store_id).sync(supabase)
+    get_booking_windows(store_id).apply(delta)
 
-    # ถ้ายังไม่มี session state ก็สร้างใหม่
-    if "previous_booking_count" not in st.session_state:
-        st.session_state.previous_booking_count = current_count
-        return
-
-    # ตรวจจับการเพิ่ม row
-    if current_count > st.session_state.previous_booking_count:
+    # โหลดครั้งแรกไม่ต้องเล่นเสียง
+    if not delta.initial and delta.inserted:
         play_notification()
 
-    # อัปเดต count ล่าสุด
-    st.session_state.previous_booking_count = current_count
-
 def main():
     if not check_login():
+        instrumentation.begin_run("admin.login")
         login()
         return
 
     # ✅ รีเฟรชทุก 20 วินาที
     st_autorefresh(interval=20 * 1000, key="refresh")
 
-    # ✅ ตรวจจับ booking ใหม่และเล่นเสียง
-    play_notification_on_new_booking()
-
-
     st.sidebar.title("🛠 Admin Menu")
-    menu = st.sidebar.radio("Select", [
-        "Calendar View", "📦 View Archived Bookings", "📊 Weekly Summary", "💸 Staff Payment",
-        "👨‍⚕️ Manage Therapists", "💆 Massage Types",
-        "🕒 Set Working Hours", "🏪 Store Hours",
-        "🛠 Manage Bookings", "🔓 Logout"
-    ])
-
-
-
+    views = {
+        "Calendar View": calendar_view,
+        "📦 View Archived Bookings": view_archived_bookings,
+        "📊 Weekly Summary": weekly_summary,
+        "💸 Staff Payment": staff_payment_summary,
+        "👨‍⚕️ Manage Therapists": manage_therapists,
+        "💆 Massage Types": manage_massage_types,
+        "🕒 Set Working Hours": manage_therapist_times,
+        "🏪 Store Hours": manage_store_hours,
+        "🏖️ Holidays & Special Hours": manage_schedule_exceptions,
+        "🛠 Manage Bookings": manage_bookings,
+        "🔓 Logout": logout,
+    }
+    menu = st.sidebar.radio("Select", list(views))
+    view = views[menu]
 
+    # ✅ นับ round trip แยกตามเมนู (?debug=1 / METRICS_PORT)
+    instrumentation.begin_run(f"admin.{view.__name__}", store_id=st.session_state.get("store_id"))
 
-    if menu == "Calendar View":
-        auto_archive_old_bookings()  # ✅ ถูกที่
+    # ✅ ตรวจจับ booking ใหม่และเล่นเสียง
+    with instrumentation.scope(function="play_notification_on_new_booking"):
         play_notification_on_new_booking()
-        calendar_view()
-    elif menu == "📦 View Archived Bookings":
-        view_archived_bookings()
-    elif menu == "📊 Weekly Summary":
-        weekly_summary()
-    elif menu == "👨‍⚕️ Manage Therapists":
-        manage_therapists()
-    elif menu == "💆 Massage Types":
-        manage_massage_types()
-    elif menu == "🕒 Set Working Hours":
-        manage_therapist_times()
-    elif menu == "🏪 Store Hours":
-        manage_store_hours()
-    elif menu == "🛠 Manage Bookings":
-        manage_bookings()
-    elif menu == "🔓 Logout":
-        logout()
-    elif menu == "💸 Staff Payment":
-        staff_payment_summary()
+
+    with instrumentation.scope(function=view.__name__):
+        view()
+    instrumentation.debug_panel()
 
 
 if __name__ == "__main__":
@@ -1,20 +1,27 @@
 import streamlit as st
-from supabase import create_client
-from datetime import datetime, timedelta, time
+import db
+from datetime import datetime, timedelta
 import pytz
 import yagmail
 import uuid
+import availability
+import reservations
+import outbox
+import ref_cache
+import instrumentation
+import rate_limit
 
 # ------------------ Load Secrets ------------------
 url = st.secrets["SUPABASE_URL"]
 key = st.secrets["SUPABASE_KEY"]
 EMAIL = st.secrets["EMAIL_SENDER"]
 EMAIL_APP_PASSWORD = st.secrets["EMAIL_APP_PASSWORD"]
-supabase = create_client(url, key)
+supabase = db.get_client(url, key)  # ✅ one pooled client per process
 melbourne_tz = pytz.timezone("Australia/Melbourne")
 
 # ------------------ Set Page Config ------------------
 st.set_page_config(page_title="MelBooking - Booking", layout="centered")
+instrumentation.begin_run("booking")  # labels for the process-wide call metrics
 
 def is_valid_uuid(value):
     try:
@@ -28,27 +35,55 @@ query_params = st.query_params
 store_id = query_params.get("store_id")
 store_slug = query_params.get("store_slug") or query_params.get("store")
 
-if store_id and is_valid_uuid(store_id):
-    response = supabase.table("stores").select("id").eq("id", store_id).limit(1).execute()
-elif store_slug:
-    response = supabase.table("stores").select("id").eq("store_slug", store_slug).limit(1).execute()
-else:
+if not (store_id and is_valid_uuid(store_id)) and not store_slug:
     st.error("❌ Please access the page using a valid link with store_id or store_slug.")
     st.stop()
 
-if not response or not response.data or not isinstance(response.data, list) or len(response.data) == 0:
+# ✅ ร้าน + เวลาเปิด + พนักงาน + บริการ ในคำขอเดียว (cache ต่อร้านแบบ TTL สั้น)
+bootstrap = ref_cache.get_booking_bootstrap(
+    supabase,
+    store_id=store_id if store_id and is_valid_uuid(store_id) else None,
+    store_slug=store_slug
+)
+
+if not bootstrap:
     st.error("❌ Store not found. Please check the link again.")
     st.stop()
 
-first_row = response.data[0]
-store_id = first_row.get("id")
+store_id = bootstrap["store"].get("id")
 
 if not store_id:
     st.error("❌ Invalid store ID. Please verify your store data in Supabase.")
     st.stop()
 
+instrumentation.set_scope(store_id=store_id)
+
+# ✅ จากนี้ไปทุกคำขอใช้ token ของร้านนี้ -> RLS กรอง store_id ที่ฝั่ง DB (sql/011)
+supabase = db.get_store_client(url, key, st.secrets["SUPABASE_JWT_SECRET"], store_id)
+
+# ------------------ Rate limiting (per store + per client) ------------------
+def current_client():
+    try:
+        return rate_limit.client_fingerprint(st.context.headers, getattr(st.context, "ip_address", None))
+    except AttributeError:  # Streamlit without st.context
+        return rate_limit.client_fingerprint({})
+
+
+client_id = current_client()
+
+# ------------------ Email Outbox Worker (one per process) ------------------
+@st.cache_resource
+def get_outbox_worker():
+    # the outbox serves every store in the process: service_role, since email_outbox is under RLS (sql/011)
+    worker = outbox.OutboxWorker(db.get_client(url, st.secrets["SUPABASE_SERVICE_ROLE_KEY"]), lambda: instrumentation.InstrumentedSender(yagmail.SMTP(EMAIL, EMAIL_APP_PASSWORD)))
+    worker.start()
+    return worker
+
+
+outbox_worker = get_outbox_worker()  # ✅ start with the process, not on the first booking
+
 # ------------------ Email Function ------------------
-def send_confirmation_email(name, phone, email, service_type, provider, date, start, end, note, addon_names):
+def confirmation_email(name, phone, email, service_type, provider, date, start, end, note, addon_names):
     body = f"""
 🙏 Thank you for booking with MelBooking!
 
@@ -64,28 +99,36 @@ def send_confirmation_email(name, phone, email, service_type, provider, date, st
 
 We look forward to seeing you! ❤️
 """
-    yag = yagmail.SMTP(EMAIL, EMAIL_APP_PASSWORD)
-    yag.send(to=email, subject="🛎️ Service Booking Confirmed", contents=body)
-
-# ------------------ Get Store Open/Close ------------------
-def get_store_hours():
-    try:
-        response = supabase.table("store_hours").select("Open, Close").eq("store_id", store_id).limit(1).execute()
-        data = response.data
-        if data:
-            open_time = datetime.strptime(data[0]["Open"], "%I:%M %p").time()
-            close_time = datetime.strptime(data[0]["Close"], "%I:%M %p").time()
-            return open_time, close_time
-    except:
-        pass
-    return time(10, 0), time(20, 0)
+    return outbox.email_payload(email, "🛎️ Service Booking Confirmed", body)
+
+# ------------------ Day Schedule (store hours ∩ shifts − breaks, holidays) ------------------
+@instrumentation.traced
+def get_day_schedule(date):
+    # compiled per (store, date) in ref_cache: one bookable-minute mask per provider
+    return ref_cache.get_day_schedule(supabase, store_id, date)
+
+# ------------------ Day Bookings (shed lookups reuse the last result) ------------------
+@instrumentation.traced
+def load_day_bookings(date):
+    # -> (rows, stale); rows is None when shed and nothing is cached for this day yet
+    key = (store_id, date)
+    if rate_limit.limiter.allow("lookup", store_id, client_id):
+        rows = availability.load_day_bookings(supabase, store_id, date)
+        rate_limit.last_good.put(key, rows)
+        return rows, False
+    return rate_limit.last_good.get(key), True
 
 # ------------------ Booking Page ------------------
+ANY_PROVIDER = "✨ Any provider"
+RECOMMENDED_SLOTS = 8  # "Any provider": best-fitting slots across all providers
+
+
+@instrumentation.traced
 def booking_page():
     st.title("📅 MelBooking: Book Your Service")
 
-    therapists_data = supabase.table("therapists").select("*").eq("store_id", store_id).execute().data or []
-    service_types_data = supabase.table("massage_types").select("*").eq("store_id", store_id).execute().data or []
+    therapists_data = ref_cache.get_therapists(supabase, store_id)
+    service_types_data = ref_cache.get_massage_types(supabase, store_id)
     main_service_types = [m for m in service_types_data if not m.get("is_addon", False)]
     addon_types = [a for a in service_types_data if a.get("is_addon", False)]
 
@@ -112,27 +155,46 @@ def booking_page():
         selected_addons = st.multiselect("➕ Extras (optional)", options=addon_types,
                                          format_func=lambda a: f"{a['Type']} (+${a['Price-hour']})") if addon_types else []
 
-        provider = st.selectbox("👤 Service Provider", providers)
+        provider = st.selectbox("👤 Service Provider", [ANY_PROVIDER] + providers)
         date = st.date_input("📅 Select Date", min_value=today)
         duration_text = st.selectbox("⏱ Duration", ["30 mins", "45 mins", "1 hour", "1.5 hours", "2 hours"])
         durations = {"30 mins": 30, "45 mins": 45, "1 hour": 60, "1.5 hours": 90, "2 hours": 120}
         duration = durations[duration_text]
         note = st.text_area("✏️ Additional Notes (optional)")
 
-        store_open, store_close = get_store_hours()
-        slot_time = melbourne_tz.localize(datetime.combine(date, store_open))
-        end_limit = melbourne_tz.localize(datetime.combine(date, store_close)) - timedelta(minutes=duration)
+        day = get_day_schedule(date)
+        day_bookings, stale = load_day_bookings(date)
+        busy = availability.build_busy_index(day_bookings or [])
+        if day_bookings is None:
+            st.warning("🚦 We're very busy right now. Please try again in a few seconds.")
+            slots = []
+        elif day.open_minute is None:
+            st.info("🏖️ The store is closed on this date. Please choose another day.")
+            slots = []
+        elif provider == ANY_PROVIDER:
+            # ✅ ช่วงเวลาที่ต่อกับคิวเดิมได้พอดีมาก่อน (ลดช่องว่างเล็ก ๆ ที่ขายไม่ได้)
+            slots = availability.rank_slots(day.windows, busy, duration, day.open_minute, limit=RECOMMENDED_SLOTS)
+        else:
+            starts = availability.window_starts(day.windows.get(provider, 0), busy.get(provider, 0), duration,
+                                                day.open_minute)
+            slots = [availability.Slot(availability.minutes_to_time(m), provider, 0) for m in starts]
 
         available_times = []
         time_map = {}
 
-        while slot_time <= end_limit:
+        for slot in slots:
+            slot_time = melbourne_tz.localize(datetime.combine(date, slot.start))
             display = slot_time.strftime("%I:%M %p")
+            if provider == ANY_PROVIDER:
+                display += f" — {slot.provider}"
             available_times.append(display)
-            time_map[display] = slot_time
-            slot_time += timedelta(minutes=15)
+            time_map[display] = (slot_time, slot.provider)
 
-        selected_time_str = st.selectbox("🕒 Available Time", options=["-- Please select a time --"] + available_times)
+        if stale and day_bookings is not None:
+            st.caption("⏳ High demand: showing availability from a few moments ago. "
+                       "Your time is checked again when you confirm.")
+        time_label = "🕒 Available Time (best fit first)" if provider == ANY_PROVIDER else "🕒 Available Time"
+        selected_time_str = st.selectbox(time_label, options=["-- Please select a time --"] + available_times)
 
         confirm = st.form_submit_button("✅ Confirm Booking")
 
@@ -141,10 +203,11 @@ def booking_page():
                 st.error("❗ Please select a time before confirming.")
                 return
 
-            selected_dt = time_map.get(selected_time_str)
-            if not selected_dt:
+            selected = time_map.get(selected_time_str)
+            if not selected:
                 st.error("❌ Invalid time selected.")
                 return
+            selected_dt, provider = selected
 
             if not email.strip():
                 st.error("📧 Please enter your email address.")
@@ -153,11 +216,16 @@ def booking_page():
                 st.error("📞 Please enter your phone number.")
                 return
 
+            # 🚦 ยืนยันได้จำกัดต่อคน/ต่อร้าน (insert + อีเมล)
+            if not rate_limit.limiter.allow("confirm", store_id, client_id):
+                st.error("🚦 Too many booking attempts. Please wait a minute and try again.")
+                return
+
             end_dt = selected_dt + timedelta(minutes=duration)
             addon_price = sum(float(a["Price-hour"]) for a in selected_addons)
             addon_names = ", ".join(a["Type"] for a in selected_addons)
 
-            supabase.table("bookings").insert({
+            reservation = reservations.reserve_booking(supabase, {
                 "store_id": store_id,
                 "Date": selected_dt.strftime("%d/%m/%Y"),
                 "start_time": selected_dt.strftime("%I:%M %p"),
@@ -168,10 +236,13 @@ def booking_page():
                 "Type": service_type,
                 "add_on": addon_names,
                 "Add-on Price": addon_price
-            }).execute()
+            }, email=confirmation_email(name, phone, email, service_type, provider, date, selected_dt, end_dt, note, addon_names))
+            if reservation.status != reservations.RESERVED:
+                st.error(reservations.failure_message(reservation))
+                return
 
-            send_confirmation_email(name, phone, email, service_type, provider, date, selected_dt, end_dt, note, addon_names)
-            st.success(f"🎉 Booking confirmed on {date.strftime('%d/%m/%Y')} at {selected_time_str} with {provider}")
+            outbox_worker.wake()  # อีเมลถูกบันทึกพร้อม booking แล้ว แค่ปลุก worker
+            st.success(f"🎉 Booking confirmed on {date.strftime('%d/%m/%Y')} at {selected_dt.strftime('%I:%M %p')} with {provider}")
 
 # ------------------ Run ------------------
 booking_page()
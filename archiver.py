@@ -0,0 +1,37 @@
+import time
+from collections import namedtuple
+
+# ------------------ Bulk archiving ------------------
+# Calls archive_expired_bookings (sql/005_archive_expired_bookings.sql), which moves
+# expired bookings server-side in bounded, transactional batches.
+
+BATCH_SIZE = 500
+
+ArchiveResult = namedtuple("ArchiveResult", ["moved", "batches", "elapsed"])
+
+
+def archive_expired(supabase, store_id=None, batch_size=BATCH_SIZE, before=None):
+    moved = 0
+    batches = 0
+    started = time.perf_counter()
+    while True:
+        count = supabase.rpc("archive_expired_bookings", {
+            "p_store_id": store_id,
+            "p_before": before.isoformat() if before else None,
+            "p_batch_size": batch_size
+        }).execute().data or 0
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    return ArchiveResult(moved, batches, time.perf_counter() - started)
+
+
+# ------------------ Scheduled run: python archiver.py (all stores) ------------------
+if __name__ == "__main__":
+    import os
+    import db
+
+    client = db.client_from_env()
+    result = archive_expired(client, store_id=os.environ.get("STORE_ID"))
+    print(f"📦 Archived {result.moved} bookings in {result.batches} batches ({result.elapsed:.2f}s)")
@@ -0,0 +1,137 @@
+import heapq
+from collections import namedtuple
+from datetime import datetime, time
+from functools import lru_cache
+
+# ------------------ Formats (same as the bookings table) ------------------
+DATE_FORMAT = "%d/%m/%Y"
+TIME_FORMAT = "%I:%M %p"
+MINUTES_PER_DAY = 24 * 60
+SLOT_STEP = 15
+
+
+# ------------------ Minute helpers ------------------
+@lru_cache(maxsize=2048)
+def parse_minutes(text):
+    # "10:30 AM" -> 630 (cached: a day has at most 1440 distinct values)
+    parsed = datetime.strptime(text.strip(), TIME_FORMAT)
+    return parsed.hour * 60 + parsed.minute
+
+
+def to_minutes(value):
+    if isinstance(value, str):
+        return parse_minutes(value)
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def span_mask(start, end):
+    # bit i is set for every minute start <= i < end
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def runs_of(free, length):
+    # bit i is set when minutes i .. i+length-1 are all free
+    result = free
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+# ------------------ Interval index ------------------
+def build_busy_index(bookings):
+    # {provider: busy-minute bitmap} built in one pass over the day's bookings
+    index = {}
+    for row in bookings:
+        try:
+            start = to_minutes(row["start_time"])
+            end = to_minutes(row["end_time"])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        provider = row.get("Therapist", "")
+        index[provider] = index.get(provider, 0) | span_mask(start, end)
+    return index
+
+
+def load_day_bookings(supabase, store_id, date):
+    response = (
+        supabase.table("bookings")
+        .select("Therapist, start_time, end_time")
+        .eq("store_id", store_id)
+        .eq("Date", date.strftime(DATE_FORMAT))
+        .execute()
+    )
+    return response.data or []
+
+
+# ------------------ Free slots ------------------
+def _grid_start(minute, origin, step):
+    # first point of the origin + k * step grid at or after minute
+    return origin + -(-(minute - origin) // step) * step
+
+
+def window_starts(window, busy_mask, duration, origin, step=SLOT_STEP):
+    # grid start minutes where [start, start + duration) is inside window and not busy
+    if duration <= 0 or not window:
+        return []
+    fits = runs_of(window & ~busy_mask, duration)
+    first = _grid_start((window & -window).bit_length() - 1, origin, step)
+    return [
+        minute
+        for minute in range(first, window.bit_length() - duration + 1, step)
+        if fits >> minute & 1
+    ]
+
+
+# ------------------ "Any provider" recommendations ------------------
+# Every provider's free intervals inside store hours ∩ shift; each grid start in an
+# interval leaves a gap before and after the booking. Flush starts (gap 0, i.e. back
+# to back with a booking or a shift edge) cost nothing, a gap that still fits the
+# shortest service costs MIN_GAP (one more split block), and a gap too short to sell
+# costs MIN_GAP + its length. Lowest total cost wins; ties go to the earlier start.
+
+MIN_GAP = 30  # shortest bookable duration
+
+Slot = namedtuple("Slot", ["start", "provider", "cost"])
+
+
+def free_intervals(free):
+    # [(start, end), ...] for each run of set bits, lowest first
+    intervals = []
+    while free:
+        start = (free & -free).bit_length() - 1
+        rest = free >> start
+        length = (~rest & (rest + 1)).bit_length() - 1
+        intervals.append((start, start + length))
+        free &= ~span_mask(start, start + length)
+    return intervals
+
+
+def gap_cost(gap, min_gap=MIN_GAP):
+    if gap == 0:
+        return 0
+    if gap < min_gap:
+        return min_gap + gap
+    return min_gap
+
+
+def rank_slots(windows, busy, duration, origin, step=SLOT_STEP, limit=5, min_gap=MIN_GAP):
+    # windows: {provider: bookable-minute mask}, busy: build_busy_index() of the day
+    best = {}  # start minute -> Slot
+    for provider, window in windows.items():
+        for start, end in free_intervals(window & ~busy.get(provider, 0)):
+            for minute in range(_grid_start(start, origin, step), end - duration + 1, step):
+                cost = gap_cost(minute - start, min_gap) + gap_cost(end - minute - duration, min_gap)
+                current = best.get(minute)
+                if current is None or cost < current.cost:
+                    best[minute] = Slot(minute, provider, cost)
+    ranked = heapq.nsmallest(limit, best.values(), key=lambda slot: (slot.cost, slot.start))
+    return [Slot(minutes_to_time(slot.start), slot.provider, slot.cost) for slot in ranked]
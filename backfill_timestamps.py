@@ -0,0 +1,34 @@
+# ------------------ Backfill starts_at / ends_at ------------------
+# Usage: SUPABASE_URL=... SUPABASE_KEY=<service key> python backfill_timestamps.py [batch_size]
+# Fills the typed timestamp columns added by sql/003_booking_timestamps.sql for
+# existing bookings and archived_bookings rows, one server-side batch at a time.
+import sys
+import time
+
+import db
+
+TABLES = ["bookings", "archived_bookings"]
+
+
+def backfill(supabase, table, batch_size=1000):
+    total = 0
+    started = time.perf_counter()
+    while True:
+        updated = supabase.rpc("backfill_booking_timestamps", {
+            "p_table": table,
+            "p_batch_size": batch_size
+        }).execute().data or 0
+        if not updated:
+            break
+        total += updated
+        print(f"⏳ {table}: {total} rows backfilled ({time.perf_counter() - started:.1f}s)")
+    unparsed = supabase.rpc("count_unparsed_bookings", {"p_table": table}).execute().data or 0
+    print(f"✅ {table}: {total} rows backfilled, {unparsed} rows with unparseable Date/start_time left as NULL")
+    return total, unparsed
+
+
+if __name__ == "__main__":
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    client = db.client_from_env()
+    for name in TABLES:
+        backfill(client, name, batch)
@@ -0,0 +1,83 @@
+# ------------------ Micro-benchmark: booking rows -> calendar events ------------------
+# Usage: python benchmarks/bench_calendar_events.py [rows ...]
+# Compares the previous per-row loop in calendar_view() (strptime x3, localize x2,
+# isoformat x2 per row) with calendar_events.bookings_to_events(), which keeps a loop
+# of its own below calendar_events.VECTORIZE_MIN_ROWS.
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calendar_events  # noqa: E402
+
+THERAPISTS = [f"Therapist {i}" for i in range(12)]
+COLORS = {name: {"id": f"t_{i}", "color": "#f44336"} for i, name in enumerate(THERAPISTS)}
+
+
+def make_bookings(count, seed=1):
+    rng = random.Random(seed)
+    first_day = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        start = first_day + timedelta(days=rng.randrange(365), minutes=rng.randrange(40) * 15 + 600)
+        end = start + timedelta(minutes=rng.choice([30, 45, 60, 90, 120]))
+        rows.append({
+            "id": i,
+            "Date": start.strftime("%d/%m/%Y"),
+            "start_time": start.strftime("%I:%M %p"),
+            "end_time": end.strftime("%I:%M %p"),
+            "customer_name": f"Customer {i}",
+            "Type": "Thai Massage",
+            "Therapist": rng.choice(THERAPISTS),
+        })
+    return rows
+
+
+def legacy_loop(bookings, therapist_colors):
+    # the loop calendar_view() used before the vectorized path
+    events = []
+    mel_tz = pytz.timezone("Australia/Melbourne")
+    for row in bookings:
+        try:
+            date = datetime.strptime(row["Date"], "%d/%m/%Y").date()
+            start = datetime.strptime(row["start_time"], "%I:%M %p").time()
+            end = datetime.strptime(row["end_time"], "%I:%M %p").time()
+            start_iso = mel_tz.localize(datetime.combine(date, start)).isoformat()
+            end_iso = mel_tz.localize(datetime.combine(date, end)).isoformat()
+            info = therapist_colors.get(row.get("Therapist", ""))
+            if not info:
+                continue
+            events.append({
+                "id": row["id"],
+                "title": f"{row.get('customer_name', '')} - {row.get('Type', '')}",
+                "start": start_iso,
+                "end": end_iso,
+                "resourceId": info["id"],
+                "backgroundColor": info["color"],
+                "borderColor": info["color"]
+            })
+        except Exception as e:
+            print("❌ Error parsing booking:", e)
+    return events
+
+
+def best_of(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 1000, 10000]
+    for size in sizes:
+        rows = make_bookings(size)
+        legacy = legacy_loop(rows, COLORS)
+        vectorized, malformed = calendar_events.bookings_to_events(rows, COLORS)
+        assert legacy == vectorized and not malformed, "vectorized output differs from the loop"
+        legacy_s = best_of(lambda: legacy_loop(rows, COLORS))
+        vector_s = best_of(lambda: calendar_events.bookings_to_events(rows, COLORS))
+        path = "vectorized" if size >= calendar_events.VECTORIZE_MIN_ROWS else "loop"
+        print(f"{size:>7} rows  loop {legacy_s * 1000:8.1f} ms  bookings_to_events ({path}) {vector_s * 1000:8.1f} ms  "
+              f"speedup {legacy_s / vector_s:5.1f}x")
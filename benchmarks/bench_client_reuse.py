@@ -0,0 +1,86 @@
+# ------------------ Benchmark: per-rerun latency, fresh client vs shared client ------------------
+# Usage: SUPABASE_URL=... SUPABASE_KEY=... python benchmarks/bench_client_reuse.py [reruns]
+#        python benchmarks/bench_client_reuse.py [reruns] --local [--rtt-ms 20]
+# Each simulated rerun does what a page does on load: get a client, run one small
+# query. "fresh" builds a new client every time (the old module-level create_client);
+# "shared" goes through db.get_client() and reuses its keep-alive connections; "store"
+# is db.get_store_client() over ten stores, which should ride the same connections.
+# --local runs against a PostgREST-shaped HTTP/1.1 server on localhost instead: every
+# request waits one --rtt-ms, and every new connection two more (TCP + TLS handshake,
+# which plain HTTP on localhost doesn't have).
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from supabase import create_client  # noqa: E402
+
+import db  # noqa: E402
+
+
+def rerun(get_client):
+    started = time.perf_counter()
+    client = get_client()
+    client.table("stores").select("id").limit(1).execute()
+    return time.perf_counter() - started
+
+
+def local_server(rtt):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like Supabase's edge
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            time.sleep(2 * rtt)  # new connection: TCP + TLS handshake
+
+        def do_GET(self):
+            time.sleep(rtt)
+            body = json.dumps([{"id": "00000000-0000-4000-8000-000000000000"}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:>7}: mean {statistics.mean(samples) * 1000:7.1f} ms  "
+          f"p50 {statistics.median(samples) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-rerun latency with a fresh vs a shared Supabase client.")
+    parser.add_argument("reruns", type=int, nargs="?", default=30)
+    parser.add_argument("--local", action="store_true", help="use a local stand-in server instead of SUPABASE_URL")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="round trip for --local")
+    args = parser.parse_args()
+    reruns = args.reruns
+    if args.local:
+        url, key = local_server(args.rtt_ms / 1000), "local-anon-key"
+    else:
+        url, key = os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"]
+
+    fresh = [rerun(lambda: create_client(url, key)) for _ in range(reruns)]
+    shared = [rerun(lambda: db.get_client(url, key)) for _ in range(reruns)]
+    store = [rerun(lambda i=i: db.get_store_client(url, key, "bench-secret", f"store-{i % 10}")) for i in range(reruns)]
+
+    summarize("fresh", fresh)
+    summarize("shared", shared)
+    summarize("store", store)
+    print("pool:", db.pool_stats())
@@ -0,0 +1,76 @@
+# ------------------ Startup / import-cost benchmark ------------------
+# Usage: python benchmarks/bench_startup.py [--budget-ms N] [page.py ...]
+# Collects the module-level imports of each page (default admin.py and app.py),
+# times them in a fresh interpreter with `python -X importtime`,
+# and prints the heaviest top-level imports. Everything is compared with a bare
+# `import streamlit` in the same interpreter: some streamlit versions load pandas /
+# numpy themselves, so a HEAVY module only counts against a page when the page's own
+# imports are what loads it, and the time shown is what the page adds on top.
+# Exits non-zero if a page's module-level imports pull in a HEAVY module (those must
+# stay lazy) or its added import time exceeds --budget-ms.
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = {"pandas", "numpy", "pygame", "streamlit_calendar"}
+
+
+def module_imports(path):
+    tree = ast.parse(open(path, encoding="utf-8").read())
+    statements = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def import_times(statements):
+    # -> {top-level module: cumulative microseconds}, set of every module imported
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.strip().splitlines()[-1])
+    top_level, loaded = {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        loaded.add(name.strip().split(".")[0])
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*", default=["admin.py", "app.py"])
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    baseline_top, baseline_loaded = import_times(["import streamlit"])
+    baseline_ms = sum(baseline_top.values()) / 1000
+    preloaded = sorted(HEAVY & baseline_loaded)
+    print(f"📦 import streamlit: {baseline_ms:.1f} ms"
+          + (f" (already loads {', '.join(preloaded)})" if preloaded else ""))
+
+    failed = False
+    for page in args.pages:
+        top_level, loaded = import_times(module_imports(os.path.join(ROOT, page)))
+        total_ms = sum(top_level.values()) / 1000 - baseline_ms
+        heavy = sorted((HEAVY & loaded) - baseline_loaded)
+        print(f"📦 {page}: +{total_ms:.1f} ms module-level imports over bare streamlit")
+        for name, micros in sorted(top_level.items(), key=lambda kv: -kv[1])[:8]:
+            if name not in baseline_top:
+                print(f"    {micros / 1000:8.1f} ms  {name}")
+        if heavy:
+            print(f"    ❌ heavy modules imported at module level: {', '.join(heavy)}")
+            failed = True
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            print(f"    ❌ over budget ({args.budget_ms:.0f} ms)")
+            failed = True
+    sys.exit(1 if failed else 0)
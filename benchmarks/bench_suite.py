@@ -0,0 +1,240 @@
+# ------------------ Data-path benchmark suite (no UI, no database) ------------------
+# Usage: python benchmarks/bench_suite.py [--stores 3] [--bookings 5000] [--therapists 8]
+#            [--services 6] [--repeat 20] [--latency-ms 0] [--output results.json]
+#            [--compare baseline.json]
+# Seeds an in-memory Supabase stand-in (fake_supabase.py) with synthetic stores and
+# times the data path behind each view: the same helper calls the pages make, minus
+# Streamlit. Reports wall time, round trips and bytes per call, and writes JSON so
+# runs can be diffed (--compare flags paths that got slower or chattier).
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+import archiver  # noqa: E402
+import availability  # noqa: E402
+import bookings_repo  # noqa: E402
+import calendar_events  # noqa: E402
+import ref_cache  # noqa: E402
+import reports  # noqa: E402
+from change_feed import BookingFeed  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+DURATIONS = [30, 45, 60, 90, 120]
+COLORS = ["#f44336", "#3f51b5", "#009688", "#ff9800", "#9c27b0", "#03a9f4",
+          "#4caf50", "#e91e63", "#607d8b", "#cddc39", "#795548", "#00bcd4"]
+
+
+# ------------------ Synthetic data ------------------
+def seed_store(db, index, bookings, therapists, services, days, rng):
+    store_id = f"00000000-0000-4000-8000-{index:012d}"
+    db.table("stores").insert({"id": store_id, "store_name": f"Store {index}", "store_slug": f"store-{index}"}).execute()
+    db.table("store_hours").insert({"store_id": store_id, "Open": "09:00 AM", "Close": "09:00 PM"}).execute()
+    names = [f"Therapist {index}-{i}" for i in range(therapists)]
+    db.table("therapists").insert([{"store_id": store_id, "Name": n, "Rate/hour": 30 + i} for i, n in enumerate(names)]).execute()
+    db.table("therapist_times").insert([{"store_id": store_id, "Name": n, "Start": "09:00 AM", "End": "09:00 PM"} for n in names]).execute()
+    types = [f"Service {i}" for i in range(services)]
+    db.table("massage_types").insert(
+        [{"store_id": store_id, "Type": t, "Price-hour": 80 + 5 * i, "is_addon": i == services - 1 and services > 1}
+         for i, t in enumerate(types)]).execute()
+
+    # bookings spread over [today - days/2, today + days/2), 9am-9pm
+    first_day = bookings_repo.today() - timedelta(days=days // 2)
+    rows = []
+    for i in range(bookings):
+        day = first_day + timedelta(days=rng.randrange(days))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=540 + rng.randrange(40) * 15)
+        end = start + timedelta(minutes=rng.choice(DURATIONS))
+        rows.append({
+            "store_id": store_id,
+            "customer_name": f"Customer {i % 997}",
+            "phone": f"04{i % 100000000:08d}",
+            "Therapist": rng.choice(names),
+            "Type": rng.choice(types),
+            "Date": day.strftime(availability.DATE_FORMAT),
+            "start_time": start.strftime(availability.TIME_FORMAT),
+            "end_time": end.strftime(availability.TIME_FORMAT),
+            "Add-on Price": 0,
+        })
+    for i in range(0, len(rows), 1000):
+        db.table("bookings").insert(rows[i:i + 1000]).execute()
+    return store_id
+
+
+# ------------------ Data paths (one call = one page render's worth of queries) ------------------
+def booking_page(db, store_id, any_provider=False):
+    # app.booking_page(): bootstrap, compiled day schedule, the day's bookings, slots
+    bootstrap = ref_cache.get_booking_bootstrap(db, store_id=store_id)
+    date = bookings_repo.today() + timedelta(days=1)
+    day = ref_cache.get_day_schedule(db, store_id, date)
+    busy = availability.build_busy_index(availability.load_day_bookings(db, store_id, date))
+    if any_provider:
+        return availability.rank_slots(day.windows, busy, 60, day.open_minute, limit=8)
+    provider = bootstrap["therapists"][0]["Name"]
+    return availability.window_starts(day.windows.get(provider, 0), busy.get(provider, 0), 60, day.open_minute)
+
+
+def booking_page_cold(db, store_id):
+    ref_cache.clear()
+    return booking_page(db, store_id)
+
+
+def calendar_view(db, store_id, windows=None):
+    therapists = ref_cache.get_therapists(db, store_id)
+    therapist_colors = {t["Name"]: {"id": f"t_{i}", "color": COLORS[i % len(COLORS)]} for i, t in enumerate(therapists)}
+    windows = windows or bookings_repo.BookingWindows(store_id)
+    start = bookings_repo.today()
+    events, _ = calendar_events.bookings_to_events(windows.get(db, start, 1), therapist_colors)
+    windows.prefetch_neighbours(db, start, 1)
+    return events
+
+
+def weekly_summary(db, store_id):
+    start, end = reports.default_range(7)
+    return reports.income_summary(db, store_id, start, end)
+
+
+def staff_payment_summary(db, store_id):
+    start, end = reports.default_range(7)
+    return reports.therapist_pay_summary(db, store_id, start, end)
+
+
+# ------------------ Measurement ------------------
+def measure(db, name, call, repeat):
+    # timings exclude the stand-in's own work (db.stats["server_seconds"]) but include
+    # --latency-ms, so they approximate app time + network for a fixed-cost database
+    timings = []
+    traffic = {"round_trips": 0, "bytes_sent": 0, "bytes_received": 0}
+    for _ in range(repeat):
+        db.reset_stats()
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started - db.stats["server_seconds"]) * 1000)
+        for key in traffic:
+            traffic[key] += db.stats[key]
+    timings.sort()
+    return {
+        "name": name,
+        "runs": repeat,
+        "ms_median": round(statistics.median(timings), 3),
+        "ms_p95": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "ms_min": round(timings[0], 3),
+        **{key: round(value / repeat, 1) for key, value in traffic.items()},
+    }
+
+
+def run_suite(args):
+    rng = random.Random(args.seed)
+    db = FakeSupabase()
+    store_ids = [seed_store(db, i, args.bookings, args.therapists, args.services, args.days, rng)
+                 for i in range(args.stores)]
+    db.latency = args.latency_ms / 1000
+    store_id = store_ids[0]
+    results = []
+
+    ref_cache.clear()
+    results.append(measure(db, "booking_page (cold cache)", lambda: booking_page_cold(db, store_id), args.repeat))
+    results.append(measure(db, "booking_page (warm cache)", lambda: booking_page(db, store_id), args.repeat))
+    results.append(measure(db, "booking_page (any provider)",
+                           lambda: booking_page(db, store_id, any_provider=True), args.repeat))
+    results.append(measure(db, "calendar_view (new session)", lambda: calendar_view(db, store_id), args.repeat))
+    windows = bookings_repo.BookingWindows(store_id)
+    calendar_view(db, store_id, windows)
+    results.append(measure(db, "calendar_view (rerun)", lambda: calendar_view(db, store_id, windows), args.repeat))
+    results.append(measure(db, "weekly_summary", lambda: weekly_summary(db, store_id), args.repeat))
+    results.append(measure(db, "staff_payment_summary", lambda: staff_payment_summary(db, store_id), args.repeat))
+
+    # play_notification_on_new_booking: an idle autorefresh tick, then a tick that sees new bookings
+    feed = BookingFeed(store_id)
+    feed.sync(db)
+    results.append(measure(db, "play_notification (idle tick)", lambda: windows.apply(feed.sync(db)), args.repeat))
+
+    def tick_with_inserts():
+        # the inserts come from other sessions; only the admin's sync is measured
+        for i in range(4):
+            db._insert("bookings", {
+                "store_id": store_id, "customer_name": "Bench", "Therapist": f"Therapist 0-{i % args.therapists}",
+                "Type": "Service 0", "Date": "01/01/2100", "start_time": "10:00 AM", "end_time": "11:00 AM",
+            })
+        windows.apply(feed.sync(db))
+
+    results.append(measure(db, "play_notification (4 new bookings)", tick_with_inserts, args.repeat))
+
+    # auto_archive_old_bookings is destructive: one run over every store
+    results.append(measure(db, "auto_archive_old_bookings", lambda: archiver.archive_expired(db), 1))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=HERE, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get(r["name"])
+        if not old:
+            continue
+        # sub-millisecond paths are all noise, so a slowdown also has to be >= 0.5 ms
+        slower = r["ms_median"] > max(old["ms_median"] * (1 + tolerance), old["ms_median"] + 0.5)
+        chattier = r["round_trips"] > old["round_trips"] or r["bytes_received"] > old["bytes_received"] * (1 + tolerance)
+        flag = "  <-- regression" if slower or chattier else ""
+        print(f"{r['name']:<38} {old['ms_median']:>9.2f} -> {r['ms_median']:>9.2f} ms"
+              f"  {old['round_trips']:>5} -> {r['round_trips']:>5} trips{flag}")
+        if flag:
+            regressions.append(r["name"])
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the app's data paths against an in-memory Supabase stand-in.")
+    parser.add_argument("--stores", type=int, default=3)
+    parser.add_argument("--bookings", type=int, default=5000, help="bookings per store")
+    parser.add_argument("--therapists", type=int, default=8, help="therapists per store")
+    parser.add_argument("--services", type=int, default=6, help="services per store (the last one is an add-on)")
+    parser.add_argument("--days", type=int, default=120, help="days the bookings are spread over, centred on today")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated round-trip latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before --compare fails")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    print(f"{'path':<38} {'median ms':>10} {'p95 ms':>9} {'trips':>6} {'KB in':>9}")
+    for r in results:
+        print(f"{r['name']:<38} {r['ms_median']:>10.2f} {r['ms_p95']:>9.2f} {r['round_trips']:>6} "
+              f"{r['bytes_received'] / 1024:>9.1f}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare, args.tolerance) else 0)
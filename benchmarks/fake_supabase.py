@@ -0,0 +1,546 @@
+# ------------------ In-memory Supabase / PostgREST stand-in ------------------
+# Enough of the supabase-py query builder (select / filters / order / limit /
+# insert / upsert / update / delete / rpc) and of the SQL side (sql/*.sql triggers
+# and RPCs) to run the app's data paths locally without a database. Every
+# execute() counts as one round trip; request and response sizes are measured as
+# JSON so benchmarks can report bytes on the wire. An optional per-request
+# latency models the network hop to Supabase.
+import contextlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import pytz
+
+TIMEZONE = pytz.timezone("Australia/Melbourne")
+TIMESTAMP_COLUMNS = {"starts_at", "ends_at", "changed_at", "next_attempt_at", "created_at", "sent_at"}
+STATEMENT_GAP = 0.002  # seconds between two statements of one RPC that runs outside the global lock
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+        self.status_code = 200
+
+
+# ------------------ Value helpers ------------------
+def _to_utc_iso(local_date, local_time):
+    try:
+        naive = datetime.strptime(f"{local_date} {local_time}", "%d/%m/%Y %I:%M %p")
+    except (TypeError, ValueError):
+        return None
+    return TIMEZONE.localize(naive).astimezone(timezone.utc).isoformat()
+
+
+def _coerce(column, value):
+    if column in TIMESTAMP_COLUMNS and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _compare(op, left, right):
+    if left is None:
+        return False
+    try:
+        if op == "eq":
+            return left == right or str(left) == str(right)
+        if op == "gt":
+            return left > right
+        if op == "gte":
+            return left >= right
+        if op == "lt":
+            return left < right
+        if op == "lte":
+            return left <= right
+    except TypeError:
+        return str(left) > str(right) if op in ("gt", "gte") else str(left) < str(right)
+    raise ValueError(op)
+
+
+def _like(pattern):
+    return re.compile("^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$", re.IGNORECASE)
+
+
+def _split_top_level(text):
+    parts, depth, current, quoted = [], 0, "", False
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += ch
+    parts.append(current)
+    return parts
+
+
+def _parse_or(expression):
+    # PostgREST logic tree: "a.lt.1,and(b.eq.2,c.lt.3)" -> predicate(row)
+    predicates = []
+    for part in _split_top_level(expression):
+        if part.startswith("and(") and part.endswith(")"):
+            inner = [_parse_condition(p) for p in _split_top_level(part[4:-1])]
+            predicates.append(lambda row, inner=inner: all(p(row) for p in inner))
+        elif part.startswith("or(") and part.endswith(")"):
+            predicates.append(_parse_or(part[3:-1]))
+        else:
+            predicates.append(_parse_condition(part))
+    return lambda row: any(p(row) for p in predicates)
+
+
+def _parse_condition(text):
+    column, op, value = text.split(".", 2)
+    value = value.strip('"')
+    right = _coerce(column, value)
+    return lambda row: _compare(op, _coerce(column, row.get(column)), right)
+
+
+def _columns(spec):
+    spec = spec.strip()
+    if spec == "*":
+        return None
+    return [c.strip().strip('"') for c in _split_top_level(spec) if c.strip()]
+
+
+# ------------------ Query builder ------------------
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table_name = table
+        self.action = "select"
+        self.columns = None
+        self.count_method = None
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+        self.payload = None
+        self.negate_next = False
+        self.request = {"table": table, "filters": []}
+
+    # -- actions
+    def select(self, *columns, count=None):
+        self.columns = _columns(",".join(columns) if columns else "*")
+        self.count_method = count
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="id"):
+        self.action, self.payload = "upsert", payload
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # -- filters
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def _filter(self, description, predicate):
+        if self.negate_next:
+            self.negate_next = False
+            inner = predicate
+            predicate = lambda row: not inner(row)  # noqa: E731
+            description = "not." + description
+        self.filters.append(predicate)
+        self.request["filters"].append(description)
+        return self
+
+    def _op(self, op, column, value):
+        right = _coerce(column, value)
+        return self._filter(f"{column}.{op}.{value}", lambda row: _compare(op, _coerce(column, row.get(column)), right))
+
+    def eq(self, column, value):
+        return self._op("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter(f"{column}.neq.{value}", lambda row: row.get(column) != value)
+
+    def gt(self, column, value):
+        return self._op("gt", column, value)
+
+    def gte(self, column, value):
+        return self._op("gte", column, value)
+
+    def lt(self, column, value):
+        return self._op("lt", column, value)
+
+    def lte(self, column, value):
+        return self._op("lte", column, value)
+
+    def in_(self, column, values):
+        wanted = {str(v) for v in values}
+        return self._filter(f"{column}.in.{sorted(wanted)}", lambda row: str(row.get(column)) in wanted)
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern)
+        return self._filter(f"{column}.ilike.{pattern}", lambda row: bool(regex.match(str(row.get(column) or ""))))
+
+    def is_(self, column, value):
+        expected = None if value in ("null", None) else value
+        return self._filter(f"{column}.is.{value}", lambda row: row.get(column) is expected)
+
+    def or_(self, expression):
+        return self._filter(f"or({expression})", _parse_or(expression))
+
+    # -- modifiers
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.row_limit = end - start + 1
+        return self
+
+    def execute(self):
+        self.request.update(action=self.action, payload=self.payload)
+        return self.db._round_trip(self.request, lambda: self._run())
+
+    def _run(self):
+        rows = self.db.tables[self.table_name]
+        if self.action in ("insert", "upsert"):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            on_conflict = self.on_conflict if self.action == "upsert" else None
+            return Response([self.db._insert(self.table_name, dict(r), on_conflict=on_conflict) for r in payload])
+
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.action == "update":
+            return Response([self.db._update(self.table_name, r, self.payload) for r in matched])
+        if self.action == "delete":
+            for r in matched:
+                self.db._delete(self.table_name, r)
+            return Response([dict(r) for r in matched])
+
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda r: (r.get(column) is None, _coerce(column, r.get(column)) or 0), reverse=desc)
+        total = len(matched) if self.count_method else None
+        offset = getattr(self, "offset", 0)
+        if self.row_limit is not None:
+            matched = matched[offset:offset + self.row_limit]
+        if self.db.max_rows is not None:
+            matched = matched[:self.db.max_rows]  # PostgREST's max-rows cap
+        if self.columns:
+            matched = [{c: r.get(c) for c in self.columns} for r in matched]
+        else:
+            matched = [dict(r) for r in matched]
+        return Response(matched, total)
+
+
+class FakeRPC:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params or {}
+
+    def execute(self):
+        handler = getattr(self.db, f"_rpc_{self.name}")
+        request = {"rpc": self.name, "params": self.params}
+        return self.db._round_trip(request, lambda: Response(handler(**self.params)),
+                                   serialized=self.name not in self.db.CONCURRENT_RPCS)
+
+
+# ------------------ Database ------------------
+class FakeSupabase:
+    # RPCs that do their own locking, statement by statement, instead of running
+    # whole under the global lock, so tests exercise the lock the SQL takes
+    CONCURRENT_RPCS = {"reserve_booking"}
+
+    def __init__(self, latency_ms=0.0, max_rows=1000):
+        self.latency = latency_ms / 1000
+        self.max_rows = max_rows
+        self.tables = defaultdict(list)
+        self._ids = defaultdict(int)
+        self._txid = 0  # one transaction per round trip, committed when it returns
+        self._open_txids = set()
+        self._tx = threading.local()
+        self._pruned_txid = 0
+        self._lock = threading.RLock()
+        self._advisory_locks = defaultdict(threading.Lock)  # pg_advisory_xact_lock stand-in
+        self.reset_stats()
+
+    # -- accounting
+    def reset_stats(self):
+        # server_seconds: time spent inside the stand-in itself, which benchmarks
+        # subtract so the stand-in's Python scans don't count as app time
+        self.stats = {"round_trips": 0, "bytes_sent": 0, "bytes_received": 0, "errors": 0, "server_seconds": 0.0}
+        self.by_target = defaultdict(int)
+
+    def _round_trip(self, request, run, serialized=True):
+        if self.latency:
+            time.sleep(self.latency)
+        sent = len(json.dumps(request, default=str))
+        entered = time.perf_counter()
+        try:
+            return self._serve(request, run, serialized, sent)
+        finally:
+            # per thread, lock waits included: what a concurrent caller should subtract
+            self._tx.server_seconds = self.thread_server_seconds() + time.perf_counter() - entered
+
+    def thread_server_seconds(self):
+        # time this thread's round trips spent inside the stand-in so far
+        return getattr(self._tx, "server_seconds", 0.0)
+
+    def _serve(self, request, run, serialized, sent):
+        with self._lock if serialized else contextlib.nullcontext():
+            started = time.perf_counter()
+            with self._lock:
+                self._txid += 1
+                self._tx.txid = self._txid
+                self._open_txids.add(self._txid)
+            try:
+                response = run()
+            except Exception:
+                with self._lock:
+                    self._open_txids.discard(self._tx.txid)
+                    self.stats["round_trips"] += 1
+                    self.stats["errors"] += 1
+                raise
+            received = len(json.dumps(response.data, default=str))
+            with self._lock:
+                self._open_txids.discard(self._tx.txid)
+                self.stats["server_seconds"] += time.perf_counter() - started
+                self.stats["round_trips"] += 1
+                self.stats["bytes_sent"] += sent
+                self.stats["bytes_received"] += received
+                self.by_target[request.get("table") or "rpc:" + request.get("rpc", "?")] += 1
+        return response
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params)
+
+    # -- row writes + the triggers from sql/*.sql
+    def _next_id(self, table):
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def _insert(self, table, row, on_conflict=None):
+        keys = on_conflict.split(",") if on_conflict else []
+        if keys and all(row.get(k) is not None for k in keys):
+            for existing in self.tables[table]:
+                if all(existing.get(k) == row[k] for k in keys):
+                    return self._update(table, existing, row)
+        row.setdefault("id", self._next_id(table))
+        if table in ("bookings", "archived_bookings"):
+            self._snapshot_prices(row, {})
+            self._set_timestamps(row)
+            self._apply_rollup(row, 1)
+        self.tables[table].append(row)
+        if table == "bookings":
+            self._log_change(row, "INSERT")
+        return dict(row)
+
+    def _update(self, table, row, values):
+        if table in ("bookings", "archived_bookings"):
+            self._apply_rollup(row, -1)
+        old = dict(row)
+        row.update(values)
+        if table in ("bookings", "archived_bookings"):
+            self._snapshot_prices(row, old)
+            self._set_timestamps(row)
+            self._apply_rollup(row, 1)
+        if table == "bookings":
+            self._log_change(row, "UPDATE")
+        return dict(row)
+
+    def _delete(self, table, row):
+        self.tables[table].remove(row)
+        if table in ("bookings", "archived_bookings"):
+            self._apply_rollup(row, -1)
+        if table == "bookings":
+            self._log_change(row, "DELETE")
+
+    def _set_timestamps(self, row):
+        row["starts_at"] = _to_utc_iso(row.get("Date"), row.get("start_time"))
+        row["ends_at"] = _to_utc_iso(row.get("Date"), row.get("end_time"))
+
+    def _snapshot_prices(self, row, old):
+        # sql/007: priced once when written, re-priced only when Type / Therapist change
+        store_id = row.get("store_id")
+        if row.get("price_per_hour") is None or (old and row.get("Type") != old.get("Type")):
+            row["price_per_hour"] = self._lookup("massage_types", store_id, "Type", row.get("Type"), "Price-hour")
+        if row.get("rate_per_hour") is None or (old and row.get("Therapist") != old.get("Therapist")):
+            row["rate_per_hour"] = self._lookup("therapists", store_id, "Name", row.get("Therapist"), "Rate/hour")
+
+    def _log_change(self, row, op):
+        self.tables["booking_changes"].append({
+            "seq": self._next_id("booking_changes"),
+            "store_id": row.get("store_id"),
+            "booking_id": str(row["id"]),
+            "op": op,
+            "changed_at": datetime.now(timezone.utc).isoformat(),
+            "txid": self._tx.txid,
+        })
+
+    def _lookup(self, table, store_id, column, value, field):
+        for r in self.tables[table]:
+            if r.get("store_id") == store_id and r.get(column) == value:
+                return float(r.get(field) or 0)
+        return 0.0
+
+    def _apply_rollup(self, row, sign):
+        if not row.get("starts_at") or not row.get("ends_at"):
+            return
+        store_id = row.get("store_id")
+        starts_at = datetime.fromisoformat(row["starts_at"])
+        hours = (datetime.fromisoformat(row["ends_at"]) - starts_at).total_seconds() / 3600
+        price = float(row.get("price_per_hour") or 0)
+        rate = float(row.get("rate_per_hour") or 0)
+        addon = float(row.get("Add-on Price") or 0)
+        day = starts_at.astimezone(TIMEZONE).date()
+        key = (store_id, day, row.get("Therapist") or "")
+        rollups = self.__dict__.setdefault("rollups", {})
+        entry = rollups.setdefault(key, {"bookings": 0, "hours": 0.0, "base_income": 0.0, "addon_income": 0.0,
+                                         "income": 0.0, "payroll": 0.0})
+        entry["bookings"] += sign
+        entry["hours"] += sign * hours
+        entry["base_income"] += sign * hours * price
+        entry["addon_income"] += sign * addon
+        entry["income"] += sign * (hours * price + addon)
+        entry["payroll"] += sign * hours * rate
+
+    # -- RPCs (sql/*.sql)
+    def _rpc_reserve_booking(self, p_booking, p_email=None):
+        # sql/001: advisory lock on (store, therapist, date), then the overlap check and
+        # the insert as two statements; only the advisory lock keeps them together
+        start = datetime.strptime(p_booking["start_time"], "%I:%M %p")
+        end = datetime.strptime(p_booking["end_time"], "%I:%M %p")
+        if end <= start:
+            return {"status": "invalid_time"}
+        with self._lock:
+            advisory = self._advisory_locks[(p_booking["store_id"], p_booking["Therapist"], p_booking["Date"])]
+        with advisory:
+            with self._lock:
+                same_day = [r for r in self.tables["bookings"]
+                            if r.get("store_id") == p_booking["store_id"] and r.get("Therapist") == p_booking["Therapist"]
+                            and r.get("Date") == p_booking["Date"]]
+            for r in same_day:
+                other_start = datetime.strptime(r["start_time"], "%I:%M %p")
+                other_end = datetime.strptime(r["end_time"], "%I:%M %p")
+                if other_start < end and other_end > start:
+                    return {"status": "slot_taken"}
+            time.sleep(STATEMENT_GAP)
+            with self._lock:
+                booking = self._insert("bookings", dict(p_booking))
+                if p_email:
+                    self._insert("email_outbox", dict(p_email, store_id=p_booking["store_id"], status="pending",
+                                                      attempts=0, next_attempt_at=datetime.now(timezone.utc).isoformat()))
+                return {"status": "reserved", "booking": booking}
+
+    def _rpc_booking_changes_since(self, p_store_id, p_after_txid=None, p_after_seq=0, p_limit=1000):
+        # xmin: the oldest transaction still running (this one, at the latest)
+        horizon = min(self._open_txids)
+        if p_after_txid is None:
+            return {"horizon": horizon, "reset": False, "changes": []}
+        changes = sorted(
+            (c for c in self.tables["booking_changes"]
+             if c["store_id"] == p_store_id and (c["txid"], c["seq"]) > (p_after_txid, p_after_seq)
+             and c["txid"] < horizon),
+            key=lambda c: (c["txid"], c["seq"]))[:p_limit]
+        return {"horizon": horizon, "reset": self._pruned_txid >= p_after_txid,
+                "changes": [{k: c[k] for k in ("txid", "seq", "booking_id", "op")} for c in changes]}
+
+    def _rpc_prune_booking_changes(self, p_keep="1 day"):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=float(p_keep.split()[0]))  # "N days" only
+        gone = [c for c in self.tables["booking_changes"] if datetime.fromisoformat(c["changed_at"]) < cutoff]
+        self.tables["booking_changes"] = [c for c in self.tables["booking_changes"] if c not in gone]
+        if gone:
+            self._pruned_txid = max(self._pruned_txid, max(c["txid"] for c in gone))
+        return len(gone)
+
+    def _rpc_booking_page_bootstrap(self, p_store_id=None, p_store_slug=None):
+        store = next((s for s in self.tables["stores"]
+                      if (p_store_id and s["id"] == p_store_id) or (not p_store_id and s.get("store_slug") == p_store_slug)),
+                     None)
+        if store is None:
+            return None
+        parts = {name: [dict(r) for r in self.tables[name] if r.get("store_id") == store["id"]]
+                 for name in ("store_hours", "therapists", "therapist_times", "therapist_breaks",
+                              "schedule_exceptions", "massage_types")}
+        return dict(parts, store={k: store.get(k) for k in ("id", "store_name", "store_slug")})
+
+    def _rpc_archive_expired_bookings(self, p_store_id=None, p_before=None, p_batch_size=500):
+        before = datetime.fromisoformat(p_before) if p_before else TIMEZONE.localize(
+            datetime.combine(datetime.now(TIMEZONE).date(), datetime.min.time()))
+        expired = [r for r in self.tables["bookings"]
+                   if r.get("starts_at") and datetime.fromisoformat(r["starts_at"]) < before
+                   and (p_store_id is None or r.get("store_id") == p_store_id)][:p_batch_size]
+        moved = {id(r) for r in expired}
+        self.tables["bookings"] = [r for r in self.tables["bookings"] if id(r) not in moved]
+        for r in expired:
+            self._apply_rollup(r, -1)
+            self._log_change(r, "DELETE")
+            self._insert("archived_bookings", dict(r))
+        return len(expired)
+
+    def _period_start(self, day, period):
+        if period == "week":
+            return day - timedelta(days=day.weekday())
+        if period == "month":
+            return day.replace(day=1)
+        return day
+
+    def _rollup_rows(self, store_id, p_from, p_to, period, by_therapist):
+        start, end = date.fromisoformat(p_from), date.fromisoformat(p_to)
+        grouped = defaultdict(lambda: {"bookings": 0, "hours": 0.0, "base_income": 0.0, "addon_income": 0.0,
+                                       "income": 0.0, "payroll": 0.0})
+        for (sid, day, therapist), entry in self.__dict__.get("rollups", {}).items():
+            if sid != store_id or not start <= day <= end:
+                continue
+            key = (self._period_start(day, period), therapist if by_therapist else None)
+            for field, value in entry.items():
+                grouped[key][field] += value
+        return [(k, v) for k, v in sorted(grouped.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")) if v["bookings"] > 0]
+
+    def _rpc_income_summary(self, p_store_id, p_from, p_to, p_period="day"):
+        return [{"period_start": k[0].isoformat(), "bookings": v["bookings"], "hours": round(v["hours"], 2),
+                 "base_income": round(v["base_income"], 2), "addon_income": round(v["addon_income"], 2),
+                 "total_income": round(v["income"], 2)}
+                for k, v in self._rollup_rows(p_store_id, p_from, p_to, p_period, False)]
+
+    def _rpc_therapist_pay_summary(self, p_store_id, p_from, p_to, p_period="day"):
+        return [{"period_start": k[0].isoformat(), "therapist": k[1], "bookings": v["bookings"],
+                 "hours": round(v["hours"], 2),
+                 "rate": round(v["payroll"] / v["hours"], 2) if v["hours"] else None,
+                 "pay": round(v["payroll"], 2)}
+                for k, v in self._rollup_rows(p_store_id, p_from, p_to, p_period, True)]
+
+    def _rpc_claim_email_batch(self, p_limit, p_lease="5 minutes"):
+        now = datetime.now(timezone.utc)
+        lease = timedelta(minutes=float(p_lease.split()[0]))  # "N minutes" only
+        due = sorted((r for r in self.tables["email_outbox"]
+                      if r.get("status", "pending") in ("pending", "sending")
+                      and datetime.fromisoformat(r.get("next_attempt_at") or now.isoformat()) <= now),
+                     key=lambda r: r.get("next_attempt_at") or "")[:p_limit]
+        for r in due:
+            r["status"] = "sending"
+            r["attempts"] = r.get("attempts", 0) + 1
+            r["next_attempt_at"] = (now + lease).isoformat()
+        return [dict(r) for r in due]
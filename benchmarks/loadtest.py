@@ -0,0 +1,248 @@
+# ------------------ Load test: concurrent customers and admin dashboards ------------------
+# Usage: python benchmarks/loadtest.py [--customers 50] [--admins 10] [--duration 60]
+#            [--latency-ms 15] [--sweep 10,25,50,100,200] [--rate-limit] [--output results.json]
+# Runs virtual users as threads in one process, the way one Streamlit server runs its
+# sessions, against the in-memory stand-in (fake_supabase.py, --latency-ms per round
+# trip). Customers loop over the booking_page() data path (slot search, sometimes a
+# reservation); admins run play_notification_on_new_booking() + calendar_view() every
+# --refresh seconds, like st_autorefresh. Reports p50/p95/p99 per operation, throughput
+# and database queries per second. --sweep repeats the run at each customer count and
+# marks where p95 passes --slo-ms or throughput stops growing. The rate limiter is off
+# unless --rate-limit is given: its per-store caps would flatten throughput and read
+# as saturation. With it on, shed requests are reported on their own and a level that
+# sheds doesn't count as "throughput stopped growing". A call that raises is recorded
+# as an "(error)" sample and the virtual user carries on. Latencies leave out the time
+# each call spent inside the stand-in (its in-memory work and its lock waits), as
+# bench_suite does with server_seconds, so they are --latency-ms hops plus app-side work.
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+import bookings_repo  # noqa: E402
+import rate_limit  # noqa: E402
+import ref_cache  # noqa: E402
+from bench_suite import booking_page, calendar_view, seed_store  # noqa: E402
+from change_feed import BookingFeed  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+
+class Recorder:
+    def __init__(self, db):
+        self.db = db
+        self.samples = defaultdict(list)  # operation -> [ms]
+        self.errors = {}  # operation -> first error message
+        self._lock = threading.Lock()
+
+    def timed(self, operation, call):
+        started = time.perf_counter()
+        server = self.db.thread_server_seconds()
+        try:
+            result = call()
+        except Exception as e:
+            self.error(operation, e, self._elapsed_ms(started, server))
+            return None
+        with self._lock:
+            self.samples[operation].append(self._elapsed_ms(started, server))
+        return result
+
+    def _elapsed_ms(self, started, server):
+        return (time.perf_counter() - started - (self.db.thread_server_seconds() - server)) * 1000
+
+    def error(self, operation, exc, ms=0.0):
+        with self._lock:
+            self.samples[f"{operation} (error)"].append(ms)
+            self.errors.setdefault(operation, f"{type(exc).__name__}: {exc}")
+
+    def count(self, operation):
+        with self._lock:
+            self.samples[operation].append(0.0)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# ------------------ Virtual users ------------------
+def customer(db, store_ids, index, recorder, stop, limiter, args, rng):
+    store_number = index % len(store_ids)
+    store_id = store_ids[store_number]
+    client = rate_limit.client_fingerprint({"x-forwarded-for": f"customer-{index}"})
+    while not stop.is_set():
+        try:
+            customer_step(db, store_id, store_number, index, client, recorder, limiter, args, rng)
+        except Exception as e:  # keep the virtual user alive; the error is a sample
+            recorder.error("customer", e)
+        stop.wait(rng.uniform(0.5, 1.5) * args.think)
+
+
+def customer_step(db, store_id, store_number, index, client, recorder, limiter, args, rng):
+    if limiter and not limiter.allow("lookup", store_id, client):
+        recorder.count("booking_page (shed)")
+        return
+    recorder.timed("booking_page", lambda: booking_page(db, store_id, any_provider=rng.random() < 0.5))
+    if rng.random() >= args.confirm_rate:
+        return
+    if limiter and not limiter.allow("confirm", store_id, client):
+        recorder.count("reserve_booking (shed)")
+        return
+    day = bookings_repo.today() + timedelta(days=rng.randrange(1, 14))
+    start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=540 + rng.randrange(40) * 15)
+    recorder.timed("reserve_booking", lambda: db.rpc("reserve_booking", {"p_booking": {
+        "store_id": store_id, "customer_name": f"Load {index}", "phone": "0400000000",
+        "Therapist": f"Therapist {store_number}-{rng.randrange(args.therapists)}", "Type": "Service 0",
+        "Date": start.strftime("%d/%m/%Y"),
+        "start_time": start.strftime("%I:%M %p"),
+        "end_time": (start + timedelta(minutes=60)).strftime("%I:%M %p"),
+    }}).execute())
+
+
+def admin(db, store_id, recorder, stop, args, rng):
+    # one dashboard session: its own change-feed cursor and calendar windows
+    feed = BookingFeed(store_id)
+    windows = bookings_repo.BookingWindows(store_id)
+    stop.wait(rng.uniform(0, args.refresh))  # spread the refreshes out
+    while not stop.is_set():
+        try:
+            recorder.timed("play_notification_on_new_booking", lambda: windows.apply(feed.sync(db)))
+            recorder.timed("calendar_view", lambda: calendar_view(db, store_id, windows))
+        except Exception as e:
+            recorder.error("admin", e)
+        stop.wait(args.refresh)
+
+
+# ------------------ One load level ------------------
+def run_level(db, store_ids, customers, admins, args):
+    ref_cache.clear()
+    recorder = Recorder(db)
+    stop = threading.Event()
+    limiter = rate_limit.RateLimiter() if args.rate_limit else None
+    threads = []
+    for i in range(customers):
+        rng = random.Random(args.seed * 1000 + i)
+        threads.append(threading.Thread(target=customer, daemon=True, args=(
+            db, store_ids, i, recorder, stop, limiter, args, rng)))
+    for i in range(admins):
+        rng = random.Random(args.seed * 7919 + i)
+        threads.append(threading.Thread(target=admin, daemon=True, args=(
+            db, store_ids[i % len(store_ids)], recorder, stop, args, rng)))
+
+    db.reset_stats()
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    stop.wait(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    for operation, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        operations[operation] = {
+            "count": len(samples),
+            "per_second": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+            "p99_ms": round(percentile(samples, 0.99), 2),
+        }
+    served = sum(v["count"] for k, v in operations.items() if not k.endswith(("(shed)", "(error)")))
+    shed = sum(v["count"] for k, v in operations.items() if k.endswith("(shed)"))
+    failed = sum(v["count"] for k, v in operations.items() if k.endswith("(error)"))
+    return {
+        "customers": customers,
+        "admins": admins,
+        "seconds": round(elapsed, 2),
+        "throughput": round(served / elapsed, 2),
+        "shed_per_second": round(shed / elapsed, 2),
+        "errors_per_second": round(failed / elapsed, 2),
+        "errors": dict(recorder.errors),
+        "db_qps": round(db.stats["round_trips"] / elapsed, 2),
+        "db_kb_per_second": round(db.stats["bytes_received"] / 1024 / elapsed, 1),
+        "operations": operations,
+    }
+
+
+def print_level(level):
+    print(f"\n== {level['customers']} customers, {level['admins']} admins: "
+          f"{level['throughput']} ops/s served, {level['shed_per_second']} shed/s, "
+          f"{level['errors_per_second']} errors/s, {level['db_qps']} db queries/s, {level['db_kb_per_second']} KB/s")
+    print(f"   {'operation':<36} {'count':>7} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          "  (stand-in time excluded)")
+    for name, op in level["operations"].items():
+        print(f"   {name:<36} {op['count']:>7} {op['per_second']:>8} {op['p50_ms']:>8} "
+              f"{op['p95_ms']:>8} {op['p99_ms']:>8}")
+    for name, message in level["errors"].items():
+        print(f"   ❌ {name}: {message}")
+
+
+def saturation(levels, slo_ms):
+    # first level whose booking_page p95 breaks the SLO or whose throughput grows by less
+    # than half the added load; None when every level kept up. A level where the rate
+    # limiter shed requests is capped by policy, not capacity, so it can't fail the
+    # throughput test.
+    previous = None
+    for level in levels:
+        p95 = level["operations"].get("booking_page", {}).get("p95_ms") or 0
+        if p95 > slo_ms:
+            return {"customers": level["customers"], "reason": f"booking_page p95 {p95} ms > {slo_ms} ms"}
+        if previous and level["customers"] > previous["customers"]:
+            load_gain = level["customers"] / previous["customers"] - 1
+            throughput_gain = level["throughput"] / max(previous["throughput"], 1e-9) - 1
+            if throughput_gain < 0.5 * load_gain and not level["shed_per_second"]:
+                return {"customers": level["customers"], "reason": "throughput stopped growing with load"}
+        previous = level
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the booking and admin data paths against a local stand-in.")
+    parser.add_argument("--customers", type=int, default=50, help="concurrent booking-page visitors")
+    parser.add_argument("--admins", type=int, default=10, help="concurrent admin dashboards")
+    parser.add_argument("--stores", type=int, default=5)
+    parser.add_argument("--bookings", type=int, default=5000, help="bookings per store")
+    parser.add_argument("--therapists", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per load level")
+    parser.add_argument("--think", type=float, default=2.0, help="mean seconds between a customer's actions")
+    parser.add_argument("--refresh", type=float, default=20.0, help="admin autorefresh interval (st_autorefresh)")
+    parser.add_argument("--confirm-rate", type=float, default=0.1, help="share of slot searches followed by a booking")
+    parser.add_argument("--latency-ms", type=float, default=15.0, help="simulated database round-trip latency")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="put rate_limit's buckets in front of customers (shed requests are reported separately)")
+    parser.add_argument("--sweep", help="comma-separated customer counts, e.g. 10,25,50,100")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="booking_page p95 target for --sweep")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    db = FakeSupabase()
+    seed_rng = random.Random(args.seed)
+    store_ids = [seed_store(db, i, args.bookings, args.therapists, 4, 60, seed_rng) for i in range(args.stores)]
+    db.latency = args.latency_ms / 1000
+
+    counts = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.customers]
+    levels = []
+    for customers in counts:
+        level = run_level(db, store_ids, customers, args.admins, args)
+        print_level(level)
+        levels.append(level)
+
+    saturated = saturation(levels, args.slo_ms) if args.sweep else None
+    if args.sweep:
+        print("\nsaturates at " + (f"{saturated['customers']} customers ({saturated['reason']})"
+                                   if saturated else "none of the tested levels"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "levels": levels, "saturation": saturated}, f, indent=2)
+        print(f"wrote {args.output}")
@@ -0,0 +1,232 @@
+import csv
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import bookings_repo
+import ref_cache
+from availability import DATE_FORMAT, TIME_FORMAT
+
+# ------------------ Batch booking import / export ------------------
+# Import streams a CSV or Parquet file row by row, validates each row against the
+# store's therapists / massage_types, normalizes Date / start_time / end_time to the
+# formats the bookings table uses, and writes in chunked bulk requests.
+# An "id" column in the file is kept as external_id (sql/012): rows are upserted on
+# (store_id, external_id), so re-importing a file updates its rows instead of
+# duplicating them and can never overwrite another store's booking of the same id.
+# Export streams bookings / archived_bookings page by page to CSV or Parquet.
+# Parquet needs pyarrow (optional: pip install pyarrow).
+#
+#   python booking_io.py import <store_id> bookings.csv [--table archived_bookings] [--chunk 500] [--dry-run]
+#   python booking_io.py export <store_id> out.parquet [--table bookings|archived_bookings|all]
+
+CHUNK_SIZE = 500
+
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]
+TIME_FORMATS = ["%I:%M %p", "%I:%M%p", "%H:%M", "%H:%M:%S"]
+
+# incoming header -> bookings column
+ALIASES = {
+    "date": "Date",
+    "start": "start_time",
+    "start_time": "start_time",
+    "end": "end_time",
+    "end_time": "end_time",
+    "customer": "customer_name",
+    "customer_name": "customer_name",
+    "name": "customer_name",
+    "phone": "phone",
+    "therapist": "Therapist",
+    "provider": "Therapist",
+    "type": "Type",
+    "service": "Type",
+    "add_on": "add_on",
+    "add-on": "add_on",
+    "add-on price": "Add-on Price",
+    "addon_price": "Add-on Price",
+    "id": "external_id",
+    "external_id": "external_id",
+}
+
+ImportResult = namedtuple("ImportResult", ["read", "written", "rejected", "errors", "elapsed"])
+
+
+# ------------------ Reading ------------------
+def read_rows(path):
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_SIZE):
+            yield from batch.to_pylist()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+
+def _parse(value, formats):
+    text = str(value).strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised value {text!r}")
+
+
+def normalize_row(raw, store_id, therapist_names, type_names, check_therapist=True):
+    row = {}
+    for header, value in raw.items():
+        column = ALIASES.get(str(header).strip().lower())
+        if column and value not in (None, ""):
+            row[column] = value
+
+    for column in ("Date", "start_time", "end_time", "customer_name", "Therapist", "Type"):
+        if column not in row:
+            raise ValueError(f"missing {column}")
+
+    start = _parse(row["start_time"], TIME_FORMATS)
+    end = _parse(row["end_time"], TIME_FORMATS)
+    if end <= start:
+        raise ValueError("end_time is not after start_time")
+    if check_therapist and row["Therapist"] not in therapist_names:
+        raise ValueError(f"unknown therapist {row['Therapist']!r}")
+    if row["Type"] not in type_names:
+        raise ValueError(f"unknown massage type {row['Type']!r}")
+
+    row["Date"] = _parse(row["Date"], DATE_FORMATS).strftime(DATE_FORMAT)
+    row["start_time"] = start.strftime(TIME_FORMAT)
+    row["end_time"] = end.strftime(TIME_FORMAT)
+    row["Add-on Price"] = float(row.get("Add-on Price") or 0)
+    row["add_on"] = str(row.get("add_on", ""))
+    row["phone"] = str(row.get("phone", ""))
+    if "external_id" in row:
+        row["external_id"] = str(row["external_id"])
+    row["store_id"] = store_id
+    return row
+
+
+# ------------------ Import ------------------
+def _write_chunk(supabase, table, chunk):
+    with_id = [r for r in chunk if "external_id" in r]
+    without_id = [r for r in chunk if "external_id" not in r]
+    if with_id:
+        supabase.table(table).upsert(with_id, on_conflict="store_id,external_id").execute()
+    if without_id:
+        supabase.table(table).insert(without_id).execute()
+
+
+def import_bookings(supabase, store_id, path, table="bookings", chunk_size=CHUNK_SIZE,
+                    dry_run=False, check_therapist=True, progress=print):
+    therapist_names = {t["Name"] for t in ref_cache.get_therapists(supabase, store_id)}
+    type_names = {m["Type"] for m in ref_cache.get_massage_types(supabase, store_id)}
+
+    read = written = 0
+    errors = []
+    chunk = []
+    started = time.perf_counter()
+    for line_number, raw in enumerate(read_rows(path), start=2):
+        read += 1
+        try:
+            chunk.append(normalize_row(raw, store_id, therapist_names, type_names, check_therapist))
+        except (ValueError, TypeError) as e:
+            errors.append((line_number, str(e)))
+        if len(chunk) >= chunk_size:
+            if not dry_run:
+                _write_chunk(supabase, table, chunk)
+            written += len(chunk)
+            chunk = []
+            progress(f"⏳ {read} read, {written} written, {len(errors)} rejected "
+                     f"({time.perf_counter() - started:.1f}s)")
+    if chunk:
+        if not dry_run:
+            _write_chunk(supabase, table, chunk)
+        written += len(chunk)
+    return ImportResult(read, written, len(errors), errors, time.perf_counter() - started)
+
+
+# ------------------ Export ------------------
+def export_bookings(supabase, store_id, path, tables=("bookings",), page_size=1000, progress=print):
+    rows = (
+        dict(row, source_table=table)
+        for table in tables
+        for row in bookings_repo.iter_bookings(supabase, store_id, table=table, page_size=page_size)
+    )
+    if path.lower().endswith(".parquet"):
+        count = _write_parquet(rows, path, page_size)
+    else:
+        count = _write_csv(rows, path)
+    progress(f"✅ Exported {count} bookings to {path}")
+    return count
+
+
+def _write_csv(rows, path):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row.keys()), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_parquet(rows, path, batch_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    count = 0
+    writer = schema = None
+    batch = []
+
+    def flush():
+        # every column as string: exports stay readable even if a column is null for a whole batch
+        columns = {name: [None if r.get(name) is None else str(r.get(name)) for r in batch] for name in schema.names}
+        writer.write_table(pa.table(columns, schema=schema))
+
+    for row in rows:
+        if schema is None:
+            schema = pa.schema([(name, pa.string()) for name in row.keys()])
+            writer = pq.ParquetWriter(path, schema)
+        batch.append(row)
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    if writer is not None:
+        writer.close()
+    return count
+
+
+# ------------------ CLI ------------------
+if __name__ == "__main__":
+    import argparse
+    import db
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("store_id")
+    parser.add_argument("path")
+    parser.add_argument("--table", default="bookings", choices=["bookings", "archived_bookings", "all"])
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--allow-unknown-therapists", action="store_true",
+                        help="accept therapists no longer on staff (historical imports)")
+    args = parser.parse_args()
+    client = db.client_from_env()
+
+    if args.command == "import":
+        if args.table == "all":
+            parser.error("import needs --table bookings or --table archived_bookings")
+        result = import_bookings(client, args.store_id, args.path, table=args.table, chunk_size=args.chunk,
+                                 dry_run=args.dry_run, check_therapist=not args.allow_unknown_therapists)
+        print(f"✅ {result.read} read, {result.written} {'validated' if args.dry_run else 'written'}, "
+              f"{result.rejected} rejected in {result.elapsed:.1f}s")
+        for line_number, reason in result.errors[:50]:
+            print(f"   line {line_number}: {reason}")
+    else:
+        tables = ["bookings", "archived_bookings"] if args.table == "all" else [args.table]
+        export_bookings(client, args.store_id, args.path, tables=tables, page_size=args.chunk)
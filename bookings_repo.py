@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+import pytz
+
+# ------------------ Booking data access ------------------
+# Range queries run on the typed starts_at column (sql/003_booking_timestamps.sql),
+# which is indexed together with store_id, so only the requested window is returned.
+
+melbourne_tz = pytz.timezone("Australia/Melbourne")
+
+
+def local_midnight(date):
+    return melbourne_tz.localize(datetime.combine(date, time(0, 0)))
+
+
+def today():
+    return datetime.now(melbourne_tz).date()
+
+
+def day_range(start_date, days=1):
+    # [midnight of start_date, midnight of start_date + days) in Melbourne time
+    return local_midnight(start_date), local_midnight(start_date + timedelta(days=days))
+
+
+def fetch_bookings_between(supabase, store_id, start=None, end=None, columns="*", table="bookings"):
+    # bookings for store_id with start <= starts_at < end; either bound may be None
+    query = supabase.table(table).select(columns).eq("store_id", store_id)
+    if start is not None:
+        query = query.gte("starts_at", start.isoformat())
+    if end is not None:
+        query = query.lt("starts_at", end.isoformat())
+    response = query.order("starts_at").execute()
+    return response.data or []
+
+
+
+# ------------------ Visible-window cache (calendar) ------------------
+class BookingWindows:
+    # Small LRU of {(start_date, days): {booking id: row}} for one store. Only the
+    # ranges the calendar shows (and their neighbours) are ever fetched; change-feed
+    # deltas are patched into whichever cached windows they fall in.
+
+    def __init__(self, store_id, capacity=6):
+        self.store_id = store_id
+        self.capacity = capacity
+        self._windows = OrderedDict()
+
+    def get(self, supabase, start_date, days=1):
+        key = (start_date, days)
+        if key in self._windows:
+            self._windows.move_to_end(key)
+        else:
+            start, end = day_range(start_date, days)
+            rows = fetch_bookings_between(supabase, self.store_id, start, end)
+            self._windows[key] = {str(row["id"]): row for row in rows}
+            while len(self._windows) > self.capacity:
+                self._windows.popitem(last=False)
+        return list(self._windows[key].values())
+
+    def prefetch_neighbours(self, supabase, start_date, days=1):
+        for offset in (days, -days):
+            key = (start_date + timedelta(days=offset), days)
+            if key not in self._windows:
+                self.get(supabase, *key)
+        # keep the visible window the most recently used
+        if (start_date, days) in self._windows:
+            self._windows.move_to_end((start_date, days))
+
+    def apply(self, delta):
+        if delta.initial:
+            # first sync, or the feed lost history: refetch windows on demand
+            self._windows.clear()
+            return
+        changed = delta.inserted + delta.updated
+        gone = set(delta.deleted) | {str(row["id"]) for row in changed}
+        for rows in self._windows.values():
+            for bid in gone:
+                rows.pop(bid, None)
+        for row in changed:
+            starts_at = row.get("starts_at")
+            if not starts_at:
+                continue
+            starts_at = datetime.fromisoformat(starts_at)
+            for (start_date, days), rows in self._windows.items():
+                start, end = day_range(start_date, days)
+                if start <= starts_at < end:
+                    rows[str(row["id"])] = row
+
+
+# ------------------ Keyset pagination (newest first) ------------------
+# Pages are ordered by (starts_at desc, id desc) and continue from the last row
+# seen, so page N costs the same as page 1 and nothing is skipped or repeated
+# when rows are inserted between clicks. total comes from PostgREST's count
+# header ("exact", or "estimated" for very large tables) rather than a download.
+
+def page_bookings(supabase, columns, store_id=None, start=None, end=None, therapist=None,
+                  customer=None, phone=None, after=None, limit=50, count="exact", table="bookings"):
+    # -> (rows, cursor for the next page or None, total). total is only counted for the
+    # first page (after=None): later pages carry the keyset filter, so PostgREST
+    # would count just the rows left, and callers keep the first page's figure.
+    query = supabase.table(table).select(f"{columns}, id, starts_at", count=None if after else count)
+    query = query.not_.is_("starts_at", "null")
+    if store_id:
+        query = query.eq("store_id", store_id)
+    if start is not None:
+        query = query.gte("starts_at", start.isoformat())
+    if end is not None:
+        query = query.lt("starts_at", end.isoformat())
+    if therapist:
+        query = query.ilike("Therapist", f"%{therapist}%")
+    if customer:
+        query = query.ilike("customer_name", f"%{customer}%")
+    if phone:
+        query = query.ilike("phone", f"%{phone}%")
+    if after:
+        last_starts_at, last_id = after
+        query = query.or_(f'starts_at.lt."{last_starts_at}",and(starts_at.eq."{last_starts_at}",id.lt.{last_id})')
+    # one row past the page tells whether there is a next page at all
+    response = query.order("starts_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    rows = response.data or []
+    if len(rows) <= limit:
+        return rows, None, response.count
+    rows = rows[:limit]
+    return rows, (rows[-1]["starts_at"], rows[-1]["id"]), response.count
+
+
+def index_by_customer_date(rows):
+    # {(customer_name, Date): booking id} — first booking wins, like the old linear scan
+    index = {}
+    for row in rows:
+        index.setdefault((row.get("customer_name"), row.get("Date")), row["id"])
+    return index
+
+
+def iter_bookings(supabase, store_id, table="bookings", columns="*", page_size=1000):
+    # every row of one store, page by page on id, without holding the table in memory.
+    # Stops on an empty page, not a short one: PostgREST caps a response at its
+    # max-rows setting (1000 by default), so a short page doesn't mean the end.
+    last_id = None
+    while True:
+        query = supabase.table(table).select(columns).eq("store_id", store_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1]["id"]
@@ -0,0 +1,147 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# ------------------ Booking rows -> FullCalendar events (vectorized) ------------------
+# One pandas pass over all rows instead of strptime / localize / isoformat per row.
+# pandas has a fixed cost of ~15 ms per call, so below VECTORIZE_MIN_ROWS (where
+# benchmarks/bench_calendar_events.py measures the two break even) the plain loop runs.
+# Both give the same strings as the old pytz localize() + isoformat().
+
+TIMEZONE = "Australia/Melbourne"
+DATETIME_FORMAT = "%d/%m/%Y %I:%M %p"
+VECTORIZE_MIN_ROWS = 250
+
+_tz = pytz.timezone(TIMEZONE)
+
+
+# ------------------ Per-row path (small days) ------------------
+def _row_iso(text):
+    # "dd/mm/YYYY hh:mm AM" -> ISO with the Melbourne offset, or None when unreadable
+    try:
+        return _tz.localize(datetime.strptime(text, DATETIME_FORMAT)).isoformat()
+    except ValueError:
+        return None
+
+
+def _text(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value)
+
+
+def _events_loop(bookings, therapist_colors):
+    events, malformed_rows = [], []
+    for row in bookings:
+        date = _text(row, "Date").strip()
+        start_iso = _row_iso(date + " " + _text(row, "start_time").strip())
+        end_iso = _row_iso(date + " " + _text(row, "end_time").strip())
+        if start_iso is None or end_iso is None:
+            malformed_rows.append(row)
+            continue
+        info = therapist_colors.get(_text(row, "Therapist"))
+        if not info:
+            continue
+        events.append({
+            "id": row.get("id"),
+            "title": _text(row, "customer_name") + " - " + _text(row, "Type"),
+            "start": start_iso,
+            "end": end_iso,
+            "resourceId": info["id"],
+            "backgroundColor": info["color"],
+            "borderColor": info["color"],
+        })
+    return events, malformed_rows
+
+
+# ------------------ Vectorized path ------------------
+
+
+def _column(df, name):
+    if name in df.columns:
+        return df[name].fillna("").astype(str)
+    return pd.Series("", index=df.index)
+
+
+def _localize(naive):
+    # same choice as pytz localize(): ambiguous (DST fall-back) times use standard time.
+    # Times in the spring-forward gap come back NaT; _parse_iso sends those through pytz.
+    return naive.dt.tz_localize(
+        TIMEZONE,
+        ambiguous=np.zeros(len(naive), dtype=bool),
+        nonexistent="NaT",
+    )
+
+
+def _offset_text(minutes):
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def _iso(localized):
+    # columnar datetime.isoformat(): wall time from numpy, UTC offset from a tiny lookup
+    wall = localized.dt.tz_localize(None).to_numpy(dtype="datetime64[s]")
+    utc = localized.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[s]")
+    offsets = (wall - utc).astype(np.int64) // 60
+    unique_offsets, codes = np.unique(offsets, return_inverse=True)
+    suffix = np.array([_offset_text(int(m)) for m in unique_offsets], dtype=object)[codes]
+    return pd.Series(np.datetime_as_string(wall, unit="s").astype(object) + suffix, index=localized.index)
+
+
+def _parse_iso(text):
+    # parse each distinct "date time" string once; a store's rows share few distinct values
+    codes, uniques = pd.factorize(text)
+    parsed = pd.Series(pd.to_datetime(uniques, format=DATETIME_FORMAT, errors="coerce"))
+    iso = pd.Series(np.nan, index=parsed.index, dtype=object)
+    valid = parsed.notna()
+    if valid.any():
+        localized = _localize(parsed[valid])
+        in_gap = localized.isna()
+        if not in_gap.all():
+            iso[localized.index[~in_gap]] = _iso(localized[~in_gap])
+        for i in localized.index[in_gap]:  # pytz keeps the wall time with standard offset
+            iso[i] = _tz.localize(parsed[i].to_pydatetime()).isoformat()
+    return pd.Series(iso.to_numpy()[codes], index=text.index)
+
+
+def booking_times(df):
+    # (start ISO series, end ISO series, malformed mask) for a bookings DataFrame
+    date = _column(df, "Date").str.strip()
+    start_text = date + " " + _column(df, "start_time").str.strip()
+    end_text = date + " " + _column(df, "end_time").str.strip()
+    if len(df) < VECTORIZE_MIN_ROWS:
+        start_iso, end_iso = start_text.map(_row_iso), end_text.map(_row_iso)
+    else:
+        start_iso, end_iso = _parse_iso(start_text), _parse_iso(end_text)
+    malformed = start_iso.isna() | end_iso.isna()
+    return start_iso, end_iso, malformed
+
+
+def bookings_to_events(bookings, therapist_colors):
+    # -> (events, malformed rows); rows whose therapist has no resource are left out
+    if not bookings:
+        return [], []
+    if len(bookings) < VECTORIZE_MIN_ROWS:
+        return _events_loop(bookings, therapist_colors)
+    df = pd.DataFrame(bookings)
+    start_iso, end_iso, malformed = booking_times(df)
+    malformed_rows = [bookings[i] for i in np.flatnonzero(malformed.to_numpy())]
+
+    therapist = _column(df, "Therapist")
+    resource_id = therapist.map({name: info["id"] for name, info in therapist_colors.items()})
+    color = therapist.map({name: info["color"] for name, info in therapist_colors.items()})
+    keep = ~malformed & resource_id.notna()
+    if not keep.any():
+        return [], malformed_rows
+
+    events = pd.DataFrame({
+        "id": df.loc[keep, "id"],
+        "title": _column(df, "customer_name")[keep] + " - " + _column(df, "Type")[keep],
+        "start": start_iso[keep],
+        "end": end_iso[keep],
+        "resourceId": resource_id[keep],
+        "backgroundColor": color[keep],
+        "borderColor": color[keep],
+    })
+    return events.to_dict("records"), malformed_rows
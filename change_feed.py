@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+# ------------------ Incremental booking feed ------------------
+# Follows booking_changes (sql/004_booking_changes.sql) from a (txid, seq)
+# high-water mark through booking_changes_since(), which only returns changes
+# from transactions that have finished, so a late commit is never stepped over.
+# The first sync only reads the current horizon; every later tick is one RPC
+# that normally returns no rows, plus one fetch of the changed bookings when
+# there are some. If the prune has removed history past the cursor the Delta
+# comes back as initial and callers reload. Callers patch their local rows from
+# the Delta.
+
+PAGE_SIZE = 1000
+
+Delta = namedtuple("Delta", ["inserted", "updated", "deleted", "initial"])
+
+
+class BookingFeed:
+    def __init__(self, store_id, columns="*"):
+        self.store_id = store_id
+        self.columns = columns
+        self.cursor = None  # (txid, seq) of the last booking_changes row applied
+
+    def sync(self, supabase):
+        if self.cursor is None:
+            return self._start(supabase)
+
+        last_op = {}
+        saw_insert = set()
+        while True:
+            page = self._changes_since(supabase, *self.cursor)
+            if page["reset"]:
+                # history we never read was pruned: start over from the horizon
+                self.cursor = (page["horizon"], 0)
+                return Delta([], [], [], True)
+            changes = page["changes"]
+            for change in changes:
+                last_op[change["booking_id"]] = change["op"]
+                if change["op"] == "INSERT":
+                    saw_insert.add(change["booking_id"])
+                self.cursor = (change["txid"], change["seq"])
+            if len(changes) < PAGE_SIZE:
+                # everything below the horizon is read; skip ahead so the next
+                # tick doesn't rescan from an old txid
+                if page["horizon"] > self.cursor[0]:
+                    self.cursor = (page["horizon"], 0)
+                break
+
+        if not last_op:
+            return Delta([], [], [], False)
+
+        deleted = [bid for bid, op in last_op.items() if op == "DELETE"]
+        changed_ids = [bid for bid, op in last_op.items() if op != "DELETE"]
+        inserted, updated = [], []
+        for row in self._fetch_rows(supabase, changed_ids):
+            bid = str(row["id"])
+            (inserted if bid in saw_insert else updated).append(row)
+        return Delta(inserted, updated, deleted, False)
+
+    def _start(self, supabase):
+        page = self._changes_since(supabase, None, 0)
+        self.cursor = (page["horizon"], 0)
+        return Delta([], [], [], True)
+
+    def _changes_since(self, supabase, txid, seq):
+        return supabase.rpc("booking_changes_since", {
+            "p_store_id": self.store_id,
+            "p_after_txid": txid,
+            "p_after_seq": seq,
+            "p_limit": PAGE_SIZE,
+        }).execute().data
+
+    def _fetch_rows(self, supabase, ids):
+        rows = []
+        for i in range(0, len(ids), PAGE_SIZE):
+            chunk = ids[i:i + PAGE_SIZE]
+            rows.extend(
+                supabase.table("bookings").select(self.columns)
+                .eq("store_id", self.store_id)
+                .in_("id", chunk)
+                .execute()
+                .data or []
+            )
+        return rows
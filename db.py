@@ -0,0 +1,111 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from supabase import ClientOptions, create_client
+
+import instrumentation
+
+# ------------------ Shared Supabase client ------------------
+# Streamlit re-executes app.py / admin.py / superadmin.py on every interaction, but
+# imported modules stay loaded for the life of the process. Keeping the client here
+# means one client per (url, key) per process, and with it one keep-alive httpx
+# connection pool, instead of a new client and new TLS handshakes on every rerun.
+# Clients come back wrapped by instrumentation.instrument(), so every request is timed.
+
+_clients = {}
+_store_clients = OrderedDict()  # (url, key, store_id) -> [client, token expiry], oldest first
+_lock = threading.Lock()
+_stats = {"created": 0, "reused": 0}
+
+
+def get_client(url, key):
+    with _lock:
+        client = _clients.get((url, key))
+        if client is None:
+            client = instrumentation.instrument(create_client(url, key))
+            _clients[(url, key)] = client
+            instrumentation.start_from_env()
+            _stats["created"] += 1
+        else:
+            _stats["reused"] += 1
+        return client
+
+
+# ------------------ Store-scoped clients (sql/011_store_scoping.sql) ------------------
+# Row level security only shows a request the rows of the store named in its JWT.
+# Once a page knows its store it switches to one of these: same url/key, but every
+# PostgREST request carries a short-lived token for that store, signed here with the
+# project's JWT secret. A store client only holds its headers: requests go out over
+# the shared client's httpx pool, so the process keeps one pool however many stores
+# it serves. Least recently used stores are dropped past MAX_STORE_CLIENTS.
+
+TOKEN_TTL = 3600
+TOKEN_REFRESH = 300  # re-sign when less than this many seconds are left
+MAX_STORE_CLIENTS = 256
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+
+def store_token(secret, store_id, ttl=TOKEN_TTL, now=None):
+    now = int(time.time() if now is None else now)
+    header = {"alg": "HS256", "typ": "JWT"}
+    claims = {"role": "authenticated", "aud": "authenticated", "store_id": str(store_id),
+              "iat": now, "exp": now + ttl}
+    signing_input = b".".join(_b64(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims))
+    signature = hmac.new(secret.encode(), signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64(signature)).decode()
+
+
+def get_store_client(url, key, secret, store_id):
+    shared = get_client(url, key)
+    now = time.time()
+    with _lock:
+        entry = _store_clients.get((url, key, str(store_id)))
+        if entry is None:
+            options = ClientOptions(httpx_client=shared.postgrest.session)
+            entry = [instrumentation.instrument(create_client(url, key, options)), 0]
+            _store_clients[(url, key, str(store_id))] = entry
+            if len(_store_clients) > MAX_STORE_CLIENTS:
+                _store_clients.popitem(last=False)  # nothing to close: the pool is shared
+            _stats["created"] += 1
+        else:
+            _store_clients.move_to_end((url, key, str(store_id)))
+            _stats["reused"] += 1
+        client, expires = entry
+        if expires - now < TOKEN_REFRESH:
+            client.postgrest.auth(store_token(secret, store_id, now=now))
+            entry[1] = now + TOKEN_TTL
+        return client
+
+
+def client_from_env():
+    # for the command-line tools (archiver.py, outbox.py, reports.py, ...); they work
+    # across stores, so SUPABASE_KEY here is the service_role key
+    return get_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+
+def _connection_counts(client):
+    # best effort: httpx keeps its pool on the transport (httpcore.ConnectionPool)
+    try:
+        pool = client.postgrest.session._transport._pool
+        connections = list(pool.connections)
+    except AttributeError:
+        return None
+    idle = sum(1 for c in connections if c.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def pool_stats():
+    with _lock:
+        clients = list(_clients.values())
+        stats = dict(_stats, clients=len(clients), store_clients=len(_store_clients))
+    stats["connections"] = [_connection_counts(c) for c in clients]  # store clients share these pools
+    return stats
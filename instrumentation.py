@@ -0,0 +1,356 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ------------------ Call instrumentation ------------------
+# db.get_client() wraps every Supabase client in InstrumentedClient, and the outbox
+# wraps its SMTP connection in InstrumentedSender. Each execute() / rpc / send is
+# recorded with latency, rows, payload bytes and errors, labelled with the current
+# page, function and store_id (a context variable, so concurrent Streamlit sessions
+# don't mix). Totals are process-wide and exported as OpenMetrics text; the calls of
+# the current rerun are kept separately for the admin ?debug=1 panel.
+
+log = logging.getLogger("melbooking")
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+LABELS = ("page", "function", "store_id", "kind", "target")
+
+_scope = contextvars.ContextVar("instrumentation_scope", default={})
+_run = contextvars.ContextVar("instrumentation_run", default=None)
+
+_lock = threading.Lock()
+_calls = {}     # label tuple -> [count, errors, seconds, rows, bytes, bucket counts]
+_reruns = {}    # page -> reruns
+_handled = {}   # (page, function, error type) -> errors caught and logged
+_counters = {}  # (name, ((label, value), ...)) -> count, see count()
+
+
+# ------------------ Labels ------------------
+def labels():
+    return dict({"page": "", "function": "", "store_id": ""}, **_scope.get())
+
+
+def set_scope(**values):
+    # labels for the rest of this rerun (e.g. store_id once it is known)
+    _scope.set(dict(_scope.get(), **{k: "" if v is None else str(v) for k, v in values.items()}))
+
+
+@contextmanager
+def scope(**values):
+    token = _scope.set(dict(_scope.get(), **{k: "" if v is None else str(v) for k, v in values.items()}))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def traced(fn):
+    # label the calls made inside fn with function=fn.__name__
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with scope(function=fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def begin_run(page, store_id=None):
+    # top of every page script: new per-rerun call list, page / store labels reset
+    _scope.set({"page": page, "function": "", "store_id": "" if store_id is None else str(store_id)})
+    _run.set([])
+    with _lock:
+        _reruns[page] = _reruns.get(page, 0) + 1
+
+
+def current_run():
+    return list(_run.get() or [])
+
+
+# ------------------ Recording ------------------
+def _payload_size(data):
+    try:
+        return len(json.dumps(data, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def record(kind, target, seconds, rows=0, size=0, error=None):
+    tags = labels()
+    key = tuple(tags.get(name, "") for name in LABELS[:3]) + (kind, target)
+    with _lock:
+        entry = _calls.get(key)
+        if entry is None:
+            entry = _calls[key] = [0, 0, 0.0, 0, 0, [0] * len(LATENCY_BUCKETS)]
+        entry[0] += 1
+        entry[1] += 1 if error else 0
+        entry[2] += seconds
+        entry[3] += rows
+        entry[4] += size
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                entry[5][i] += 1
+    calls = _run.get()
+    if calls is not None:
+        calls.append(dict(tags, kind=kind, target=target, ms=round(seconds * 1000, 2), rows=rows,
+                          bytes=size, error=type(error).__name__ if error else ""))
+
+
+def record_error(error, message=None):
+    # for handlers that fall back to a default: log it and count it instead of `except: pass`
+    tags = labels()
+    key = (tags["page"], tags["function"], type(error).__name__)
+    with _lock:
+        _handled[key] = _handled.get(key, 0) + 1
+    log.warning("%s (page=%s function=%s store_id=%s): %s", message or "handled error",
+                tags["page"], tags["function"], tags["store_id"], error)
+
+
+def count(name, amount=1, **tags):
+    # free-form counters (e.g. rate_limit's shed requests), exported as melbooking_<name>_total
+    key = (name, tuple(sorted((k, "" if v is None else str(v)) for k, v in tags.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def _timed(kind, target, call):
+    started = time.perf_counter()
+    try:
+        response = call()
+    except Exception as e:
+        record(kind, target, time.perf_counter() - started, error=e)
+        raise
+    seconds = time.perf_counter() - started
+    data = getattr(response, "data", None)
+    rows = len(data) if isinstance(data, list) else int(data is not None)
+    record(kind, target, seconds, rows, _payload_size(data))
+    return response
+
+
+# ------------------ Supabase client wrapper ------------------
+class _InstrumentedQuery:
+    # proxies a postgrest request builder; every chained call stays wrapped
+    def __init__(self, builder, kind, target):
+        self._builder = builder
+        self._kind = kind
+        self._target = target
+
+    def execute(self):
+        return _timed(self._kind, self._target, self._builder.execute)
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            if hasattr(attr, "execute"):  # e.g. the `.not_` property
+                return _InstrumentedQuery(attr, self._kind, self._target)
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._kind, self._target)
+            return result
+        return chained
+
+
+class InstrumentedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), "table", name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return _InstrumentedQuery(self._client.rpc(name, params or {}), "rpc", name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument(client):
+    return client if isinstance(client, InstrumentedClient) else InstrumentedClient(client)
+
+
+# ------------------ SMTP sender wrapper ------------------
+class InstrumentedSender:
+    def __init__(self, sender, page="outbox"):
+        self._sender = sender
+        self._page = page
+
+    def send(self, **kwargs):
+        contents = kwargs.get("contents") or ""
+        size = len(contents) if isinstance(contents, str) else _payload_size(contents)
+        with scope(page=labels()["page"] or self._page, function="send"):
+            started = time.perf_counter()
+            try:
+                result = self._sender.send(**kwargs)
+            except Exception as e:
+                record("smtp", "send", time.perf_counter() - started, error=e)
+                raise
+            record("smtp", "send", time.perf_counter() - started, 1, size)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._sender, name)
+
+
+# ------------------ Snapshots / export ------------------
+def snapshot():
+    # [{labels..., calls, errors, seconds, rows, bytes}] plus reruns per page
+    with _lock:
+        calls = [dict(zip(LABELS, key), calls=v[0], errors=v[1], seconds=v[2], rows=v[3], bytes=v[4])
+                 for key, v in _calls.items()]
+        return {"calls": calls, "reruns": dict(_reruns),
+                "handled_errors": [{"page": k[0], "function": k[1], "error": k[2], "count": v}
+                                   for k, v in _handled.items()],
+                "counters": [dict(k[1], name=k[0], count=v) for k, v in _counters.items()]}
+
+
+def trips_per_rerun():
+    # {page: average database round trips per rerun}, the number to watch per view
+    data = snapshot()
+    trips = {}
+    for row in data["calls"]:
+        if row["kind"] != "smtp":
+            trips[row["page"]] = trips.get(row["page"], 0) + row["calls"]
+    return {page: trips.get(page, 0) / runs for page, runs in data["reruns"].items() if runs}
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _reruns.clear()
+        _handled.clear()
+        _counters.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+def openmetrics():
+    with _lock:
+        calls = {k: (v[0], v[1], v[2], v[3], v[4], list(v[5])) for k, v in _calls.items()}
+        reruns = dict(_reruns)
+        handled = dict(_handled)
+        counters = dict(_counters)
+
+    lines = [
+        "# TYPE melbooking_calls counter",
+        "# HELP melbooking_calls Supabase requests and SMTP sends.",
+    ]
+    for key, v in calls.items():
+        lines.append(f"melbooking_calls_total{{{_label_text(LABELS, key)}}} {v[0]}")
+    lines += ["# TYPE melbooking_call_errors counter", "# HELP melbooking_call_errors Calls that raised."]
+    for key, v in calls.items():
+        lines.append(f"melbooking_call_errors_total{{{_label_text(LABELS, key)}}} {v[1]}")
+    lines += ["# TYPE melbooking_call_rows counter", "# HELP melbooking_call_rows Rows returned."]
+    for key, v in calls.items():
+        lines.append(f"melbooking_call_rows_total{{{_label_text(LABELS, key)}}} {v[3]}")
+    lines += ["# TYPE melbooking_call_bytes counter", "# HELP melbooking_call_bytes Response payload size (JSON)."]
+    for key, v in calls.items():
+        lines.append(f"melbooking_call_bytes_total{{{_label_text(LABELS, key)}}} {v[4]}")
+
+    lines += ["# TYPE melbooking_call_seconds histogram", "# HELP melbooking_call_seconds Call latency."]
+    for key, v in calls.items():
+        label_text = _label_text(LABELS, key)
+        for bound, count in zip(LATENCY_BUCKETS, v[5]):
+            lines.append(f'melbooking_call_seconds_bucket{{{label_text},le="{bound}"}} {count}')
+        lines.append(f'melbooking_call_seconds_bucket{{{label_text},le="+Inf"}} {v[0]}')
+        lines.append(f"melbooking_call_seconds_sum{{{label_text}}} {v[2]:.6f}")
+        lines.append(f"melbooking_call_seconds_count{{{label_text}}} {v[0]}")
+
+    lines += ["# TYPE melbooking_reruns counter", "# HELP melbooking_reruns Page script runs."]
+    for page, count in reruns.items():
+        lines.append(f'melbooking_reruns_total{{page="{_escape(page)}"}} {count}')
+    lines += ["# TYPE melbooking_handled_errors counter", "# HELP melbooking_handled_errors Errors caught and logged."]
+    for key, count in handled.items():
+        lines.append(f"melbooking_handled_errors_total{{{_label_text(('page', 'function', 'error'), key)}}} {count}")
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE melbooking_{name} counter")
+        for (counter, labels), value in counters.items():
+            if counter == name:
+                label_text = _label_text([k for k, _ in labels], [v for _, v in labels])
+                lines.append(f"melbooking_{name}_total{{{label_text}}} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+# ------------------ /metrics endpoint (METRICS_PORT) ------------------
+_server = None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    # Streamlit can't add routes, so the endpoint is a tiny HTTP server thread
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = openmetrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+
+def start_from_env():
+    port = os.environ.get("METRICS_PORT")
+    if port and _server is None:
+        try:
+            start_metrics_server(int(port))
+        except OSError as e:  # another process already serves this port
+            log.warning("metrics endpoint not started on port %s: %s", port, e)
+
+
+# ------------------ ?debug=1 panel ------------------
+# Shows query targets, cache and limiter internals, so it is opt-in twice: the process
+# must run with DEBUG_PANEL=1, and only signed-in admin pages call this at all.
+def debug_panel():
+    import streamlit as st
+    import db
+    import rate_limit
+    import ref_cache
+
+    if os.environ.get("DEBUG_PANEL") != "1" or st.query_params.get("debug") != "1":
+        return
+    import pandas as pd
+
+    calls = current_run()
+    with st.sidebar.expander(f"🔧 Debug: {len(calls)} calls this rerun", expanded=True):
+        if calls:
+            df = pd.DataFrame(calls)
+            st.caption(f"{df['ms'].sum():.1f} ms, {df['rows'].sum()} rows, {df['bytes'].sum() / 1024:.1f} KB")
+            st.dataframe(df[["function", "kind", "target", "ms", "rows", "bytes", "error"]],
+                         hide_index=True, use_container_width=True)
+        st.markdown("**Round trips per rerun (this process)**")
+        st.json({page: round(trips, 2) for page, trips in trips_per_rerun().items()})
+        st.markdown("**Reference cache**")
+        st.json(ref_cache.stats())
+        st.markdown("**Client pool**")
+        st.json(db.pool_stats())
+        st.markdown("**Rate limiter**")
+        st.json(rate_limit.limiter.stats())
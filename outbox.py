@@ -0,0 +1,129 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+# ------------------ Settings ------------------
+BATCH_SIZE = 20
+POLL_INTERVAL = 10  # seconds between polls when idle
+MAX_ATTEMPTS = 6
+BASE_BACKOFF = 30  # seconds, doubled after every failed attempt
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# ------------------ Enqueue (inside reserve_booking) ------------------
+# Confirmations go to reserve_booking as p_email and are queued in the booking's own
+# transaction (sql/001), so there is no booking without its email and no extra round trip.
+def email_payload(recipient, subject, body):
+    return {"recipient": recipient, "subject": subject, "body": body}
+
+
+def backoff_delay(attempts, base=BASE_BACKOFF):
+    return timedelta(seconds=base * (2 ** max(attempts - 1, 0)))
+
+
+# ------------------ Worker ------------------
+class OutboxWorker(threading.Thread):
+    # Drains email_outbox in batches over one reused SMTP connection.
+    # sender_factory returns an object with send(to=, subject=, contents=) and close(),
+    # e.g. lambda: yagmail.SMTP(user, password) or, against a local aiosmtpd stub,
+    # lambda: yagmail.SMTP(user, password, host="localhost", port=8025, smtp_ssl=False, smtp_starttls=False)
+
+    def __init__(self, supabase, sender_factory, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL,
+                 max_attempts=MAX_ATTEMPTS, base_backoff=BASE_BACKOFF):
+        super().__init__(name="email-outbox", daemon=True)
+        self.supabase = supabase
+        self.sender_factory = sender_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._sender = None
+        self._wake_event = threading.Event()
+        self._stopping = threading.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def wake(self):
+        self._wake_event.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake_event.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                print(f"❌ Outbox poll failed: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+        self._close_sender()
+
+    def drain_once(self):
+        batch = self.supabase.rpc("claim_email_batch", {"p_limit": self.batch_size}).execute().data or []
+        for message in batch:
+            self._deliver(message)
+        return len(batch)
+
+    def _deliver(self, message):
+        # attempts were counted by claim_email_batch; more than allowed means the lease
+        # ran out on the last one (the worker died mid-send), so don't try again
+        if message.get("attempts", 0) > self.max_attempts:
+            self._mark_failed(message, "lease expired on the last attempt")
+            return
+        try:
+            if self._sender is None:
+                self._sender = self.sender_factory()
+            self._sender.send(to=message["recipient"], subject=message["subject"], contents=message["body"])
+        except Exception as e:
+            # drop the connection so the next message reconnects
+            self._close_sender()
+            self._mark_failed(message, e)
+            return
+        self.supabase.table("email_outbox").update({
+            "status": "sent",
+            "sent_at": _now().isoformat(),
+            "last_error": None
+        }).eq("id", message["id"]).execute()
+        self.sent += 1
+
+    def _mark_failed(self, message, error):
+        attempts = message.get("attempts", 0)
+        give_up = attempts >= self.max_attempts
+        self.supabase.table("email_outbox").update({
+            "status": "failed" if give_up else "pending",
+            "next_attempt_at": (_now() + backoff_delay(attempts, self.base_backoff)).isoformat(),
+            "last_error": str(error)[:500]
+        }).eq("id", message["id"]).execute()
+        self.failed += 1
+
+    def _close_sender(self):
+        if self._sender is not None:
+            try:
+                self._sender.close()
+            except Exception:
+                pass
+            self._sender = None
+
+
+# ------------------ Standalone worker: python outbox.py ------------------
+if __name__ == "__main__":
+    import os
+    import yagmail
+    import db
+    import instrumentation
+
+    client = db.client_from_env()
+    sender = os.environ["EMAIL_SENDER"]
+    password = os.environ["EMAIL_APP_PASSWORD"]
+    smtp_host = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+    smtp_port = int(os.environ.get("SMTP_PORT", "465"))
+    worker = OutboxWorker(client, lambda: instrumentation.InstrumentedSender(
+        yagmail.SMTP(sender, password, host=smtp_host, port=smtp_port)))
+    worker.start()
+    worker.join()
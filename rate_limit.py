@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import instrumentation
+
+# ------------------ Booking page rate limiting ------------------
+# Token buckets per (action, store) and per (action, store, client fingerprint). A
+# request needs a token from both buckets; otherwise it is shed and counted
+# (instrumentation "rate_limited" counter). The store bucket is a hard cap: a new or
+# evicted fingerprint starts with a full client bucket, so letting those through an
+# empty store bucket would let rotating fingerprints skip it. Shed lookups are answered from
+# LastGood, the most recent response for the same key; shed confirmations are refused.
+# State is per process, like ref_cache: each Streamlit server enforces its own limits.
+
+# action -> (per-client rate/s, per-client burst, per-store rate/s, per-store burst)
+LIMITS = {
+    "lookup": (1.0, 20, 20.0, 200),     # form interactions (slot search)
+    "confirm": (1 / 60, 3, 1.0, 20),    # reserve_booking + confirmation email
+}
+MAX_KEYS = 20000
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_keys=MAX_KEYS, clock=time.monotonic):
+        self.limits = dict(limits or LIMITS)
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # LRU, so one-off fingerprints age out
+        self._lock = threading.Lock()
+        self._stats = {}  # (action, outcome) -> count
+
+    def _bucket(self, key, rate, burst, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        bucket.refill(now)
+        return bucket
+
+    def allow(self, action, store_id, client, cost=1):
+        client_rate, client_burst, store_rate, store_burst = self.limits[action]
+        now = self.clock()
+        with self._lock:
+            per_client = self._bucket((action, store_id, client), client_rate, client_burst, now)
+            per_store = self._bucket((action, store_id), store_rate, store_burst, now)
+            if per_client.tokens >= cost and per_store.tokens >= cost:
+                per_client.tokens -= cost
+                per_store.tokens -= cost
+                outcome = "allowed"
+            else:
+                outcome = "shed_client" if per_client.tokens < cost else "shed_store"
+            self._stats[(action, outcome)] = self._stats.get((action, outcome), 0) + 1
+        if outcome.startswith("shed"):
+            instrumentation.count("rate_limited", action=action, scope=outcome[5:], store_id=store_id)
+        return not outcome.startswith("shed")
+
+    def stats(self):
+        with self._lock:
+            return dict(({f"{a}.{o}": n for (a, o), n in self._stats.items()}), keys=len(self._buckets))
+
+
+# ------------------ Last good responses (served while shedding) ------------------
+class LastGood:
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+
+# ------------------ Client fingerprint ------------------
+# X-Forwarded-For is "client, proxy1, proxy2"; everything left of what our own proxies
+# appended is whatever the client sent. TRUSTED_PROXY_HOPS is how many entries, from
+# the right, our proxies add (1: just the load balancer in front of Streamlit).
+TRUSTED_PROXY_HOPS = 1
+
+
+def client_address(headers, remote_address=None):
+    forwarded = [a.strip() for a in (headers.get("x-forwarded-for") or "").split(",") if a.strip()]
+    if forwarded:
+        return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return headers.get("x-real-ip") or remote_address or ""
+
+
+def client_fingerprint(headers, remote_address=None):
+    # the address when there is one, so rotating browser headers doesn't buy a new
+    # bucket; browser headers only without one. Hashed so no IP is kept.
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    address = client_address(headers, remote_address)
+    parts = [address] if address else ["", headers.get("user-agent", ""), headers.get("accept-language", "")]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+limiter = RateLimiter()
+last_good = LastGood()
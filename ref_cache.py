@@ -0,0 +1,192 @@
+import threading
+import time
+
+import bookings_repo
+import schedule
+
+# ------------------ Reference data cache ------------------
+# therapists / massage_types / store_hours / therapist_times (and the schedule
+# tables) change rarely but are
+# read by almost every view and on every autorefresh. Entries are shared by all
+# sessions of this process, keyed by (kind, store_id), and expire after TTL seconds.
+# Admin write paths call invalidate() so their own process sees changes at once;
+# other processes (e.g. the public booking page) pick them up within the TTL.
+
+TTL = 120
+MAX_ENTRIES = 5000  # compiled ("schedule", store, date) days add up; see _put()
+
+_LOADERS = {
+    "therapists": lambda supabase, store_id: (
+        supabase.table("therapists").select("*").eq("store_id", store_id).execute().data or []
+    ),
+    "massage_types": lambda supabase, store_id: (
+        supabase.table("massage_types").select("*").eq("store_id", store_id).execute().data or []
+    ),
+    "store_hours": lambda supabase, store_id: (
+        supabase.table("store_hours").select("*").eq("store_id", store_id).execute().data or []
+    ),
+    "therapist_times": lambda supabase, store_id: (
+        supabase.table("therapist_times").select("*").eq("store_id", store_id).execute().data or []
+    ),
+    "therapist_breaks": lambda supabase, store_id: (
+        supabase.table("therapist_breaks").select("*").eq("store_id", store_id).execute().data or []
+    ),
+    "schedule_exceptions": lambda supabase, store_id: (
+        supabase.table("schedule_exceptions").select("*").eq("store_id", store_id)
+        .gte("day", bookings_repo.today().isoformat()).execute().data or []
+    ),
+}
+
+_entries = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def _put(cache_key, expires, value):
+    # caller holds _lock. Re-inserting moves the key to the end, so dict order is
+    # oldest write first; past MAX_ENTRIES drop what has expired, then the oldest.
+    _entries.pop(cache_key, None)
+    _entries[cache_key] = (expires, value)
+    if len(_entries) <= MAX_ENTRIES:
+        return
+    now = time.monotonic()
+    stale = [k for k, entry in _entries.items() if entry[0] <= now]
+    for k in stale:
+        del _entries[k]
+    target = MAX_ENTRIES * 9 // 10  # headroom, so the scan isn't repeated on every write
+    while len(_entries) > target:
+        del _entries[next(iter(_entries))]
+        _stats["evictions"] += 1
+    _stats["evictions"] += len(stale)
+
+
+def get(supabase, kind, store_id, ttl=TTL):
+    cache_key = (kind, store_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry and entry[0] > now:
+            _stats["hits"] += 1
+            return entry[1]
+        _stats["misses"] += 1
+    value = _LOADERS[kind](supabase, store_id)
+    with _lock:
+        _put(cache_key, now + ttl, value)
+    return value
+
+
+def _lookup(cache_key):
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            _stats["hits"] += 1
+            return entry[1]
+        _stats["misses"] += 1
+        return None
+
+
+# ------------------ Booking page bootstrap ------------------
+# One RPC (sql/008_booking_page_bootstrap.sql) returns the store, hours, providers,
+# shifts and services. The pieces are stored as normal cache entries, so the page's
+# ref_cache reads that follow are hits, and slug -> store id is memoized separately.
+
+BOOTSTRAP_TTL = 30
+SLUG_TTL = 3600
+_BOOTSTRAP_PARTS = ["store_hours", "therapists", "therapist_times", "therapist_breaks",
+                    "schedule_exceptions", "massage_types"]
+
+
+def get_booking_bootstrap(supabase, store_id=None, store_slug=None):
+    if not store_id and store_slug:
+        store_id = _lookup(("store_slug", store_slug))
+    if store_id:
+        cached = _lookup(("bootstrap", store_id))
+        if cached is not None:
+            return cached
+
+    payload = supabase.rpc("booking_page_bootstrap", {
+        "p_store_id": store_id,
+        "p_store_slug": None if store_id else store_slug
+    }).execute().data
+    if not payload or not payload.get("store"):
+        return None
+
+    store = payload["store"]
+    expires = time.monotonic() + BOOTSTRAP_TTL
+    with _lock:
+        _put(("bootstrap", store["id"]), expires, payload)
+        for kind in _BOOTSTRAP_PARTS:
+            _put((kind, store["id"]), expires, payload.get(kind) or [])
+        if store.get("store_slug"):
+            _put(("store_slug", store["store_slug"]), time.monotonic() + SLUG_TTL, store["id"])
+    return payload
+
+
+# ------------------ Compiled day schedules ------------------
+# schedule.compile_day() over the cached inputs, kept per (store, date). Any write to
+# an input kind drops the store's compiled days as well (see invalidate()).
+
+_SCHEDULE_INPUTS = {"store_hours", "therapists", "therapist_times", "therapist_breaks", "schedule_exceptions"}
+
+
+def get_day_schedule(supabase, store_id, date):
+    cache_key = ("schedule", store_id, date)
+    cached = _lookup(cache_key)
+    if cached is not None:
+        return cached
+    compiled = schedule.compile_day(
+        date,
+        [t["Name"] for t in get(supabase, "therapists", store_id)],
+        get(supabase, "store_hours", store_id),
+        get(supabase, "therapist_times", store_id),
+        get(supabase, "therapist_breaks", store_id),
+        get(supabase, "schedule_exceptions", store_id),
+    )
+    with _lock:
+        _put(cache_key, time.monotonic() + BOOTSTRAP_TTL, compiled)
+    return compiled
+
+
+def invalidate(store_id, kind=None):
+    with _lock:
+        keys = [k for k in _entries if k[1] == store_id and (
+            kind is None or k[0] == kind or (k[0] == "schedule" and kind in _SCHEDULE_INPUTS))]
+        for k in keys:
+            del _entries[k]
+        _stats["invalidations"] += len(keys)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, entries=len(_entries), hit_rate=_stats["hits"] / lookups if lookups else 0.0)
+
+
+# ------------------ Shortcuts ------------------
+def get_therapists(supabase, store_id):
+    return get(supabase, "therapists", store_id)
+
+
+def get_massage_types(supabase, store_id):
+    return get(supabase, "massage_types", store_id)
+
+
+def get_store_hours(supabase, store_id):
+    return get(supabase, "store_hours", store_id)
+
+
+def get_therapist_times(supabase, store_id):
+    return get(supabase, "therapist_times", store_id)
+
+
+def get_therapist_breaks(supabase, store_id):
+    return get(supabase, "therapist_breaks", store_id)
+
+
+def get_schedule_exceptions(supabase, store_id):
+    return get(supabase, "schedule_exceptions", store_id)
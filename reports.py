@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+import bookings_repo
+
+# ------------------ Report queries ------------------
+# Totals come back already grouped from income_summary / therapist_pay_summary
+# (read from daily_rollups, sql/007_daily_rollups.sql): one row per period (and
+# therapist), not per booking.
+
+PERIODS = ["day", "week", "month"]
+
+
+def default_range(days=7):
+    end = bookings_repo.today()
+    return end - timedelta(days=days - 1), end
+
+
+def _call(supabase, function, store_id, start_date, end_date, period):
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {PERIODS}")
+    return supabase.rpc(function, {
+        "p_store_id": store_id,
+        "p_from": start_date.isoformat(),
+        "p_to": end_date.isoformat(),
+        "p_period": period
+    }).execute().data or []
+
+
+def income_summary(supabase, store_id, start_date, end_date, period="day"):
+    return _call(supabase, "income_summary", store_id, start_date, end_date, period)
+
+
+def therapist_pay_summary(supabase, store_id, start_date, end_date, period="day"):
+    return _call(supabase, "therapist_pay_summary", store_id, start_date, end_date, period)
+
+
+def store_load_stats(supabase, start_date, end_date):
+    # one row per store, busiest first (sql/009_store_load_stats.sql)
+    return supabase.rpc("store_load_stats", {
+        "p_from": start_date.isoformat(),
+        "p_to": end_date.isoformat()
+    }).execute().data or []
+
+
+# ------------------ Rollup maintenance ------------------
+def verify_rollups(supabase, store_id=None):
+    # rows where daily_rollups differs from a full recompute; [] means consistent
+    return supabase.rpc("verify_daily_rollups", {"p_store_id": store_id}).execute().data or []
+
+
+def rebuild_rollups(supabase, store_id=None):
+    return supabase.rpc("rebuild_daily_rollups", {"p_store_id": store_id}).execute().data or 0
+
+
+# ------------------ CLI: python reports.py verify|rebuild [store_id] ------------------
+if __name__ == "__main__":
+    import sys
+    import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    target_store = sys.argv[2] if len(sys.argv) > 2 else None
+    client = db.client_from_env()
+
+    mismatches = verify_rollups(client, target_store)
+    print(f"🔎 {len(mismatches)} rollup rows differ from a full recompute")
+    for row in mismatches[:20]:
+        print("   ", row)
+    if command == "rebuild":
+        written = rebuild_rollups(client, target_store)
+        remaining = verify_rollups(client, target_store)
+        print(f"🔁 Rebuilt {written} rollup rows, {len(remaining)} mismatches after rebuild")
+        sys.exit(1 if remaining else 0)
+    sys.exit(1 if mismatches else 0)
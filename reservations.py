@@ -0,0 +1,36 @@
+from collections import namedtuple
+
+# ------------------ Reservation results ------------------
+RESERVED = "reserved"
+SLOT_TAKEN = "slot_taken"
+INVALID_TIME = "invalid_time"
+ERROR = "error"  # the RPC answered without a status; nothing is known to be booked
+
+SLOT_TAKEN_MESSAGE = "⛔ Sorry, this slot was just taken. Please choose another time."
+INVALID_TIME_MESSAGE = "❗ End time must be after start time."
+ERROR_MESSAGE = "⚠️ We couldn't confirm your booking right now. Please try again in a moment."
+
+Reservation = namedtuple("Reservation", ["status", "booking"])
+
+
+# ------------------ Reserve (overlap check + insert in one DB transaction) ------------------
+def reserve_booking(supabase, booking, email=None):
+    # booking uses the bookings column names: store_id, Date, start_time, end_time,
+    # customer_name, Therapist, phone, Type, add_on, Add-on Price.
+    # email (outbox.email_payload) is queued with the booking, only if it is reserved.
+    params = {"p_booking": booking}
+    if email:
+        params["p_email"] = email
+    response = supabase.rpc("reserve_booking", params).execute()
+    result = response.data or {}
+    if not result.get("status"):
+        return Reservation(ERROR, None)
+    return Reservation(result["status"], result.get("booking"))
+
+
+def failure_message(reservation):
+    if reservation.status == INVALID_TIME:
+        return INVALID_TIME_MESSAGE
+    if reservation.status == ERROR:
+        return ERROR_MESSAGE
+    return SLOT_TAKEN_MESSAGE
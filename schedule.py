@@ -0,0 +1,97 @@
+from collections import defaultdict, namedtuple
+
+from availability import span_mask, to_minutes
+
+# ------------------ Schedule model ------------------
+# Inputs (sql/010_schedules.sql): store_hours and therapist_times rows with an optional
+# ISO weekday (null = every day; store_hours rows can also mark a weekday closed),
+# therapist_breaks, and schedule_exceptions for single dates (closed, or different
+# hours; "Name" null = whole store). compile_day() turns them into one minute bitmap
+# per provider for a date; slot search is then a mask intersection with the day's
+# bookings (see availability.window_starts / rank_slots).
+# ref_cache.get_day_schedule() caches the result per (store, date).
+
+DEFAULT_HOURS = (10 * 60, 20 * 60)  # booking page fallback when a store has no hours
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+DaySchedule = namedtuple("DaySchedule", ["date", "open_minute", "close_minute", "windows"])
+
+
+def _span(row, start_key, end_key):
+    try:
+        return to_minutes(row[start_key]), to_minutes(row[end_key])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def for_weekday(rows, weekday):
+    # rows for this ISO weekday, else the every-day (weekday null) rows
+    specific = [r for r in rows if r.get("weekday") == weekday]
+    return specific or [r for r in rows if r.get("weekday") is None]
+
+
+def _exception(exceptions, day, name):
+    iso = day.isoformat()
+    for row in exceptions:
+        if str(row.get("day"))[:10] == iso and row.get("Name") == name:
+            return row
+    return None
+
+
+def store_hours_for(day, store_hours, exceptions=()):
+    # (open, close) minutes for the date, or None when the store is closed
+    override = _exception(exceptions, day, None)
+    if override:
+        return None if override.get("closed", True) else _span(override, "Start", "End")
+    if not store_hours:
+        return DEFAULT_HOURS
+    # like shifts: with only weekday rows, the store opens just on the days they list
+    for row in for_weekday(store_hours, day.isoweekday()):
+        if row.get("closed"):
+            return None
+        span = _span(row, "Open", "Close")
+        if span:
+            return span
+    return None
+
+
+def compile_day(day, providers, store_hours, therapist_times=(), breaks=(), exceptions=()):
+    hours = store_hours_for(day, store_hours, exceptions)
+    if not hours:
+        return DaySchedule(day, None, None, {})
+    store_mask = span_mask(*hours)
+    weekday = day.isoweekday()
+
+    shifts = defaultdict(list)
+    for row in therapist_times:
+        shifts[row.get("Name")].append(row)
+    breaks_by_name = defaultdict(list)
+    for row in breaks:
+        breaks_by_name[row.get("Name")].append(row)
+
+    windows = {}
+    for name in providers:
+        override = _exception(exceptions, day, name)
+        if override:
+            if override.get("closed", True):
+                continue
+            spans = [_span(override, "Start", "End")]
+        elif shifts.get(name):
+            # a therapist with shift rows works only the days those rows cover
+            spans = [_span(r, "Start", "End") for r in for_weekday(shifts[name], weekday)]
+        else:
+            spans = [hours]
+        mask = 0
+        for span in spans:
+            if span:
+                mask |= span_mask(*span)
+        for row in breaks_by_name.get(name, []):
+            if row.get("weekday") not in (None, weekday):  # daily breaks apply on top of weekday ones
+                continue
+            span = _span(row, "Start", "End")
+            if span:
+                mask &= ~span_mask(*span)
+        mask &= store_mask
+        if mask:
+            windows[name] = mask
+    return DaySchedule(day, hours[0], hours[1], windows)
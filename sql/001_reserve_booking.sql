@@ -0,0 +1,68 @@
+-- ------------------ Atomic booking reservation ------------------
+-- Checks for an overlapping booking and inserts in one transaction.
+-- A transaction-scoped advisory lock keyed on (store, therapist, date)
+-- serialises concurrent attempts for the same provider/day, so two
+-- customers confirming the same slot can never both succeed.
+--
+-- p_email ({"recipient", "subject", "body"}), when given, is queued in email_outbox
+-- (sql/002_email_outbox.sql) in the same transaction, so a booking is never saved
+-- without its confirmation.
+--
+-- Returns {"status": "reserved", "booking": {...}} or {"status": "slot_taken"}.
+
+drop function if exists reserve_booking(jsonb);
+
+create or replace function reserve_booking(p_booking jsonb, p_email jsonb default null)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_store_id  uuid := (p_booking->>'store_id')::uuid;
+  v_therapist text := p_booking->>'Therapist';
+  v_date      text := p_booking->>'Date';
+  v_start     time := to_timestamp(p_booking->>'start_time', 'HH12:MI AM')::time;
+  v_end       time := to_timestamp(p_booking->>'end_time', 'HH12:MI AM')::time;
+  v_row       bookings;
+begin
+  if v_end <= v_start then
+    return jsonb_build_object('status', 'invalid_time');
+  end if;
+
+  perform pg_advisory_xact_lock(
+    hashtextextended(v_store_id::text || '|' || v_therapist || '|' || v_date, 0)
+  );
+
+  if exists (
+    select 1
+    from bookings b
+    where b.store_id = v_store_id
+      and b."Therapist" = v_therapist
+      and b."Date" = v_date
+      and to_timestamp(b.start_time, 'HH12:MI AM')::time < v_end
+      and to_timestamp(b.end_time, 'HH12:MI AM')::time > v_start
+  ) then
+    return jsonb_build_object('status', 'slot_taken');
+  end if;
+
+  insert into bookings (
+    store_id, "Date", start_time, end_time, customer_name,
+    "Therapist", phone, "Type", add_on, "Add-on Price"
+  )
+  values (
+    v_store_id, v_date, p_booking->>'start_time', p_booking->>'end_time', p_booking->>'customer_name',
+    v_therapist, p_booking->>'phone', p_booking->>'Type', coalesce(p_booking->>'add_on', ''),
+    coalesce((p_booking->>'Add-on Price')::numeric, 0)
+  )
+  returning * into v_row;
+
+  if p_email is not null then
+    insert into email_outbox (store_id, recipient, subject, body)
+    values (v_store_id, p_email->>'recipient', p_email->>'subject', p_email->>'body');
+  end if;
+
+  return jsonb_build_object('status', 'reserved', 'booking', to_jsonb(v_row));
+end;
+$$;
+
+create index if not exists bookings_store_therapist_date_idx
+  on bookings (store_id, "Therapist", "Date");
@@ -0,0 +1,46 @@
+-- ------------------ Email outbox ------------------
+-- Booking confirmations are written here by reserve_booking (sql/001), in the same
+-- transaction as the booking, and sent later by outbox.OutboxWorker, so the booking
+-- page never waits on SMTP.
+
+create table if not exists email_outbox (
+  id              bigserial primary key,
+  store_id        uuid,
+  recipient       text not null,
+  subject         text not null,
+  body            text not null,
+  status          text not null default 'pending',   -- pending | sending | sent | failed
+  attempts        integer not null default 0,
+  next_attempt_at timestamptz not null default now(),
+  last_error      text,
+  created_at      timestamptz not null default now(),
+  sent_at         timestamptz
+);
+
+create index if not exists email_outbox_due_idx
+  on email_outbox (status, next_attempt_at);
+
+-- Claims up to p_limit due messages. "skip locked" lets several workers
+-- (one per Streamlit process) drain the queue without sending twice.
+-- Rows stuck in "sending" for longer than p_lease are reclaimed. The attempt is
+-- counted here, at claim, so a message that takes its worker down with it still
+-- runs out of attempts.
+create or replace function claim_email_batch(p_limit integer, p_lease interval default '5 minutes')
+returns setof email_outbox
+language sql
+as $$
+  update email_outbox o
+  set status = 'sending',
+      attempts = o.attempts + 1,
+      next_attempt_at = now() + p_lease
+  where o.id in (
+    select id
+    from email_outbox
+    where status in ('pending', 'sending')
+      and next_attempt_at <= now()
+    order by next_attempt_at
+    limit p_limit
+    for update skip locked
+  )
+  returning o.*;
+$$;
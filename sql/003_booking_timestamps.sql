@@ -0,0 +1,95 @@
+-- ------------------ Typed booking timestamps ------------------
+-- bookings."Date" / start_time / end_time stay as the display strings
+-- ("%d/%m/%Y", "%I:%M %p"). starts_at / ends_at are derived from them by a
+-- trigger, so every writer (booking page, admin forms, calendar drag-and-drop,
+-- reserve_booking) keeps them in sync without changes, and readers can run
+-- indexed range queries instead of parsing strings in Python.
+
+create or replace function parse_booking_ts(p_date text, p_time text)
+returns timestamptz
+language plpgsql
+immutable
+as $$
+begin
+  return (to_date(p_date, 'DD/MM/YYYY') + to_timestamp(p_time, 'HH12:MI AM')::time)
+         at time zone 'Australia/Melbourne';
+exception when others then
+  return null;
+end;
+$$;
+
+alter table bookings add column if not exists starts_at timestamptz;
+alter table bookings add column if not exists ends_at timestamptz;
+alter table archived_bookings add column if not exists starts_at timestamptz;
+alter table archived_bookings add column if not exists ends_at timestamptz;
+
+create index if not exists bookings_store_starts_at_idx on bookings (store_id, starts_at);
+create index if not exists archived_bookings_store_starts_at_idx on archived_bookings (store_id, starts_at);
+
+create or replace function set_booking_timestamps()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.starts_at := parse_booking_ts(new."Date", new.start_time);
+  new.ends_at := parse_booking_ts(new."Date", new.end_time);
+  return new;
+end;
+$$;
+
+drop trigger if exists bookings_set_timestamps on bookings;
+create trigger bookings_set_timestamps
+  before insert or update of "Date", start_time, end_time on bookings
+  for each row execute function set_booking_timestamps();
+
+drop trigger if exists archived_bookings_set_timestamps on archived_bookings;
+create trigger archived_bookings_set_timestamps
+  before insert or update of "Date", start_time, end_time on archived_bookings
+  for each row execute function set_booking_timestamps();
+
+-- Backfills up to p_batch_size rows of p_table (bookings or archived_bookings)
+-- whose strings parse; malformed rows are skipped so repeated calls terminate.
+-- Returns the number of rows updated. Driven by backfill_timestamps.py.
+create or replace function backfill_booking_timestamps(p_table text, p_batch_size integer default 1000)
+returns integer
+language plpgsql
+as $$
+declare
+  v_count integer;
+begin
+  if p_table not in ('bookings', 'archived_bookings') then
+    raise exception 'unsupported table %', p_table;
+  end if;
+
+  execute format(
+    'update %1$I t
+        set starts_at = parse_booking_ts(t."Date", t.start_time),
+            ends_at = parse_booking_ts(t."Date", t.end_time)
+      where t.ctid in (
+        select ctid from %1$I
+         where starts_at is null
+           and parse_booking_ts("Date", start_time) is not null
+         limit $1)',
+    p_table)
+  using p_batch_size;
+
+  get diagnostics v_count = row_count;
+  return v_count;
+end;
+$$;
+
+-- Rows that still have no timestamps after a backfill (malformed strings).
+create or replace function count_unparsed_bookings(p_table text)
+returns bigint
+language plpgsql
+as $$
+declare
+  v_count bigint;
+begin
+  if p_table not in ('bookings', 'archived_bookings') then
+    raise exception 'unsupported table %', p_table;
+  end if;
+  execute format('select count(*) from %I where starts_at is null', p_table) into v_count;
+  return v_count;
+end;
+$$;
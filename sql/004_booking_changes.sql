@@ -0,0 +1,119 @@
+-- ------------------ Booking change feed ------------------
+-- Every insert / update / delete on bookings appends one row here. The admin
+-- dashboard keeps a (txid, seq) high-water mark and on each autorefresh tick asks
+-- only for changes after it (change_feed.BookingFeed).
+--
+-- seq alone is not a safe cursor: it is taken at insert time but only becomes
+-- visible at commit, so a slow transaction can commit seq 41 after seq 42 was
+-- read. booking_changes_since() therefore only hands out changes from
+-- transactions older than the snapshot's xmin (all of them finished, nothing can
+-- still appear below it) and the feed's cursor is ordered by txid first.
+
+create table if not exists booking_changes (
+  seq        bigserial primary key,
+  store_id   uuid not null,
+  booking_id text not null,
+  op         text not null,               -- INSERT | UPDATE | DELETE
+  changed_at timestamptz not null default now(),
+  txid       bigint not null default (pg_current_xact_id()::text::bigint)
+);
+
+alter table booking_changes
+  add column if not exists txid bigint not null default (pg_current_xact_id()::text::bigint);
+
+create index if not exists booking_changes_store_seq_idx on booking_changes (store_id, seq);
+create index if not exists booking_changes_store_txid_idx on booking_changes (store_id, txid, seq);
+-- prune_booking_changes() and store_load_stats() (sql/009) both select by changed_at
+create index if not exists booking_changes_changed_at_idx on booking_changes (changed_at);
+
+create or replace function log_booking_change()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op = 'DELETE' then
+    insert into booking_changes (store_id, booking_id, op) values (old.store_id, old.id::text, tg_op);
+    return old;
+  end if;
+  insert into booking_changes (store_id, booking_id, op) values (new.store_id, new.id::text, tg_op);
+  return new;
+end;
+$$;
+
+drop trigger if exists bookings_log_change on bookings;
+create trigger bookings_log_change
+  after insert or update or delete on bookings
+  for each row execute function log_booking_change();
+
+-- Highest txid the prune has removed. A cursor at or below it may have missed
+-- changes, so the feed is told to reload instead of silently skipping them.
+create table if not exists booking_changes_pruned (
+  id           boolean primary key default true check (id),
+  through_txid bigint not null default 0
+);
+insert into booking_changes_pruned default values on conflict do nothing;
+
+create or replace function booking_changes_since(
+  p_store_id   uuid,
+  p_after_txid bigint default null,   -- null: just return the current horizon
+  p_after_seq  bigint default 0,
+  p_limit      integer default 1000
+)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  v_horizon bigint := pg_snapshot_xmin(pg_current_snapshot())::text::bigint;
+  v_pruned  bigint;
+begin
+  if p_after_txid is null then
+    return jsonb_build_object('horizon', v_horizon, 'reset', false, 'changes', '[]'::jsonb);
+  end if;
+
+  select through_txid into v_pruned from booking_changes_pruned;
+
+  return jsonb_build_object(
+    'horizon', v_horizon,
+    'reset', coalesce(v_pruned, 0) >= p_after_txid,
+    'changes', coalesce((
+      select jsonb_agg(jsonb_build_object('txid', c.txid, 'seq', c.seq, 'booking_id', c.booking_id, 'op', c.op)
+                       order by c.txid, c.seq)
+      from (
+        select txid, seq, booking_id, op
+        from booking_changes
+        where store_id = p_store_id
+          and (txid, seq) > (p_after_txid, p_after_seq)
+          and txid < v_horizon
+        order by txid, seq
+        limit p_limit
+      ) c
+    ), '[]'::jsonb)
+  );
+end;
+$$;
+
+-- Feed consumers only ever look a few ticks back; keep one day of history.
+create or replace function prune_booking_changes(p_keep interval default '1 day')
+returns integer
+language plpgsql
+as $$
+declare
+  v_count integer;
+  v_txid  bigint;
+begin
+  with gone as (
+    delete from booking_changes where changed_at < now() - p_keep returning txid
+  )
+  select count(*), max(txid) into v_count, v_txid from gone;
+
+  if v_txid is not null then
+    update booking_changes_pruned set through_txid = greatest(through_txid, v_txid);
+  end if;
+  return v_count;
+end;
+$$;
+
+-- Hourly with pg_cron (re-running this file just updates the job).
+create extension if not exists pg_cron;
+select cron.schedule('prune-booking-changes', '17 * * * *', 'select prune_booking_changes()');
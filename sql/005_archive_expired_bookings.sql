@@ -0,0 +1,69 @@
+-- ------------------ Set-based archiving ------------------
+-- Moves bookings that started before p_before into archived_bookings with one
+-- INSERT ... SELECT over a DELETE ... RETURNING, at most p_batch_size rows per
+-- call. Each call is its own transaction: a batch is either fully moved or not
+-- at all. p_store_id = null archives every store. Returns rows moved.
+
+create or replace function melbourne_today_start()
+returns timestamptz
+language sql
+stable
+as $$
+  select date_trunc('day', now() at time zone 'Australia/Melbourne') at time zone 'Australia/Melbourne';
+$$;
+
+create or replace function archive_expired_bookings(
+  p_store_id uuid default null,
+  p_before timestamptz default null,
+  p_batch_size integer default 500
+)
+returns integer
+language plpgsql
+as $$
+declare
+  v_before timestamptz := coalesce(p_before, melbourne_today_start());
+  v_count integer;
+begin
+  with moved as (
+    delete from bookings b
+    where b.ctid in (
+      select ctid
+      from bookings
+      where starts_at < v_before
+        and (p_store_id is null or store_id = p_store_id)
+      limit p_batch_size
+      for update skip locked
+    )
+    returning b.*
+  )
+  insert into archived_bookings
+  select (jsonb_populate_record(null::archived_bookings, to_jsonb(m))).*
+  from moved m;
+
+  get diagnostics v_count = row_count;
+  return v_count;
+end;
+$$;
+
+-- Scheduled job: drains all stores batch by batch, committing after each batch.
+create or replace procedure archive_expired_bookings_job(p_batch_size integer default 500)
+language plpgsql
+as $$
+declare
+  v_moved integer;
+begin
+  loop
+    v_moved := archive_expired_bookings(null, null, p_batch_size);
+    commit;
+    exit when v_moved < p_batch_size;
+  end loop;
+end;
+$$;
+
+-- Nightly with pg_cron, instead of on every Calendar render. pg_cron schedules in
+-- UTC and Melbourne midnight moves with daylight saving: 00:05 is 14:05 UTC under
+-- AEST (UTC+10) but 13:05 UTC under AEDT (UTC+11). Running at both keeps 00:05
+-- local all year; the other run (23:05 or 01:05 local) finds nothing new to move,
+-- because the cutoff is always the start of the Melbourne day.
+create extension if not exists pg_cron;
+select cron.schedule('archive-expired-bookings', '5 13,14 * * *', 'call archive_expired_bookings_job()');
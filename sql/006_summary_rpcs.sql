@@ -0,0 +1,83 @@
+-- ------------------ Report aggregates ------------------
+-- Income and payroll totals computed in the database for [p_from, p_to]
+-- (Melbourne calendar dates, inclusive), grouped by day, week or month.
+-- Archived bookings are included so past periods stay complete after archiving.
+
+create or replace view store_booking_history as
+  select store_id, "Therapist", "Type", "Add-on Price", starts_at, ends_at from bookings
+  union all
+  select store_id, "Therapist", "Type", "Add-on Price", starts_at, ends_at from archived_bookings;
+
+create or replace function income_summary(
+  p_store_id uuid,
+  p_from date,
+  p_to date,
+  p_period text default 'day'
+)
+returns table (
+  period_start date,
+  bookings bigint,
+  hours numeric,
+  base_income numeric,
+  addon_income numeric,
+  total_income numeric
+)
+language sql
+stable
+as $$
+  with scoped as (
+    select
+      date_trunc(p_period, h.starts_at at time zone 'Australia/Melbourne')::date as period_start,
+      extract(epoch from (h.ends_at - h.starts_at)) / 3600.0 as hours,
+      coalesce(m."Price-hour", 0) as price,
+      coalesce(h."Add-on Price", 0) as addon
+    from store_booking_history h
+    left join massage_types m on m.store_id = h.store_id and m."Type" = h."Type"
+    where h.store_id = p_store_id
+      and h.starts_at >= p_from::timestamp at time zone 'Australia/Melbourne'
+      and h.starts_at < (p_to + 1)::timestamp at time zone 'Australia/Melbourne'
+  )
+  select
+    period_start,
+    count(*),
+    round(sum(hours)::numeric, 2),
+    round(sum(hours * price)::numeric, 2),
+    round(sum(addon)::numeric, 2),
+    round(sum(hours * price + addon)::numeric, 2)
+  from scoped
+  group by period_start
+  order by period_start;
+$$;
+
+create or replace function therapist_pay_summary(
+  p_store_id uuid,
+  p_from date,
+  p_to date,
+  p_period text default 'day'
+)
+returns table (
+  period_start date,
+  therapist text,
+  bookings bigint,
+  hours numeric,
+  rate numeric,
+  pay numeric
+)
+language sql
+stable
+as $$
+  select
+    date_trunc(p_period, h.starts_at at time zone 'Australia/Melbourne')::date,
+    h."Therapist",
+    count(*),
+    round(sum(extract(epoch from (h.ends_at - h.starts_at)) / 3600.0)::numeric, 2),
+    max(coalesce(t."Rate/hour", 0))::numeric,
+    round(sum(extract(epoch from (h.ends_at - h.starts_at)) / 3600.0 * coalesce(t."Rate/hour", 0))::numeric, 2)
+  from store_booking_history h
+  left join therapists t on t.store_id = h.store_id and t."Name" = h."Therapist"
+  where h.store_id = p_store_id
+    and h.starts_at >= p_from::timestamp at time zone 'Australia/Melbourne'
+    and h.starts_at < (p_to + 1)::timestamp at time zone 'Australia/Melbourne'
+  group by 1, 2
+  order by 1, 2;
+$$;
@@ -0,0 +1,316 @@
+-- ------------------ Daily rollups ------------------
+-- One row per (store, day, therapist) with bookings, hours, income and payroll,
+-- maintained by triggers on bookings and archived_bookings. Inserts add, deletes
+-- subtract and updates (e.g. calendar drag-and-drop) move the amounts. Archiving
+-- is a delete from bookings plus an insert into archived_bookings, so it nets out.
+--
+-- Pricing rule: a booking is priced once, when it is written. The service's
+-- Price-hour and the therapist's Rate/hour are copied onto the row (price_per_hour,
+-- rate_per_hour) and re-copied only when its Type or Therapist changes. Triggers,
+-- compute/verify/rebuild and archiving all read those columns, so later price
+-- changes never re-price history and a rebuild agrees with the triggers.
+
+alter table bookings add column if not exists price_per_hour numeric;
+alter table bookings add column if not exists rate_per_hour numeric;
+alter table archived_bookings add column if not exists price_per_hour numeric;
+alter table archived_bookings add column if not exists rate_per_hour numeric;
+
+create or replace function snapshot_booking_prices()
+returns trigger
+language plpgsql
+as $$
+begin
+  if new.price_per_hour is null
+     or (tg_op = 'UPDATE' and new."Type" is distinct from old."Type") then
+    select coalesce(max("Price-hour"), 0) into new.price_per_hour
+      from massage_types where store_id = new.store_id and "Type" = new."Type";
+  end if;
+  if new.rate_per_hour is null
+     or (tg_op = 'UPDATE' and new."Therapist" is distinct from old."Therapist") then
+    select coalesce(max("Rate/hour"), 0) into new.rate_per_hour
+      from therapists where store_id = new.store_id and "Name" = new."Therapist";
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists bookings_snapshot_prices on bookings;
+create trigger bookings_snapshot_prices
+  before insert or update on bookings
+  for each row execute function snapshot_booking_prices();
+
+-- archived rows arrive with their snapshot; this only fills rows that never had one
+drop trigger if exists archived_bookings_snapshot_prices on archived_bookings;
+create trigger archived_bookings_snapshot_prices
+  before insert or update on archived_bookings
+  for each row execute function snapshot_booking_prices();
+
+-- store_booking_history (sql/006) gains the snapshot columns
+create or replace view store_booking_history as
+  select store_id, "Therapist", "Type", "Add-on Price", starts_at, ends_at, price_per_hour, rate_per_hour from bookings
+  union all
+  select store_id, "Therapist", "Type", "Add-on Price", starts_at, ends_at, price_per_hour, rate_per_hour from archived_bookings;
+
+create table if not exists daily_rollups (
+  store_id     uuid not null,
+  day          date not null,
+  therapist    text not null,
+  bookings     integer not null default 0,
+  hours        numeric not null default 0,
+  base_income  numeric not null default 0,   -- hours * price_per_hour
+  addon_income numeric not null default 0,   -- "Add-on Price"
+  income       numeric not null default 0,   -- base_income + addon_income
+  payroll      numeric not null default 0,   -- hours * rate_per_hour
+  primary key (store_id, day, therapist)
+);
+
+alter table daily_rollups add column if not exists base_income numeric not null default 0;
+alter table daily_rollups add column if not exists addon_income numeric not null default 0;
+
+-- Only the trigger below calls this; it is not an RPC (execute is revoked after it).
+create or replace function rollup_apply(p_row jsonb, p_sign integer)
+returns void
+language plpgsql
+as $$
+declare
+  v_store_id  uuid := (p_row->>'store_id')::uuid;
+  v_starts_at timestamptz := (p_row->>'starts_at')::timestamptz;
+  v_ends_at   timestamptz := (p_row->>'ends_at')::timestamptz;
+  v_therapist text := coalesce(p_row->>'Therapist', '');
+  v_price     numeric := coalesce((p_row->>'price_per_hour')::numeric, 0);
+  v_rate      numeric := coalesce((p_row->>'rate_per_hour')::numeric, 0);
+  v_addon     numeric := coalesce((p_row->>'Add-on Price')::numeric, 0);
+  v_hours     numeric;
+begin
+  if v_store_id is null or v_starts_at is null or v_ends_at is null then
+    return;
+  end if;
+
+  v_hours := extract(epoch from (v_ends_at - v_starts_at)) / 3600.0;
+
+  insert into daily_rollups as r (store_id, day, therapist, bookings, hours, base_income, addon_income, income, payroll)
+  values (
+    v_store_id,
+    (v_starts_at at time zone 'Australia/Melbourne')::date,
+    v_therapist,
+    p_sign,
+    p_sign * v_hours,
+    p_sign * v_hours * v_price,
+    p_sign * v_addon,
+    p_sign * (v_hours * v_price + v_addon),
+    p_sign * v_hours * v_rate
+  )
+  on conflict (store_id, day, therapist) do update
+    set bookings = r.bookings + excluded.bookings,
+        hours = r.hours + excluded.hours,
+        base_income = r.base_income + excluded.base_income,
+        addon_income = r.addon_income + excluded.addon_income,
+        income = r.income + excluded.income,
+        payroll = r.payroll + excluded.payroll;
+end;
+$$;
+
+-- security definer: the trigger writes daily_rollups for the row's writer, who has
+-- no execute on rollup_apply (trigger functions can't be called over PostgREST)
+create or replace function maintain_daily_rollups()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform rollup_apply(to_jsonb(old), -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform rollup_apply(to_jsonb(new), 1);
+  end if;
+  return null;
+end;
+$$;
+
+revoke execute on function rollup_apply(jsonb, integer) from public, anon, authenticated;
+
+-- AFTER triggers, so starts_at / ends_at are already set by set_booking_timestamps.
+drop trigger if exists bookings_daily_rollups on bookings;
+create trigger bookings_daily_rollups
+  after insert or update or delete on bookings
+  for each row execute function maintain_daily_rollups();
+
+drop trigger if exists archived_bookings_daily_rollups on archived_bookings;
+create trigger archived_bookings_daily_rollups
+  after insert or update or delete on archived_bookings
+  for each row execute function maintain_daily_rollups();
+
+-- ------------------ Rebuild / verify ------------------
+-- Full recompute from bookings + archived_bookings, priced from the same
+-- price_per_hour / rate_per_hour snapshots the triggers use.
+-- The return columns change, so an earlier version is dropped first.
+drop function if exists compute_daily_rollups(uuid);
+
+create or replace function compute_daily_rollups(p_store_id uuid default null)
+returns table (
+  store_id uuid, day date, therapist text, bookings integer, hours numeric,
+  base_income numeric, addon_income numeric, income numeric, payroll numeric
+)
+language sql
+stable
+as $$
+  with scoped as (
+    select
+      h.store_id,
+      (h.starts_at at time zone 'Australia/Melbourne')::date as day,
+      coalesce(h."Therapist", '') as therapist,
+      extract(epoch from (h.ends_at - h.starts_at)) / 3600.0 as hours,
+      coalesce(h.price_per_hour, 0) as price,
+      coalesce(h.rate_per_hour, 0) as rate,
+      coalesce(h."Add-on Price", 0) as addon
+    from store_booking_history h
+    where h.starts_at is not null and h.ends_at is not null
+      and (p_store_id is null or h.store_id = p_store_id)
+  )
+  select store_id, day, therapist,
+         count(*)::integer, sum(hours), sum(hours * price), sum(addon),
+         sum(hours * price + addon), sum(hours * rate)
+  from scoped
+  group by store_id, day, therapist;
+$$;
+
+-- Rows where the maintained rollups differ from a full recompute (by more than a cent).
+create or replace function verify_daily_rollups(p_store_id uuid default null)
+returns table (
+  store_id uuid, day date, therapist text,
+  stored_bookings integer, expected_bookings integer,
+  stored_income numeric, expected_income numeric,
+  stored_payroll numeric, expected_payroll numeric
+)
+language sql
+stable
+as $$
+  select
+    coalesce(r.store_id, c.store_id), coalesce(r.day, c.day), coalesce(r.therapist, c.therapist),
+    coalesce(r.bookings, 0), coalesce(c.bookings, 0),
+    round(coalesce(r.income, 0), 2), round(coalesce(c.income, 0), 2),
+    round(coalesce(r.payroll, 0), 2), round(coalesce(c.payroll, 0), 2)
+  from (
+    select * from daily_rollups where p_store_id is null or store_id = p_store_id
+  ) r
+  full join compute_daily_rollups(p_store_id) c
+    on c.store_id = r.store_id and c.day = r.day and c.therapist = r.therapist
+  where coalesce(r.bookings, 0) <> coalesce(c.bookings, 0)
+     or abs(coalesce(r.income, 0) - coalesce(c.income, 0)) > 0.01
+     or abs(coalesce(r.payroll, 0) - coalesce(c.payroll, 0)) > 0.01;
+$$;
+
+-- Replaces the stored rollups with a full recompute. Returns rows written.
+create or replace function rebuild_daily_rollups(p_store_id uuid default null)
+returns integer
+language plpgsql
+security definer
+as $$
+declare
+  v_count integer;
+begin
+  delete from daily_rollups where p_store_id is null or store_id = p_store_id;
+  insert into daily_rollups (store_id, day, therapist, bookings, hours, base_income, addon_income, income, payroll)
+  select * from compute_daily_rollups(p_store_id);
+  get diagnostics v_count = row_count;
+  return v_count;
+end;
+$$;
+
+-- ------------------ Reports read the rollups ------------------
+-- The return columns change, so the sql/006 versions are dropped first.
+drop function if exists income_summary(uuid, date, date, text);
+drop function if exists therapist_pay_summary(uuid, date, date, text);
+
+create or replace function income_summary(
+  p_store_id uuid,
+  p_from date,
+  p_to date,
+  p_period text default 'day'
+)
+returns table (
+  period_start date,
+  bookings bigint,
+  hours numeric,
+  base_income numeric,
+  addon_income numeric,
+  total_income numeric
+)
+language sql
+stable
+as $$
+  select
+    date_trunc(p_period, day)::date,
+    sum(bookings)::bigint,
+    round(sum(hours), 2),
+    round(sum(base_income), 2),
+    round(sum(addon_income), 2),
+    round(sum(income), 2)
+  from daily_rollups
+  where store_id = p_store_id and day between p_from and p_to
+  group by 1
+  having sum(bookings) > 0
+  order by 1;
+$$;
+
+create or replace function therapist_pay_summary(
+  p_store_id uuid,
+  p_from date,
+  p_to date,
+  p_period text default 'day'
+)
+returns table (
+  period_start date,
+  therapist text,
+  bookings bigint,
+  hours numeric,
+  rate numeric,
+  pay numeric
+)
+language sql
+stable
+as $$
+  -- rate: pay per hour worked, i.e. Rate/hour unless it changed within the period
+  select
+    date_trunc(p_period, day)::date,
+    therapist,
+    sum(bookings)::bigint,
+    round(sum(hours), 2),
+    round(sum(payroll) / nullif(sum(hours), 0), 2),
+    round(sum(payroll), 2)
+  from daily_rollups
+  where store_id = p_store_id and day between p_from and p_to
+  group by 1, 2
+  having sum(bookings) > 0
+  order by 1, 2;
+$$;
+
+-- ------------------ Seed ------------------
+-- Snapshot prices on rows written before this migration (current prices are the
+-- best record there is), then build the rollups from the full history. Only the
+-- price columns change, so the feed and rollup triggers stay out of the backfill.
+alter table bookings disable trigger bookings_log_change;
+alter table bookings disable trigger bookings_daily_rollups;
+alter table archived_bookings disable trigger archived_bookings_daily_rollups;
+
+update bookings b
+set price_per_hour = coalesce(b.price_per_hour,
+      (select coalesce(max("Price-hour"), 0) from massage_types m where m.store_id = b.store_id and m."Type" = b."Type")),
+    rate_per_hour = coalesce(b.rate_per_hour,
+      (select coalesce(max("Rate/hour"), 0) from therapists t where t.store_id = b.store_id and t."Name" = b."Therapist"))
+where b.price_per_hour is null or b.rate_per_hour is null;
+
+update archived_bookings b
+set price_per_hour = coalesce(b.price_per_hour,
+      (select coalesce(max("Price-hour"), 0) from massage_types m where m.store_id = b.store_id and m."Type" = b."Type")),
+    rate_per_hour = coalesce(b.rate_per_hour,
+      (select coalesce(max("Rate/hour"), 0) from therapists t where t.store_id = b.store_id and t."Name" = b."Therapist"))
+where b.price_per_hour is null or b.rate_per_hour is null;
+
+alter table bookings enable trigger bookings_log_change;
+alter table bookings enable trigger bookings_daily_rollups;
+alter table archived_bookings enable trigger archived_bookings_daily_rollups;
+
+select rebuild_daily_rollups();
@@ -0,0 +1,28 @@
+-- ------------------ Booking page bootstrap ------------------
+-- Everything app.py needs before the form renders, in one response:
+-- the store (by id or by slug), its hours, providers, shifts and services.
+-- Returns null when the store does not exist.
+
+create or replace function booking_page_bootstrap(p_store_id uuid default null, p_store_slug text default null)
+returns jsonb
+language sql
+stable
+as $$
+  with s as (
+    select id, store_name, store_slug
+    from stores
+    where (p_store_id is not null and id = p_store_id)
+       or (p_store_id is null and store_slug = p_store_slug)
+    limit 1
+  )
+  select jsonb_build_object(
+    'store', to_jsonb(s),
+    'store_hours', coalesce((select jsonb_agg(to_jsonb(h)) from store_hours h where h.store_id = s.id), '[]'::jsonb),
+    'therapists', coalesce((select jsonb_agg(to_jsonb(t)) from therapists t where t.store_id = s.id), '[]'::jsonb),
+    'therapist_times', coalesce((select jsonb_agg(to_jsonb(tt)) from therapist_times tt where tt.store_id = s.id), '[]'::jsonb),
+    'massage_types', coalesce((select jsonb_agg(to_jsonb(m)) from massage_types m where m.store_id = s.id), '[]'::jsonb)
+  )
+  from s;
+$$;
+
+create index if not exists stores_store_slug_idx on stores (store_slug);
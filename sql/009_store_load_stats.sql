@@ -0,0 +1,54 @@
+-- ------------------ Per-store load statistics (super admin) ------------------
+-- One grouped query over daily_rollups (sql/007) plus the booking_changes feed
+-- (sql/004) for [p_from, p_to]. Sorted by load so the busiest tenants come first.
+-- recent_writes / last_activity cover the last day of the change feed; the
+-- changed_at filter keeps this a range scan on booking_changes_changed_at_idx
+-- (sql/004) even when the hourly prune has fallen behind.
+
+create or replace function store_load_stats(p_from date, p_to date)
+returns table (
+  store_id uuid,
+  store_name text,
+  bookings bigint,
+  bookings_per_day numeric,
+  revenue numeric,
+  active_therapists bigint,
+  last_booking_day date,
+  recent_writes bigint,
+  last_activity timestamptz
+)
+language sql
+stable
+as $$
+  with usage as (
+    select
+      r.store_id,
+      sum(r.bookings)::bigint as bookings,
+      round(sum(r.income), 2) as revenue,
+      count(distinct r.therapist) filter (where r.bookings > 0) as active_therapists,
+      max(r.day) filter (where r.bookings > 0) as last_booking_day
+    from daily_rollups r
+    where r.day between p_from and p_to
+    group by r.store_id
+  ),
+  writes as (
+    select c.store_id, count(*) as recent_writes, max(c.changed_at) as last_activity
+    from booking_changes c
+    where c.changed_at >= now() - interval '1 day'
+    group by c.store_id
+  )
+  select
+    s.id,
+    s.store_name,
+    coalesce(u.bookings, 0),
+    round(coalesce(u.bookings, 0)::numeric / (p_to - p_from + 1), 2),
+    coalesce(u.revenue, 0),
+    coalesce(u.active_therapists, 0),
+    u.last_booking_day,
+    coalesce(w.recent_writes, 0),
+    w.last_activity
+  from stores s
+  left join usage u on u.store_id = s.id
+  left join writes w on w.store_id = s.id
+  order by coalesce(u.bookings, 0) + coalesce(w.recent_writes, 0) desc, s.store_name;
+$$;
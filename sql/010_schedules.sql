@@ -0,0 +1,64 @@
+-- ------------------ Schedules: weekday hours, breaks, date exceptions ------------------
+-- weekday is the ISO day of week (1 = Monday .. 7 = Sunday); null means every day,
+-- so the existing single store_hours row and one-row-per-therapist shifts keep working.
+-- Times stay in the same "10:00 AM" text format as the rest of these tables.
+
+alter table store_hours add column if not exists weekday smallint check (weekday between 1 and 7);
+-- closed marks one weekday shut (e.g. Sundays) while an every-day row covers the rest
+alter table store_hours add column if not exists closed boolean not null default false;
+alter table therapist_times add column if not exists weekday smallint check (weekday between 1 and 7);
+
+create table if not exists therapist_breaks (
+  id bigserial primary key,
+  store_id uuid not null,
+  "Name" text not null,
+  weekday smallint check (weekday between 1 and 7),
+  "Start" text not null,
+  "End" text not null
+);
+
+create index if not exists therapist_breaks_store_idx on therapist_breaks (store_id);
+
+-- one date: closed, or different hours. "Name" null = the whole store.
+create table if not exists schedule_exceptions (
+  id bigserial primary key,
+  store_id uuid not null,
+  day date not null,
+  "Name" text,
+  closed boolean not null default true,
+  "Start" text,
+  "End" text,
+  note text,
+  check (closed or ("Start" is not null and "End" is not null))
+);
+
+create index if not exists schedule_exceptions_store_day_idx on schedule_exceptions (store_id, day);
+
+
+-- ------------------ Booking page bootstrap (adds breaks + upcoming exceptions) ------------------
+create or replace function booking_page_bootstrap(p_store_id uuid default null, p_store_slug text default null)
+returns jsonb
+language sql
+stable
+as $$
+  with s as (
+    select id, store_name, store_slug
+    from stores
+    where (p_store_id is not null and id = p_store_id)
+       or (p_store_id is null and store_slug = p_store_slug)
+    limit 1
+  )
+  select jsonb_build_object(
+    'store', to_jsonb(s),
+    'store_hours', coalesce((select jsonb_agg(to_jsonb(h)) from store_hours h where h.store_id = s.id), '[]'::jsonb),
+    'therapists', coalesce((select jsonb_agg(to_jsonb(t)) from therapists t where t.store_id = s.id), '[]'::jsonb),
+    'therapist_times', coalesce((select jsonb_agg(to_jsonb(tt)) from therapist_times tt where tt.store_id = s.id), '[]'::jsonb),
+    'therapist_breaks', coalesce((select jsonb_agg(to_jsonb(b)) from therapist_breaks b where b.store_id = s.id), '[]'::jsonb),
+    'schedule_exceptions', coalesce((
+      select jsonb_agg(to_jsonb(e)) from schedule_exceptions e
+      where e.store_id = s.id and e.day >= (now() at time zone 'Australia/Melbourne')::date
+    ), '[]'::jsonb),
+    'massage_types', coalesce((select jsonb_agg(to_jsonb(m)) from massage_types m where m.store_id = s.id), '[]'::jsonb)
+  )
+  from s;
+$$;
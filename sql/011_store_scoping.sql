@@ -0,0 +1,76 @@
+-- ------------------ Store scoping in the database (row level security) ------------------
+-- Pages used to scope every query with .eq("store_id", ...) in Python, so one missed
+-- filter could read or write another store's rows. Now the database enforces it:
+-- once the store is known (admin login, booking page bootstrap) the pages send a
+-- short-lived JWT with role "authenticated" and a store_id claim (db.get_store_client),
+-- and every store table only shows that store's rows to it.
+--
+-- Keys:
+--   * anon key (SUPABASE_KEY): admin login and booking_page_bootstrap only.
+--   * store token: signed by the app with the project's JWT secret (SUPABASE_JWT_SECRET).
+--   * service_role key: superadmin.py, the email outbox worker and the command-line
+--     jobs (archiver.py, reports.py, booking_io.py, backfill_timestamps.py, outbox.py),
+--     which work across stores.
+
+create or replace function request_store_id()
+returns uuid
+language sql
+stable
+as $$
+  select nullif(auth.jwt() ->> 'store_id', '')::uuid;
+$$;
+
+do $$
+declare
+  v_tables text[] := array[
+    'bookings', 'archived_bookings', 'booking_changes', 'daily_rollups',
+    'therapists', 'therapist_times', 'therapist_breaks', 'massage_types',
+    'store_hours', 'schedule_exceptions', 'email_outbox'
+  ];
+  v_table  text;
+  v_policy record;
+begin
+  -- older policies keyed on set_config('request.store_id'), which PostgREST never
+  -- carried from one request to the next; permissive policies would OR with ours
+  for v_policy in
+    select tablename, policyname
+    from pg_policies
+    where schemaname = 'public'
+      and tablename = any (v_tables)
+      and (coalesce(qual, '') like '%request.store_id%' or coalesce(with_check, '') like '%request.store_id%')
+  loop
+    execute format('drop policy %I on %I', v_policy.policyname, v_policy.tablename);
+  end loop;
+
+  foreach v_table in array v_tables loop
+    execute format('alter table %I enable row level security', v_table);
+    execute format('drop policy if exists store_scope on %I', v_table);
+    execute format(
+      'create policy store_scope on %I for all to authenticated '
+      'using (store_id = request_store_id()) with check (store_id = request_store_id())',
+      v_table
+    );
+  end loop;
+end;
+$$;
+
+-- Views run with their owner's rights unless told otherwise, which would skip the
+-- policies above; with security_invoker the caller's store_scope applies (Postgres 15+).
+alter view store_booking_history set (security_invoker = true);
+revoke select on store_booking_history from anon;
+
+alter table stores enable row level security;
+drop policy if exists store_scope on stores;
+create policy store_scope on stores for select to authenticated using (id = request_store_id());
+
+-- The public booking page resolves its store by slug before it has a token, so the
+-- bootstrap reads on the caller's behalf (only the booking form's public fields).
+alter function booking_page_bootstrap(uuid, text) security definer set search_path = public;
+
+-- Maintenance RPCs that span stores: service_role only.
+revoke execute on function rebuild_daily_rollups(uuid) from public, anon, authenticated;
+revoke execute on function store_load_stats(date, date) from public, anon, authenticated;
+revoke execute on function prune_booking_changes(interval) from public, anon, authenticated;
+revoke execute on function backfill_booking_timestamps(text, integer) from public, anon, authenticated;
+revoke execute on function count_unparsed_bookings(text) from public, anon, authenticated;
+revoke execute on function claim_email_batch(integer, interval) from public, anon, authenticated;
@@ -0,0 +1,13 @@
+-- ------------------ External ids for imported bookings ------------------
+-- booking_io.py keeps the "id" column of an imported file as external_id and
+-- upserts on (store_id, external_id): the key is per store, so an import can
+-- never overwrite another store's booking that happens to share the old id.
+-- Rows created by the app leave external_id null (nulls never conflict).
+
+alter table bookings add column if not exists external_id text;
+alter table archived_bookings add column if not exists external_id text;
+
+create unique index if not exists bookings_store_external_id_key
+  on bookings (store_id, external_id);
+create unique index if not exists archived_bookings_store_external_id_key
+  on archived_bookings (store_id, external_id);
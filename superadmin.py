@@ -1,5 +1,8 @@
 import streamlit as st
-from supabase import create_client
+import db
+import bookings_repo
+import reports
+import instrumentation
 import pandas as pd
 import uuid
 from datetime import datetime
@@ -8,8 +11,8 @@ import re
 
 # ====== Connect to Supabase ======
 url = st.secrets["SUPABASE_URL"]
-key = st.secrets["SUPABASE_KEY"]
-supabase = create_client(url, key)
+key = st.secrets["SUPABASE_SERVICE_ROLE_KEY"]  # ✅ ดูได้ทุกร้าน: RLS (sql/011) ไม่กรอง service_role
+supabase = db.get_client(url, key)  # ✅ one pooled client per process
 
 # ====== Super Admin Credentials ======
 SUPER_ADMIN_EMAIL = st.secrets["SUPER_ADMIN_EMAIL"]
@@ -33,6 +36,90 @@ def login():
         else:
             st.error("❌ Email หรือ Password ผิด")
 
+# ====== Store Load Panel ======
+def store_stats_panel():
+    st.subheader("🔥 Store Activity")
+    default_from, default_to = reports.default_range(30)
+    col1, col2 = st.columns(2)
+    date_from = col1.date_input("Stats from", value=default_from)
+    date_to = col2.date_input("Stats to", value=default_to)
+    if date_from > date_to:
+        st.error("❗ 'Stats from' must be on or before 'Stats to'.")
+        return
+
+    stats = reports.store_load_stats(supabase, date_from, date_to)
+    if not stats:
+        st.info("ยังไม่มีข้อมูลร้าน")
+        return
+
+    df = pd.DataFrame(stats).rename(columns={
+        "store_name": "Store",
+        "bookings": "Bookings",
+        "bookings_per_day": "Bookings/day",
+        "revenue": "Revenue",
+        "active_therapists": "Active therapists",
+        "last_booking_day": "Last booking day",
+        "recent_writes": "Writes (24h)",
+        "last_activity": "Last activity"
+    })
+    st.dataframe(df.drop(columns=["store_id"]), use_container_width=True)
+
+
+# ====== Booking Explorer ======
+EXPLORER_COLUMNS = "customer_name, Date, start_time, end_time, Therapist, Type, store_id"
+EXPLORER_PAGE_SIZE = 50
+
+
+def booking_explorer(stores):
+    st.subheader("📅 All Bookings")
+
+    store_names = {s["id"]: s["store_name"] for s in stores}
+    col1, col2, col3, col4 = st.columns(4)
+    store_filter = col1.selectbox("Store", [None] + list(store_names.keys()),
+                                  format_func=lambda i: "All stores" if i is None else store_names[i])
+    date_from = col2.date_input("From", value=None)
+    date_to = col3.date_input("To", value=None)
+    therapist = col4.text_input("Therapist")
+    exact_total = st.checkbox("Exact total (slower on very large tables)", value=True)
+
+    # เปลี่ยน filter = เริ่มหน้าแรกใหม่
+    filters = (store_filter, date_from, date_to, therapist, exact_total)
+    if st.session_state.get("explorer_filters") != filters:
+        st.session_state["explorer_filters"] = filters
+        st.session_state["explorer_cursors"] = [None]
+    cursors = st.session_state["explorer_cursors"]
+
+    start = bookings_repo.local_midnight(date_from) if date_from else None
+    end = bookings_repo.day_range(date_to)[1] if date_to else None
+    rows, next_cursor, total = bookings_repo.page_bookings(
+        supabase, EXPLORER_COLUMNS,
+        store_id=store_filter, start=start, end=end, therapist=therapist.strip() or None,
+        after=cursors[-1], limit=EXPLORER_PAGE_SIZE,
+        count="exact" if exact_total else "estimated"
+    )
+    if total is not None:
+        st.session_state["explorer_total"] = total
+    total = st.session_state.get("explorer_total")
+
+    page_number = len(cursors)
+    st.caption(f"Page {page_number} · {total if total is not None else '?'} bookings"
+               f"{'' if exact_total else ' (estimated)'}")
+    if rows:
+        df = pd.DataFrame(rows)
+        df["store"] = df["store_id"].map(store_names)
+        st.dataframe(df[["customer_name", "Date", "start_time", "end_time", "Therapist", "Type", "store"]])
+    else:
+        st.info("ยังไม่มีข้อมูลการจอง")
+
+    prev_col, next_col = st.columns(2)
+    if prev_col.button("⬅️ Previous", disabled=page_number == 1):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Next ➡️", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+
 # ====== Dashboard ======
 def dashboard():
     st.sidebar.title("🧭 Super Admin")
@@ -50,16 +137,11 @@ def dashboard():
         🆔 ID: `{s['id']}`
         """, unsafe_allow_html=True)
 
-    # ---- Booking ทุกร้าน
-    bookings = supabase.table("bookings").select("*").execute().data
-    st.subheader(f"📅 All Bookings ({len(bookings)})")
-    if bookings:
-        df = pd.DataFrame(bookings)
-        expected_cols = ["customer_name", "start_time", "store_id"]
-        available_cols = [col for col in expected_cols if col in df.columns]
-        st.dataframe(df[available_cols])
-    else:
-        st.info("ยังไม่มีข้อมูลการจอง")
+    # ---- ร้านไหนใช้งานหนัก (aggregate ฝั่ง database)
+    store_stats_panel()
+
+    # ---- Booking ทุกร้าน (แบ่งหน้าฝั่ง server)
+    booking_explorer(stores)
 
     # ---- เพิ่มร้านใหม่
     st.subheader("➕ Add New Store")
@@ -153,7 +235,9 @@ def dashboard():
         st.info("ยังไม่มีแอดมินในระบบ")
 
 # ====== Main ======
+instrumentation.begin_run("superadmin")
 if "superadmin" not in st.session_state:
     login()
 else:
-    dashboard()
\ No newline at end of file
+    dashboard()
+    instrumentation.debug_panel()
\ No newline at end of file
@@ -0,0 +1,175 @@
+# ------------------ Minute masks and slot search ------------------
+# availability.py works in wall-clock minutes of the day (bit i = minute i), and
+# schedule.compile_day() builds one such mask per provider for a date.
+import os
+import sys
+from datetime import date, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+import availability  # noqa: E402
+import schedule  # noqa: E402
+from availability import span_mask, window_starts  # noqa: E402
+
+TEN, NOON, SIX = 10 * 60, 12 * 60, 18 * 60
+
+
+def hhmm(*minutes):
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in minutes]
+
+
+def starts(window, busy, duration, origin=TEN, step=availability.SLOT_STEP):
+    return hhmm(*window_starts(window, busy, duration, origin, step))
+
+
+# ------------------ Minute helpers ------------------
+def test_parse_minutes_handles_midnight_and_noon():
+    assert availability.to_minutes("12:00 AM") == 0
+    assert availability.to_minutes("12:30 PM") == 750
+    assert availability.to_minutes(" 11:59 PM ") == availability.MINUTES_PER_DAY - 1
+
+
+def test_span_mask_and_runs_of():
+    assert span_mask(2, 5) == 0b11100
+    assert span_mask(5, 5) == 0
+    assert span_mask(6, 5) == 0
+    free = 0b1110111
+    assert availability.runs_of(free, 1) == free
+    assert availability.runs_of(free, 3) == 0b0010001
+    assert availability.runs_of(free, 4) == 0
+
+
+def test_free_intervals():
+    assert availability.free_intervals(span_mask(0, 3) | span_mask(5, 9)) == [(0, 3), (5, 9)]
+    assert availability.free_intervals(0) == []
+
+
+# ------------------ Busy index ------------------
+def test_build_busy_index_merges_per_provider_and_skips_bad_rows():
+    index = availability.build_busy_index([
+        {"Therapist": "A", "start_time": "10:00 AM", "end_time": "11:00 AM"},
+        {"Therapist": "A", "start_time": "01:00 PM", "end_time": "01:30 PM"},
+        {"Therapist": "B", "start_time": "10:30 AM", "end_time": "11:00 AM"},
+        {"Therapist": "B", "start_time": "not a time", "end_time": "11:00 AM"},
+        {"Therapist": "C", "start_time": "10:00 AM"},
+        {"Therapist": "C", "start_time": None, "end_time": "11:00 AM"},
+    ])
+
+    assert index == {"A": span_mask(TEN, 11 * 60) | span_mask(13 * 60, 13 * 60 + 30),
+                     "B": span_mask(10 * 60 + 30, 11 * 60)}
+
+
+# ------------------ window_starts ------------------
+def test_window_starts_on_the_grid_around_bookings():
+    busy = span_mask(11 * 60, NOON)
+
+    assert starts(span_mask(TEN, 13 * 60), busy, 60) == ["10:00", "12:00"]
+    assert starts(span_mask(TEN, 13 * 60), busy, 30) == ["10:00", "10:15", "10:30", "12:00", "12:15", "12:30"]
+
+
+def test_window_starts_allow_back_to_back_and_ending_at_close():
+    busy = span_mask(TEN, 10 * 60 + 45)
+
+    assert starts(span_mask(TEN, NOON), busy, 60) == ["10:45", "11:00"]
+
+
+def test_window_starts_align_to_the_store_grid_not_the_shift():
+    # a shift from 10:10 still offers 10:15, 10:30 ... (the grid starts at opening)
+    assert starts(span_mask(10 * 60 + 10, 11 * 60), 0, 30) == ["10:15", "10:30"]
+    assert starts(span_mask(10 * 60 + 10, 11 * 60), 0, 30, origin=10 * 60 + 10, step=20) == ["10:10", "10:30"]
+
+
+def test_window_starts_with_nothing_that_fits():
+    assert starts(span_mask(TEN, 10 * 60 + 45), 0, 60) == []
+    assert starts(span_mask(TEN, NOON), span_mask(TEN, NOON), 30) == []
+    assert starts(0, 0, 30) == []
+    assert starts(span_mask(TEN, NOON), 0, 0) == []
+
+
+def test_window_starts_up_to_midnight():
+    day_end = availability.MINUTES_PER_DAY
+    assert starts(span_mask(22 * 60, day_end), 0, 60, origin=22 * 60, step=30) == ["22:00", "22:30", "23:00"]
+
+
+# ------------------ rank_slots (best fit first) ------------------
+def test_rank_slots_prefers_starts_that_fill_gaps_exactly():
+    # A has 10:00-11:00 free before a booking; B is free all day. A one-hour booking at
+    # 10:00 fills A's gap (cost 0), so it beats B (which listed first) and later starts.
+    windows = {"B": span_mask(TEN, SIX), "A": span_mask(TEN, SIX)}
+    busy = availability.build_busy_index([{"Therapist": "A", "start_time": "11:00 AM", "end_time": "12:00 PM"}])
+
+    slots = availability.rank_slots(windows, busy, 60, TEN, limit=2)
+
+    assert [(s.start.strftime("%H:%M"), s.provider, s.cost) for s in slots] == [("10:00", "A", 0), ("12:00", "A", 30)]
+
+
+def test_rank_slots_charges_gaps_too_short_to_sell():
+    windows = {"A": span_mask(TEN, NOON)}
+
+    costs = {s.start.strftime("%H:%M"): s.cost for s in availability.rank_slots(windows, {}, 60, TEN, limit=10)}
+
+    assert costs["10:00"] == costs["11:00"] == 30  # flush on one side, sellable hour on the other
+    assert costs["10:30"] == 60  # two sellable half hours
+    assert costs["10:15"] == costs["10:45"] == (30 + 15) + 30  # a quarter hour nobody can book
+
+
+# ------------------ Day masks (schedule.compile_day) ------------------
+MONDAY = date(2100, 1, 4)
+HOURS = [{"weekday": None, "Open": "10:00 AM", "Close": "06:00 PM"}]
+
+
+def test_compile_day_intersects_store_hours_shifts_and_breaks():
+    day = schedule.compile_day(
+        MONDAY, ["A", "B"], HOURS,
+        therapist_times=[{"Name": "A", "weekday": None, "Start": "09:00 AM", "End": "02:00 PM"}],
+        breaks=[{"Name": "B", "weekday": None, "Start": "12:00 PM", "End": "12:30 PM"}],
+    )
+
+    assert (day.open_minute, day.close_minute) == (TEN, SIX)
+    assert day.windows == {"A": span_mask(TEN, 14 * 60),
+                           "B": span_mask(TEN, SIX) & ~span_mask(NOON, NOON + 30)}
+
+
+def test_store_without_hours_uses_the_default():
+    day = schedule.compile_day(MONDAY, ["A"], [])
+
+    assert (day.open_minute, day.close_minute) == schedule.DEFAULT_HOURS
+    assert day.windows == {"A": span_mask(*schedule.DEFAULT_HOURS)}
+
+
+def test_closed_weekday_has_no_windows():
+    hours = HOURS + [{"weekday": 1, "closed": True}]
+
+    assert schedule.compile_day(MONDAY, ["A"], hours).windows == {}
+    assert schedule.compile_day(MONDAY + timedelta(days=1), ["A"], hours).windows == {"A": span_mask(TEN, SIX)}
+
+
+def test_weekday_only_hours_close_the_other_days():
+    hours = [{"weekday": 6, "Open": "09:00 AM", "Close": "01:00 PM"}]
+
+    assert schedule.compile_day(MONDAY, ["A"], hours).windows == {}
+    assert schedule.compile_day(MONDAY + timedelta(days=5), ["A"], hours).windows == {"A": span_mask(9 * 60, 13 * 60)}
+
+
+def test_exceptions_close_the_store_or_one_provider():
+    store_closed = [{"day": MONDAY.isoformat(), "Name": None, "closed": True}]
+    a_off = [{"day": MONDAY.isoformat(), "Name": "A", "closed": True}]
+    short_day = [{"day": MONDAY.isoformat(), "Name": None, "closed": False, "Start": "10:00 AM", "End": "12:00 PM"}]
+
+    assert schedule.compile_day(MONDAY, ["A", "B"], HOURS, exceptions=store_closed).windows == {}
+    assert list(schedule.compile_day(MONDAY, ["A", "B"], HOURS, exceptions=a_off).windows) == ["B"]
+    assert schedule.compile_day(MONDAY, ["A"], HOURS, exceptions=short_day).windows == {"A": span_mask(TEN, NOON)}
+    assert schedule.compile_day(MONDAY + timedelta(days=7), ["A"], HOURS, exceptions=store_closed).windows
+
+
+def test_dst_change_days_keep_the_wall_clock_grid():
+    # Melbourne: clocks go forward on 5 Oct 2025 (2:00 -> 3:00) and back on 5 Apr 2026
+    # (3:00 -> 2:00). Masks are wall-clock minutes, so those Sundays offer the same
+    # local times as the Sunday before.
+    hours = [{"weekday": None, "Open": "12:00 AM", "Close": "06:00 AM"}]
+    for change in (date(2025, 10, 5), date(2026, 4, 5)):
+        before = schedule.compile_day(change - timedelta(days=7), ["A"], hours)
+        day = schedule.compile_day(change, ["A"], hours)
+
+        assert day.windows == before.windows == {"A": span_mask(0, 6 * 60)}
+        assert window_starts(day.windows["A"], 0, 60, day.open_minute, 60) == [0, 60, 120, 180, 240, 300]
@@ -0,0 +1,59 @@
+# ------------------ calendar_events: both paths match the old pytz loop ------------------
+import os
+import sys
+from datetime import datetime
+
+import pytest
+import pytz
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+calendar_events = pytest.importorskip("calendar_events")
+
+COLORS = {"A": {"id": "t_0", "color": "#f44336"}}
+TZ = pytz.timezone("Australia/Melbourne")
+
+
+def row(i, day, start, end, therapist="A"):
+    return {"id": i, "Date": day, "start_time": start, "end_time": end,
+            "customer_name": f"Customer {i}", "Type": "Thai Massage", "Therapist": therapist}
+
+
+ROWS = [
+    row(1, "01/01/2100", "10:00 AM", "11:00 AM"),
+    row(2, "05/10/2025", "02:30 AM", "03:30 AM"),   # clocks go forward at 2:00: 2:30 doesn't exist
+    row(3, "05/04/2026", "02:30 AM", "03:30 AM"),   # clocks go back at 3:00: 2:30 happens twice
+    row(4, "01/01/2100", "10:00 AM", "11:00 AM", therapist="Nobody"),
+    row(5, "31/02/2100", "10:00 AM", "11:00 AM"),   # malformed
+    row(6, "01/01/2100", "not a time", "11:00 AM"),  # malformed
+]
+
+
+def old_iso(day, clock):
+    return TZ.localize(datetime.strptime(f"{day} {clock}", "%d/%m/%Y %I:%M %p")).isoformat()
+
+
+@pytest.mark.parametrize("min_rows", [10 ** 6, 0], ids=["loop", "vectorized"])
+def test_events_match_pytz_localize(monkeypatch, min_rows):
+    monkeypatch.setattr(calendar_events, "VECTORIZE_MIN_ROWS", min_rows)
+
+    events, malformed = calendar_events.bookings_to_events(ROWS, COLORS)
+
+    assert [(e["id"], e["start"], e["end"]) for e in events] == [
+        (r["id"], old_iso(r["Date"], r["start_time"]), old_iso(r["Date"], r["end_time"])) for r in ROWS[:3]]
+    assert events[1]["start"] == "2025-10-05T02:30:00+10:00"
+    assert events[2]["start"] == "2026-04-05T02:30:00+10:00"
+    assert [r["id"] for r in malformed] == [5, 6]
+    assert events[0] == {"id": 1, "title": "Customer 1 - Thai Massage", "start": "2100-01-01T10:00:00+11:00",
+                         "end": "2100-01-01T11:00:00+11:00", "resourceId": "t_0",
+                         "backgroundColor": "#f44336", "borderColor": "#f44336"}
+
+
+@pytest.mark.parametrize("min_rows", [10 ** 6, 0], ids=["loop", "vectorized"])
+def test_booking_times_flags_malformed_rows(monkeypatch, min_rows):
+    monkeypatch.setattr(calendar_events, "VECTORIZE_MIN_ROWS", min_rows)
+
+    start_iso, end_iso, malformed = calendar_events.booking_times(calendar_events.pd.DataFrame(ROWS))
+
+    assert list(malformed) == [False, False, False, False, True, True]
+    assert start_iso[1] == "2025-10-05T02:30:00+10:00"
@@ -0,0 +1,125 @@
+# ------------------ Email outbox against a local SMTP stub ------------------
+# Books through reservations.reserve_booking on the in-memory stand-in
+# (benchmarks/fake_supabase.py), then drains email_outbox with OutboxWorker over
+# yagmail to an aiosmtpd server on localhost.
+import email
+import os
+import socket
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "benchmarks"))
+import outbox  # noqa: E402
+import reservations  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+yagmail = pytest.importorskip("yagmail")
+controller = pytest.importorskip("aiosmtpd.controller")
+
+STORE_ID = "00000000-0000-4000-8000-000000000000"
+SENDER = "bookings@melbooking.test"
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def text_of(message):
+    return "".join(part.get_payload(decode=True).decode() for part in message.walk()
+                   if part.get_content_type() == "text/plain")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    inbox = Inbox()
+    server = controller.Controller(inbox, hostname="127.0.0.1", port=free_port())
+    server.start()
+    yield server, inbox
+    server.stop()
+
+
+def sender_factory(port):
+    return lambda: yagmail.SMTP(SENDER, host="127.0.0.1", port=port, smtp_ssl=False,
+                                smtp_starttls=False, smtp_skip_login=True)
+
+
+def booking(start="10:00 AM", end="11:00 AM"):
+    return {"store_id": STORE_ID, "Date": "01/01/2100", "start_time": start, "end_time": end,
+            "customer_name": "Customer", "Therapist": "Therapist A", "phone": "0400000000", "Type": "Service 0"}
+
+
+def confirmation(recipient="customer@example.com"):
+    return outbox.email_payload(recipient, "🛎️ Service Booking Confirmed", "See you soon")
+
+
+def test_confirmation_is_queued_with_the_booking_and_sent(smtp):
+    server, inbox = smtp
+    db = FakeSupabase()
+
+    reservation = reservations.reserve_booking(db, booking(), email=confirmation())
+    worker = outbox.OutboxWorker(db, sender_factory(server.port))
+    sent = worker.drain_once()
+    worker._close_sender()
+
+    assert reservation.status == reservations.RESERVED
+    assert sent == 1
+    assert [m.rcpt_tos for m in inbox.messages] == [["customer@example.com"]]
+    message = email.message_from_bytes(inbox.messages[0].content)
+    assert "See you soon" in text_of(message)
+    row = db.tables["email_outbox"][0]
+    assert (row["status"], row["attempts"], row["store_id"]) == ("sent", 1, STORE_ID)
+
+
+def test_taken_slot_queues_no_email(smtp):
+    db = FakeSupabase()
+    reservations.reserve_booking(db, booking(), email=confirmation("first@example.com"))
+
+    reservation = reservations.reserve_booking(db, booking(start="10:30 AM"), email=confirmation("second@example.com"))
+
+    assert reservation.status == reservations.SLOT_TAKEN
+    assert [r["recipient"] for r in db.tables["email_outbox"]] == ["first@example.com"]
+
+
+def test_failed_send_backs_off_then_gives_up(smtp):
+    server, inbox = smtp
+    db = FakeSupabase()
+    reservations.reserve_booking(db, booking(), email=confirmation())
+    worker = outbox.OutboxWorker(db, sender_factory(free_port()), max_attempts=2, base_backoff=0)  # nobody listening
+
+    worker.drain_once()
+    row = db.tables["email_outbox"][0]
+    assert (row["status"], row["attempts"]) == ("pending", 1)
+
+    worker.drain_once()
+    assert (row["status"], row["attempts"]) == ("failed", 2)
+    assert worker.drain_once() == 0
+    assert inbox.messages == []
+
+
+def test_reclaimed_message_counts_an_attempt(smtp):
+    server, inbox = smtp
+    db = FakeSupabase()
+    reservations.reserve_booking(db, booking(), email=confirmation())
+    row = db.tables["email_outbox"][0]
+
+    db.rpc("claim_email_batch", {"p_limit": 10}).execute()  # a worker claims it, then dies
+    row["next_attempt_at"] = "2000-01-01T00:00:00+00:00"  # its lease ran out
+    worker = outbox.OutboxWorker(db, sender_factory(server.port), max_attempts=1)
+    worker.drain_once()
+
+    assert (row["status"], row["attempts"]) == ("failed", 2)
+    assert inbox.messages == []
@@ -0,0 +1,77 @@
+# ------------------ rate_limit token buckets (injected clock) ------------------
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+import rate_limit  # noqa: E402
+
+STORE_ID = "00000000-0000-4000-8000-000000000000"
+# action -> (per-client rate/s, per-client burst, per-store rate/s, per-store burst)
+LIMITS = {"lookup": (1.0, 3, 2.0, 5)}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(clock, **kwargs):
+    return rate_limit.RateLimiter(LIMITS, clock=clock, **kwargs)
+
+
+def test_client_burst_then_shed_then_refill():
+    clock = Clock()
+    rl = limiter(clock)
+
+    assert [rl.allow("lookup", STORE_ID, "a") for _ in range(4)] == [True, True, True, False]
+    clock.now += 1.0  # one client token back
+    assert rl.allow("lookup", STORE_ID, "a")
+    assert not rl.allow("lookup", STORE_ID, "a")
+    assert rl.stats()["lookup.shed_client"] == 2
+
+
+def test_new_fingerprints_cannot_skip_an_empty_store_bucket():
+    clock = Clock()
+    rl = limiter(clock)
+
+    allowed = [rl.allow("lookup", STORE_ID, f"rotating-{i}") for i in range(20)]
+
+    assert allowed.count(True) == 5  # the store burst, then nothing
+    assert rl.stats()["lookup.shed_store"] == 15
+    clock.now += 1.0  # two store tokens back
+    assert [rl.allow("lookup", STORE_ID, f"later-{i}") for i in range(3)] == [True, True, False]
+
+
+def test_evicted_fingerprint_does_not_reset_the_store_bucket():
+    clock = Clock()
+    rl = limiter(clock, max_keys=2)  # room for one client bucket next to the store bucket
+
+    for _ in range(3):
+        rl.allow("lookup", STORE_ID, "a")
+    rl.allow("lookup", STORE_ID, "b")  # evicts a's bucket
+    rl.allow("lookup", STORE_ID, "c")  # store bucket is now empty
+
+    assert not rl.allow("lookup", STORE_ID, "a")
+
+
+def test_stores_have_separate_buckets():
+    clock = Clock()
+    rl = limiter(clock)
+
+    for i in range(5):
+        rl.allow("lookup", STORE_ID, f"client-{i}")
+
+    assert not rl.allow("lookup", STORE_ID, "another")
+    assert rl.allow("lookup", "other-store", "another")
+
+
+def test_fingerprint_ignores_forged_forwarded_for_and_headers():
+    real = {"x-forwarded-for": "203.0.113.7", "user-agent": "bot/1"}
+    forged = {"X-Forwarded-For": "198.51.100.1, 203.0.113.7", "User-Agent": "bot/2"}
+
+    assert rate_limit.client_fingerprint(real) == rate_limit.client_fingerprint(forged)
+    assert rate_limit.client_fingerprint({}, "203.0.113.7") == rate_limit.client_fingerprint(real)
@@ -0,0 +1,75 @@
+# ------------------ reserve_booking under concurrent confirmations ------------------
+# Fires parallel booking attempts through reservations.reserve_booking against the
+# in-memory stand-in (benchmarks/fake_supabase.py). Its reserve_booking runs outside the
+# stand-in's global lock, as two statements held together only by a per-(store,
+# therapist, date) lock, like the advisory lock in sql/001_reserve_booking.sql.
+import os
+import sys
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "benchmarks"))
+import reservations  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+STORE_ID = "00000000-0000-4000-8000-000000000000"
+ATTEMPTS = 16
+
+
+def booking(therapist="Therapist A", start="10:00 AM", end="11:00 AM", name="Customer"):
+    return {"store_id": STORE_ID, "Date": "01/01/2100", "start_time": start, "end_time": end,
+            "customer_name": name, "Therapist": therapist, "phone": "0400000000", "Type": "Service 0"}
+
+
+def reserve_in_parallel(db, bookings):
+    results = [None] * len(bookings)
+    barrier = threading.Barrier(len(bookings))
+
+    def attempt(i):
+        barrier.wait()
+        results[i] = reservations.reserve_booking(db, bookings[i])
+
+    threads = [threading.Thread(target=attempt, args=(i,)) for i in range(len(bookings))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_same_slot_is_reserved_once():
+    db = FakeSupabase(latency_ms=5)
+    results = reserve_in_parallel(db, [booking(name=f"Customer {i}") for i in range(ATTEMPTS)])
+
+    statuses = [r.status for r in results]
+    assert statuses.count(reservations.RESERVED) == 1
+    assert statuses.count(reservations.SLOT_TAKEN) == ATTEMPTS - 1
+    assert len(db.tables["bookings"]) == 1
+
+
+def test_overlapping_slots_are_reserved_once():
+    db = FakeSupabase(latency_ms=5)
+    starts = ["09:30 AM", "10:00 AM", "10:15 AM", "10:30 AM"]
+    results = reserve_in_parallel(db, [booking(start=s, end="11:00 AM") for s in starts * 4])
+
+    assert [r.status for r in results].count(reservations.RESERVED) == 1
+    assert len(db.tables["bookings"]) == 1
+
+
+def test_different_providers_all_reserved():
+    db = FakeSupabase(latency_ms=5)
+    results = reserve_in_parallel(db, [booking(therapist=f"Therapist {i}") for i in range(ATTEMPTS)])
+
+    assert all(r.status == reservations.RESERVED for r in results)
+    assert len(db.tables["bookings"]) == ATTEMPTS
+
+
+def test_missing_rpc_result_is_an_error_not_slot_taken():
+    db = FakeSupabase()
+    db._rpc_reserve_booking = lambda p_booking: None
+
+    reservation = reservations.reserve_booking(db, booking())
+
+    assert reservation == reservations.Reservation(reservations.ERROR, None)
+    assert reservations.failure_message(reservation) == reservations.ERROR_MESSAGE